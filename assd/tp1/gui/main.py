@@ -1,21 +1,30 @@
 import sys
+import io
+import copy
+import datetime
+import logging
 import numpy as np
 import matplotlib
 # Use non-interactive Agg backend
 matplotlib.use('Agg')
-import matplotlib.pyplot as plt
-from matplotlib.figure import Figure
 import os
-import datetime
 from PyQt6.QtWidgets import (QApplication, QMainWindow, QGraphicsView, 
                            QGraphicsScene, QVBoxLayout, QWidget, QToolBar,
                            QGraphicsItem, QGraphicsLineItem, QMenu, QDialog,
                            QVBoxLayout, QHBoxLayout, QLabel, QLineEdit, 
                            QPushButton, QSpinBox, QDoubleSpinBox, QFormLayout,
-                           QTabWidget, QSplitter, QMessageBox, QSplashScreen)
-from PyQt6.QtCore import Qt, QRectF, QPointF, QTimer, QPropertyAnimation
+                           QTabWidget, QSplitter, QMessageBox, QSplashScreen,
+                           QProgressDialog, QFileDialog, QListWidget,
+                           QListWidgetItem, QComboBox, QScrollArea)
+from PyQt6.QtCore import Qt, QRectF, QPointF, QTimer, QPropertyAnimation, QThread, pyqtSignal
 from PyQt6.QtGui import QPen, QBrush, QColor, QPainter, QPixmap, QIcon
 
+from sim import blocks, engine, export, filters, graph_io, hold, logs, noise, plots
+from sim.profiler import NULL_PROFILER, Profiler
+from sim.store import SignalStore
+
+logger = logging.getLogger("sim.gui")
+
 class Port(QGraphicsItem):
     def __init__(self, parent, x, y, is_input=True, is_clock=False):
         super().__init__(parent)
@@ -131,6 +140,7 @@ class Block(QGraphicsItem):
             'FR': QColor(255, 180, 180),
             'A.Switch': QColor(180, 255, 255),
             'Adder': QColor(255, 200, 255),  # Purple for Adder
+            'Multiplier': QColor(230, 200, 255),
             'Noise': QColor(200, 255, 255)   # Cyan for Noise
         }
         
@@ -143,7 +153,7 @@ class Block(QGraphicsItem):
         self.clock_ports = []
         
         # Add ports based on block type
-        if block_type == 'FAA':
+        if block_type in ['FAA', 'FR']:
             self.input_ports.append(Port(self, 0, self.height/2, True))
             self.output_ports.append(Port(self, self.width, self.height/2, False))
         elif block_type == 'S&H':
@@ -162,11 +172,10 @@ class Block(QGraphicsItem):
             # Add clock port at the top
             clock_port = Port(self, self.width/2, 0, True, True)
             self.clock_ports.append(clock_port)
-        elif block_type == 'Adder':
-            # Two inputs (top and bottom) and one output
-            self.input_ports.append(Port(self, 0, self.height/3, True))
-            self.input_ports.append(Port(self, 0, 2*self.height/3, True))
+        elif block_type in blocks.FAN_IN_TYPES:
+            # N inputs spread along the left side and one output
             self.output_ports.append(Port(self, self.width, self.height/2, False))
+            self.set_input_count(self.fan_in_params["n_inputs"])
         elif block_type == 'Noise':
             # No inputs, one output
             self.output_ports.append(Port(self, self.width, self.height/2, False))
@@ -179,9 +188,11 @@ class Block(QGraphicsItem):
                 "amplitude": 1.0
             }
             self.output_signal = None
-        elif self.block_type == 'FAA':
+        elif self.block_type in ['FAA', 'FR']:
             self.filter_params = {
-                "cutoff_frequency": 5000
+                "cutoff_frequency": 5000,
+                "filter_type": "ideal",  # ideal, butterworth, chebyshev, cauer or bessel
+                "order": filters.DEFAULT_ORDER
             }
         elif self.block_type == 'Clock':
             self.clock_params = {
@@ -191,8 +202,13 @@ class Block(QGraphicsItem):
             }
             self.output_signal = None
         elif self.block_type == 'S&H':
-            # Additional params for S&H if needed
-            pass
+            # Hold model: "time" (ideal staircase) or "spectral" (see sim.hold, times in seconds)
+            self.sh_params = {
+                "mode": "time",
+                "aperture": 0.0,
+                "droop_tau": 0.0,     # 0 means no droop
+                "settling_tau": 0.0   # 0 means instantaneous settling
+            }
         elif self.block_type == 'A.Switch':
             # Additional params for A.Switch if needed
             pass
@@ -200,166 +216,92 @@ class Block(QGraphicsItem):
             # Params for noise generator
             self.noise_params = {
                 "peak_to_peak": 1.0,
-                "noise_type": "white"  # white, pink, etc.
+                "noise_type": "white",  # white, pink, brown, blue or band
+                "seed": None,           # None draws a new noise signal on every run
+                "low_frequency": 100.0, # Band limits (band noise only)
+                "high_frequency": 5000.0
             }
             self.output_signal = None
+        elif self.block_type == 'Adder':
+            # Weighted sum of N inputs
+            self.fan_in_params = {"n_inputs": 2, "weights": [1.0, 1.0]}
+        elif self.block_type == 'Multiplier':
+            # Product of N inputs (mixer)
+            self.fan_in_params = {"n_inputs": 2, "gain": 1.0}
     
-    def generate_signal(self, t):
-        """Generate a signal based on block type and parameters"""
+    def get_params(self):
+        """Return the parameter dictionary of this block (empty if it has none)"""
         if self.block_type == 'Signal':
-            signal = np.zeros_like(t)
-            amplitude = self.signal_params["amplitude"] / self.signal_params["n_components"]
-            for freq in self.signal_params["frequencies"]:
-                signal += amplitude * np.sin(2 * np.pi * freq * t)
-            return signal
-        
-        # For compatibility - redirect to generate_clock if it's a clock
+            return self.signal_params
+        elif self.block_type in ['FAA', 'FR']:
+            return self.filter_params
         elif self.block_type == 'Clock':
-            return self.generate_clock(t)
-            
-        # Generate noise if it's a noise block
+            return self.clock_params
         elif self.block_type == 'Noise':
-            return self.generate_noise(t)
-            
-        # Default return empty signal
-        return np.zeros_like(t)
+            return self.noise_params
+        elif self.block_type in blocks.FAN_IN_TYPES:
+            return self.fan_in_params
+        elif self.block_type == 'S&H':
+            return self.sh_params
+        return {}
+    
+    def set_params(self, params):
+        """Update the parameters of this block (e.g. when loading a saved graph)"""
+        # Missing keys keep their default values
+        self.get_params().update(params)
+        if self.block_type in blocks.FAN_IN_TYPES:
+            self.set_input_count(self.fan_in_params["n_inputs"])
+        self.update()
+    
+    def set_input_count(self, n_inputs):
+        """Resize the inputs of a fan-in block; removed ports lose their connections"""
+        self.prepareGeometryChange()
+        while len(self.input_ports) > n_inputs:
+            port = self.input_ports.pop()
+            for conn in port.connections[:]:
+                other = conn.start_port if conn.end_port == port else conn.end_port
+                if conn in other.connections:
+                    other.connections.remove(conn)
+                if conn.scene() is not None:
+                    conn.scene().removeItem(conn)
+            port.connections.clear()
+            port.setParentItem(None)
+            if port.scene() is not None:
+                port.scene().removeItem(port)
+        while len(self.input_ports) < n_inputs:
+            self.input_ports.append(Port(self, 0, 0, True))
+        
+        # Taller block for many inputs, ports evenly spaced
+        self.height = max(60, 20 * (n_inputs + 1))
+        for i, port in enumerate(self.input_ports):
+            port.setPos(0, self.height * (i + 1) / (n_inputs + 1))
+        self.output_ports[0].setPos(self.width, self.height / 2)
+        for port in self.input_ports + self.output_ports:
+            for conn in port.connections:
+                conn.updatePosition()
+        self.update()
+    
+    def generate_signal(self, t):
+        """Generate a signal based on block type and parameters"""
+        return blocks.generate_source(self.block_type, self.get_params(), t)
     
     def generate_noise(self, t):
         """Generate a noise signal based on parameters"""
         if self.block_type == 'Noise':
-            # Generate random noise
-            noise_type = self.noise_params.get("noise_type", "white")
-            peak_to_peak = self.noise_params.get("peak_to_peak", 1.0)
-            
-            if noise_type == "white":
-                # Generate white noise (equal power at all frequencies)
-                noise = np.random.normal(0, peak_to_peak/6, size=len(t))  # 6 sigma range for normal distribution
-                
-                # Scale to desired peak-to-peak
-                max_val = np.max(noise)
-                min_val = np.min(noise)
-                current_pp = max_val - min_val
-                
-                if current_pp > 0:  # Avoid division by zero
-                    noise = noise * (peak_to_peak / current_pp)
-                    
-                return noise
-            
-            # Add other noise types here if needed (pink, brown, etc.)
-            
+            return blocks.generate_noise(self.noise_params, t)
         return np.zeros_like(t)
     
     def generate_clock(self, t):
         """Generate a clock signal based on parameters"""
         if self.block_type == 'Clock':
-            freq = self.clock_params["frequency"]
-            duty = self.clock_params["duty_cycle"] / 100.0
-            phase = self.clock_params["phase"] * np.pi / 180.0  # Convert to radians
-            period = 1.0 / freq
-            # Create square wave with phase offset
-            return np.where(((t % period) / period + phase / (2 * np.pi)) % 1.0 < duty, 1.0, 0.0)
+            return blocks.generate_clock(self.clock_params, t)
         
         # Default return empty signal
         return np.zeros_like(t)
     
     def process_signal(self, input_signal, clock_signal=None):
         """Process input signal based on block type and parameters"""
-        if self.block_type == 'FAA':
-            # Ideal low-pass filter implementation
-            fc = self.filter_params["cutoff_frequency"]
-            # Convert to frequency domain
-            signal_fft = np.fft.rfft(input_signal)
-            # Calculate frequency bins
-            freqs = np.fft.rfftfreq(len(input_signal), 1/44100)  # Use default sampling rate
-            # Apply filter
-            signal_fft[freqs > fc] = 0
-            # Convert back to time domain
-            return np.fft.irfft(signal_fft, len(input_signal))
-            
-        elif self.block_type == 'S&H':
-            # Sample and hold implementation
-            if clock_signal is not None:
-                # Create output signal array
-                output_signal = np.zeros_like(input_signal)
-                
-                # Calculate clock frequency from the clock signal
-                # Find transitions from low to high to determine period
-                transitions = []
-                for i in range(1, len(clock_signal)):
-                    if clock_signal[i-1] <= 0.5 and clock_signal[i] > 0.5:
-                        transitions.append(i)
-                
-                # Calculate average period in samples
-                if len(transitions) > 1:
-                    avg_period = np.mean(np.diff(transitions))
-                    clock_freq = 44100 / avg_period  # Using default sample rate
-                else:
-                    # Default if we can't detect
-                    clock_freq = 1000
-                
-                # Process each sample - implement true sample and hold
-                last_value = 0
-                for i in range(len(clock_signal)):
-                    # Detect rising edge of clock (transition from low to high)
-                    if i > 0 and clock_signal[i-1] <= 0.5 and clock_signal[i] > 0.5:
-                        # At rising edge, sample the input
-                        last_value = input_signal[i]
-                    
-                    # Always output the last sampled value (true sample and hold)
-                    output_signal[i] = last_value
-                
-                # Note: We're no longer applying the sinc envelope in the frequency domain
-                # The staircase pattern in the time domain already correctly represents
-                # sample-and-hold behavior, and applying the sinc transform was distorting it
-                
-                return output_signal
-            else:
-                # If no clock signal, just pass through
-                return input_signal
-            
-        elif self.block_type == 'A.Switch':
-            # Analog switch implementation
-            if clock_signal is not None:
-                # Signal passes through only when clock is high
-                # Create output signal array initialized to zeros
-                output_signal = np.zeros_like(input_signal)
-                
-                # For each sample, check if clock is high (>0.5)
-                for i in range(len(clock_signal)):
-                    if clock_signal[i] > 0.5:
-                        # When clock is high, input passes through
-                        output_signal[i] = input_signal[i]
-                    # When clock is low, output remains zero (already initialized as such)
-                
-                return output_signal
-            else:
-                # If no clock signal, just pass through
-                return input_signal
-        
-        elif self.block_type == 'Adder':
-            # For the adder, input_signal should be a list of multiple input signals
-            if isinstance(input_signal, list) and len(input_signal) >= 2:
-                # Verify all signals have the same length
-                lengths = [len(sig) for sig in input_signal if sig is not None]
-                if not lengths or any(l != lengths[0] for l in lengths):
-                    # If signals have different lengths or no valid signals, return zeros
-                    return np.zeros_like(input_signal[0]) if input_signal[0] is not None else np.array([])
-                
-                # Add the signals together
-                result = np.zeros_like(input_signal[0])
-                for sig in input_signal:
-                    if sig is not None:
-                        result += sig
-                return result
-            elif isinstance(input_signal, np.ndarray):
-                # If there's only one input signal, return it unchanged
-                return input_signal
-            else:
-                # In case of invalid input, return an empty array
-                return np.array([])
-                
-        # Default case - pass through
-        return input_signal
+        return blocks.process_signal(self.block_type, self.get_params(), input_signal, clock_signal)
     
     def boundingRect(self):
         return QRectF(0, 0, self.width, self.height)
@@ -377,21 +319,24 @@ class Block(QGraphicsItem):
         if self.block_type in ['S&H', 'A.Switch']:
             painter.drawText(int(self.width/2 - 15), 15, "CLK")
         
-        # Draw labels for adder inputs
-        if self.block_type == 'Adder':
-            painter.drawText(5, int(self.height/3) + 5, "In1")
-            painter.drawText(5, int(2*self.height/3) + 5, "In2")
-            painter.drawText(int(self.width/2 - 10), int(self.height/2) + 5, "+")
+        # Draw labels for fan-in inputs
+        if self.block_type in blocks.FAN_IN_TYPES:
+            for i, port in enumerate(self.input_ports):
+                painter.drawText(5, int(port.pos().y()) + 5, f"In{i+1}")
+            symbol = "+" if self.block_type == 'Adder' else "×"
+            painter.drawText(int(self.width/2 - 10), int(self.height/2) + 5, symbol)
         
         # Draw parameter info
         if self.block_type == 'Signal':
             painter.drawText(10, 45, f"n={self.signal_params['n_components']}")
-        elif self.block_type == 'FAA':
+        elif self.block_type in ['FAA', 'FR']:
             painter.drawText(10, 45, f"fc={self.filter_params['cutoff_frequency']}")
         elif self.block_type == 'Clock':
             painter.drawText(10, 45, f"f={self.clock_params['frequency']}")
         elif self.block_type == 'Noise':
-            painter.drawText(10, 45, f"Amp={self.noise_params['peak_to_peak']}")
+            painter.drawText(10, 45, f"{self.noise_params['noise_type']} {self.noise_params['peak_to_peak']}")
+        elif self.block_type == 'S&H' and self.sh_params["mode"] != "time":
+            painter.drawText(10, 45, self.sh_params["mode"])
     
     def mousePressEvent(self, event):
         if event.button() == Qt.MouseButton.RightButton:
@@ -405,7 +350,7 @@ class Block(QGraphicsItem):
         if self.block_type == 'Signal':
             config_action = menu.addAction("Configure Signal")
             config_action.triggered.connect(self.configure_signal)
-        elif self.block_type == 'FAA':
+        elif self.block_type in ['FAA', 'FR']:
             config_action = menu.addAction("Configure Filter")
             config_action.triggered.connect(self.configure_filter)
         elif self.block_type == 'Clock':
@@ -414,6 +359,12 @@ class Block(QGraphicsItem):
         elif self.block_type == 'Noise':
             config_action = menu.addAction("Configure Noise")
             config_action.triggered.connect(self.configure_noise)
+        elif self.block_type in blocks.FAN_IN_TYPES:
+            config_action = menu.addAction("Configure Inputs")
+            config_action.triggered.connect(self.configure_fan_in)
+        elif self.block_type == 'S&H':
+            config_action = menu.addAction("Configure Hold")
+            config_action.triggered.connect(self.configure_hold)
         
         # Show the menu at event position
         menu.exec(event.screenPos())
@@ -425,7 +376,7 @@ class Block(QGraphicsItem):
             self.update()  # Redraw block to show updated parameters
     
     def configure_filter(self):
-        dialog = FAAConfigDialog(filter_params=self.filter_params)
+        dialog = FAAConfigDialog(filter_params=self.filter_params, block_type=self.block_type)
         if dialog.exec() == QDialog.DialogCode.Accepted:
             self.filter_params = dialog.get_parameters()
             self.update()  # Redraw block to show updated parameters
@@ -442,6 +393,17 @@ class Block(QGraphicsItem):
             self.noise_params = dialog.get_parameters()
             self.update()  # Redraw block to show updated parameters
     
+    def configure_hold(self):
+        dialog = HoldConfigDialog(sh_params=self.sh_params)
+        if dialog.exec() == QDialog.DialogCode.Accepted:
+            self.sh_params = dialog.get_parameters()
+            self.update()  # Redraw block to show updated parameters
+    
+    def configure_fan_in(self):
+        dialog = FanInConfigDialog(fan_in_params=self.fan_in_params, block_type=self.block_type)
+        if dialog.exec() == QDialog.DialogCode.Accepted:
+            self.set_params(dialog.get_parameters())
+    
     def itemChange(self, change, value):
         if change == QGraphicsItem.GraphicsItemChange.ItemPositionHasChanged:
             # Update all connections when block is moved
@@ -582,6 +544,48 @@ class CustomGraphicsView(QGraphicsView):
                     
         super().mouseReleaseEvent(event)
 
+class SimulationWorker(QThread):
+    """Runs the simulation and the plot analysis off the GUI thread"""
+    progress = pyqtSignal(str, int, int, str)       # phase, done, total, message
+    result_ready = pyqtSignal(object, object)       # result, plot specs
+    failed = pyqtSignal(str)
+    
+    def __init__(self, graph, sampling_rate, duration, parent=None, profiler=NULL_PROFILER, store=None):
+        super().__init__(parent)
+        self.graph = graph
+        self.sampling_rate = sampling_rate
+        self.duration = duration
+        self.profiler = profiler
+        self.store = store
+    
+    def run(self):
+        try:
+            result = engine.simulate(
+                self.graph, self.sampling_rate, self.duration,
+                progress=lambda done, total, msg: self.progress.emit("Simulating", done, total, msg),
+                is_cancelled=self.isInterruptionRequested, profiler=self.profiler, store=self.store)
+            
+            # Plot specs are computed once here; figures are rendered on demand by the viewer
+            specs = plots.compute_plot_specs(
+                result.output_signals, result.time_array, result.block_info,
+                result.raw_input_signals, fs=self.sampling_rate,
+                progress=lambda done, total, msg: self.progress.emit("Analyzing", done, total, msg),
+                is_cancelled=self.isInterruptionRequested, profiler=self.profiler)
+        except engine.SimulationCancelled:
+            logger.info("simulation cancelled")
+            return
+        except Exception as e:
+            logger.exception("simulation failed")
+            self.failed.emit(f"{type(e).__name__}: {e}")
+            return
+        
+        if self.isInterruptionRequested():
+            logger.info("simulation cancelled")
+            return
+        
+        # Signals carry Python object references, so the arrays are shared, not copied
+        self.result_ready.emit(result, specs)
+
 class MainWindow(QMainWindow):
     def __init__(self):
         super().__init__()
@@ -611,15 +615,28 @@ class MainWindow(QMainWindow):
         self.add_block_button(toolbar, "Signal", "Signal Generator")
         self.add_block_button(toolbar, "A.Switch", "Analog Switch")
         self.add_block_button(toolbar, "Adder", "Adder")
+        self.add_block_button(toolbar, "Multiplier", "Multiplier / Mixer")
         self.add_block_button(toolbar, "Noise", "Noise")
+        self.add_block_button(toolbar, "FR", "Reconstruction Filter")
         
         # Add simulation toolbar
         sim_toolbar = QToolBar("Simulation Controls")
         self.addToolBar(Qt.ToolBarArea.BottomToolBarArea, sim_toolbar)
         
         # Add run simulation button
-        run_action = sim_toolbar.addAction("Run Simulation")
-        run_action.triggered.connect(self.run_simulation)
+        self.run_action = sim_toolbar.addAction("Run Simulation")
+        self.run_action.triggered.connect(self.run_simulation)
+        
+        # Save and load the block diagram as JSON (also used by the batch runner)
+        save_action = sim_toolbar.addAction("Save Graph")
+        save_action.triggered.connect(self.save_graph)
+        load_action = sim_toolbar.addAction("Load Graph")
+        load_action.triggered.connect(self.load_graph)
+        
+        # Time every block of the next runs and save a trace to signal_plots/
+        self.profile_action = sim_toolbar.addAction("Profile")
+        self.profile_action.setCheckable(True)
+        self.profile_action.setToolTip("Print per block timings and save a trace of each run")
         
         # Install event filter for key press events
         self.view.installEventFilter(self)
@@ -627,6 +644,12 @@ class MainWindow(QMainWindow):
         # Simulation parameters
         self.sampling_rate = 44100  # Hz
         self.sim_duration = 1.0     # seconds
+        # Signals beyond this much RAM are kept in memory-mapped temporary files
+        self.spill_limit_mb = 1024
+        
+        # Background worker of the running simulation (if any)
+        self.worker = None
+        self.progress_dialog = None
         
     def add_block_button(self, toolbar, block_type, tooltip):
         action = toolbar.addAction(block_type)
@@ -660,232 +683,139 @@ class MainWindow(QMainWindow):
         
         self.scene.addItem(block)
     
-    def run_simulation(self):
-        # Get all blocks from the scene
-        all_blocks = [item for item in self.scene.items() if isinstance(item, Block)]
-        
-        if not all_blocks:
-            print("No blocks to simulate")
-            return
-        
-        print(f"Found {len(all_blocks)} blocks to simulate")
-        
-        # Parameters for simulation
-        duration = 1.0  # seconds
-        sampling_rate = 44100
-        time_array = np.linspace(0, duration, int(sampling_rate * duration))
-        
-        # Dictionary to store output signals for each block
-        output_signals = {}
-        
-        # Dictionary to store input signals for each block (for visualization)
-        input_connections = {}
-        
-        # Process source blocks first (Signal, Clock, Noise)
-        source_blocks = [block for block in all_blocks if block.block_type in ['Signal', 'Clock', 'Noise']]
-        print(f"Found {len(source_blocks)} source blocks")
-        
-        # Process source blocks
-        for block in source_blocks:
-            if block.block_type == 'Signal':
-                # Generate signal based on parameters
-                output_signals[block.id] = block.generate_signal(time_array)
-                print(f"Generated signal for block {block.id} (type: {block.block_type})")
-            
-            elif block.block_type == 'Clock':
-                # Generate clock signal based on parameters
-                output_signals[block.id] = block.generate_clock(time_array)
-                print(f"Generated clock for block {block.id} (type: {block.block_type})")
-                
-            elif block.block_type == 'Noise':
-                # Generate noise signal based on parameters
-                output_signals[block.id] = block.generate_noise(time_array)
-                print(f"Generated noise for block {block.id} (type: {block.block_type})")
-        
-        # Sort the remaining blocks to ensure we process in order (simple topological sort)
-        remaining_blocks = [block for block in all_blocks if block not in source_blocks]
-        print(f"Remaining blocks to process: {len(remaining_blocks)}")
-        
-        # Store the original input signals for visualization
-        raw_input_signals = {}
-        
-        # Repeat until all blocks are processed or no more can be processed
-        processed = set(block.id for block in source_blocks)
-        while remaining_blocks:
-            blocks_processed_this_round = []
+    def snapshot_graph(self):
+        """Copy the block diagram into a plain graph description for the simulation engine"""
+        graph = {"blocks": [], "connections": []}
+        for block in self.scene.items():
+            if not isinstance(block, Block):
+                continue
+            # Copy the parameters so editing a block during a run is safe
+            graph["blocks"].append({"id": block.id, "type": block.block_type,
+                                    "x": block.pos().x(), "y": block.pos().y(),
+                                    "params": copy.deepcopy(block.get_params())})
             
-            for block in remaining_blocks:
-                # Check if all inputs are processed
-                all_inputs_ready = True
-                input_signal = None
-                input_signals = []  # For adder block
-                clock_signal = None
-                
-                # Get all ports
-                all_ports = block.input_ports + block.output_ports + block.clock_ports
-                
-                # Gather input signals from all connected ports
-                for port in all_ports:
-                    if not port.is_input:  # Skip output ports
-                        continue
-                    
-                    print(f"Processing input port for block {block.id} (type: {block.block_type})")
-                    print(f"Port has {len(port.connections)} connections")
-                        
-                    port_signal = None
-                    
+            for is_clock, ports in ((False, block.input_ports), (True, block.clock_ports)):
+                for index, port in enumerate(ports):
                     for conn in port.connections:
                         # Find the source port (the one that is not this port)
-                        if conn.end_port == port:
-                            # This port is the end/destination of the connection
-                            source_port = conn.start_port
-                        else:
-                            # This port is the start of the connection (unusual case)
-                            source_port = conn.end_port
-                            
-                        source_block = source_port.parentItem()
-                        
-                        print(f"  Connection from block {source_block.id} (type: {source_block.block_type})")
-                        
-                        if source_block.id not in processed:
-                            all_inputs_ready = False
-                            print(f"  Source block not processed yet, skipping")
-                            break
-                        
-                        # Store original input signal for visualization
-                        # Only for regular input ports (not clock)
-                        if not port.is_clock and source_block.id in output_signals:
-                            if block.id not in raw_input_signals:
-                                raw_input_signals[block.id] = []
-                            raw_input_signals[block.id].append(output_signals[source_block.id])
-                        
-                        # Store signal based on port type
-                        if port.is_clock:
-                            clock_signal = output_signals[source_block.id]
-                            print(f"  Stored clock signal from block {source_block.id}")
-                        else:
-                            port_signal = output_signals[source_block.id]
-                            print(f"  Stored input signal from block {source_block.id}")
-                    
-                    # For adder, collect all input signals
-                    if block.block_type == 'Adder' and not port.is_clock:
-                        input_signals.append(port_signal)
-                    elif not port.is_clock:
-                        input_signal = port_signal
-                
-                if all_inputs_ready:
-                    # Process the block based on its type
-                    if block.block_type == 'FAA':
-                        # Apply filter to input
-                        if input_signal is not None:
-                            # Get FAA parameters from block
-                            fc = block.filter_params.get('cutoff_frequency', 1000)  # Default cutoff frequency
-                            print(f"Applying FAA filter with fc={fc} Hz")
-                            output_signals[block.id] = block.process_signal(input_signal, None)
-                        else:
-                            # If no input signal, use zeros
-                            output_signals[block.id] = np.zeros_like(time_array)
-                    
-                    elif block.block_type == 'FR':
-                        # Process FR block (same as FAA)
-                        if input_signal is not None:
-                            # Get FR parameters from block
-                            fc = block.filter_params.get('cutoff_frequency', 1000)  # Default cutoff frequency
-                            print(f"Applying FR filter with fc={fc} Hz")
-                            # Convert to frequency domain
-                            signal_fft = np.fft.rfft(input_signal)
-                            # Calculate frequency bins
-                            freqs = np.fft.rfftfreq(len(input_signal), 1/44100)  # Use default sampling rate
-                            # Apply filter
-                            signal_fft[freqs > fc] = 0
-                            # Convert back to time domain
-                            return np.fft.irfft(signal_fft, len(input_signal))
-                        else:
-                            # If no input signal, use zeros
-                            return np.zeros_like(input_signal)
-                    
-                    elif block.block_type in ['S&H', 'A.Switch']:
-                        # Process Sample & Hold or Analog Switch
-                        if input_signal is not None:
-                            print(f"Processing {block.block_type} with input and clock signals")
-                            output_signals[block.id] = block.process_signal(input_signal, clock_signal)
-                        else:
-                            output_signals[block.id] = np.zeros_like(time_array)
-                    
-                    elif block.block_type == 'Adder':
-                        # Process adder with multiple input signals
-                        if input_signals:
-                            print(f"Processing Adder with {len(input_signals)} input signals")
-                            output_signals[block.id] = block.process_signal(input_signals)
-                        else:
-                            output_signals[block.id] = np.zeros_like(time_array)
-                            
-                    else:
-                        # Generic processing for other block types
-                        if input_signal is not None:
-                            output_signals[block.id] = block.process_signal(input_signal, None)
-                        else:
-                            output_signals[block.id] = np.zeros_like(time_array)
-                    
-                    processed.add(block.id)
-                    blocks_processed_this_round.append(block)
-                    print(f"Processed block {block.id} (type: {block.block_type})")
-            
-            # Remove processed blocks from the list
-            for block in blocks_processed_this_round:
-                remaining_blocks.remove(block)
-            
-            print(f"Blocks processed this round: {len(blocks_processed_this_round)}")
-            print(f"Remaining blocks: {len(remaining_blocks)}")
-            
-            # If no blocks were processed in this round and there are still remaining blocks,
-            # there might be a cyclic dependency or disconnected blocks
-            if not blocks_processed_this_round and remaining_blocks:
-                print("Warning: Could not process all blocks. Check for cycles or disconnected blocks.")
-                break
-        
-        # Gather input signals from all connected ports
-        for block in all_blocks:
-            # Create a list to store input signals for this block
-            block_inputs = []
-            
-            for port in block.input_ports:
-                for conn in port.connections:
-                    # Find the source port
-                    if conn.end_port == port:
-                        source_port = conn.start_port
-                    else:
-                        source_port = conn.end_port
-                        
-                    source_block = source_port.parentItem()
-                    if source_block.id in processed:
-                        # Store the connection info
-                        block_inputs.append(output_signals[source_block.id])
+                        source_port = conn.start_port if conn.end_port == port else conn.end_port
+                        graph["connections"].append({"source": source_port.parentItem().id,
+                                                     "target": block.id,
+                                                     "port": index,
+                                                     "clock": is_clock})
+        return graph
+    
+    def save_graph(self):
+        path, _ = QFileDialog.getSaveFileName(self, "Save Block Diagram", "", "Graph files (*.json)")
+        if path:
+            graph_io.save_graph(self.snapshot_graph(), path)
+    
+    def load_graph(self):
+        path, _ = QFileDialog.getOpenFileName(self, "Load Block Diagram", "", "Graph files (*.json)")
+        if not path:
+            return
+        try:
+            graph = graph_io.load_graph(path)
+        except (OSError, ValueError, KeyError) as e:
+            QMessageBox.critical(self, "Load Error", f"Could not load {path}:\n{e}")
+            return
+        
+        self.scene.clear()
+        
+        # Block ids are regenerated, so keep a map from the saved ids
+        blocks_by_id = {}
+        for data in graph["blocks"]:
+            block = Block(data["type"], data.get("x", 0), data.get("y", 0))
+            block.set_params(data["params"])
+            self.scene.addItem(block)
+            blocks_by_id[data["id"]] = block
+        
+        for conn in graph["connections"]:
+            source = blocks_by_id[conn["source"]]
+            target = blocks_by_id[conn["target"]]
+            ports = target.clock_ports if conn["clock"] else target.input_ports
+            if not source.output_ports or conn["port"] >= len(ports):
+                logger.warning("skipping invalid connection", extra={"fields": conn})
+                continue
             
-            # Store the input signals for visualization
-            if block_inputs:
-                input_connections[block.id] = block_inputs[0] if len(block_inputs) == 1 else block_inputs
-        
-        # Show the output signals
-        print(f"Showing output signals for {len(output_signals)} blocks")
-        
-        # Dictionary to store block types and parameters for plotting
-        block_info = {}
-        for block in all_blocks:
-            block_info[block.id] = {'type': block.block_type}
-            if block.block_type == 'Signal':
-                block_info[block.id]['params'] = block.signal_params
-            elif block.block_type == 'FAA':
-                block_info[block.id]['params'] = block.filter_params
-            elif block.block_type == 'Clock':
-                block_info[block.id]['params'] = block.clock_params
-            elif block.block_type == 'Noise':
-                block_info[block.id]['params'] = block.noise_params
-                
-        # Pass raw input signals to the viewer for visualization
-        viewer = SignalViewerDialog(output_signals, time_array, block_info=block_info, 
-                                  raw_input_signals=raw_input_signals)
+            # Create permanent connection and add it to both ports
+            new_connection = Connection(source.output_ports[0], ports[conn["port"]])
+            self.scene.addItem(new_connection)
+            source.output_ports[0].connections.append(new_connection)
+            ports[conn["port"]].connections.append(new_connection)
+    
+    def run_simulation(self):
+        # Only one simulation at a time
+        if self.worker is not None and self.worker.isRunning():
+            return
+        
+        graph = self.snapshot_graph()
+        if not graph["blocks"]:
+            logger.warning("no blocks to simulate")
+            return
+        
+        # Progress dialog with a cancel button while the worker runs
+        self.progress_dialog = QProgressDialog("Running simulation...", "Cancel", 0, 0, self)
+        self.progress_dialog.setWindowTitle("Simulation")
+        self.progress_dialog.setWindowModality(Qt.WindowModality.WindowModal)
+        self.progress_dialog.setMinimumDuration(0)
+        self.progress_dialog.setAutoClose(False)
+        self.progress_dialog.setAutoReset(False)
+        
+        profiler = Profiler() if self.profile_action.isChecked() else NULL_PROFILER
+        store = SignalStore(spill_bytes=self.spill_limit_mb * 2**20)
+        self.worker = SimulationWorker(graph, self.sampling_rate, self.sim_duration, self, profiler, store)
+        self.worker.progress.connect(self.on_simulation_progress)
+        self.worker.result_ready.connect(self.on_simulation_finished)
+        self.worker.failed.connect(self.on_simulation_failed)
+        self.worker.finished.connect(self.on_worker_finished)
+        self.progress_dialog.canceled.connect(self.worker.requestInterruption)
+        
+        self.run_action.setEnabled(False)
+        self.worker.start()
+    
+    def on_simulation_progress(self, phase, done, total, message):
+        self.progress_dialog.setLabelText(f"{phase}: {message}")
+        self.progress_dialog.setMaximum(total)
+        self.progress_dialog.setValue(done)
+    
+    def on_simulation_finished(self, result, specs):
+        self.progress_dialog.close()
+        # The viewer keeps profiling (lazy renders, PNG export), so the profiler
+        # is taken from the worker and reported once the viewer is closed
+        profiler, self.worker.profiler = self.worker.profiler, NULL_PROFILER
+        # The viewer gets the worker's arrays directly, nothing is copied
+        viewer = SignalViewerDialog(result.output_signals, result.time_array,
+                                    block_info=result.block_info,
+                                    raw_input_signals=result.raw_input_signals,
+                                    plot_specs=specs, sampling_rate=self.sampling_rate,
+                                    graph=self.worker.graph, profiler=profiler)
+        # exec() only returns once the viewer's exports have finished
         viewer.exec()
+        if profiler is not NULL_PROFILER:
+            self.report_profile(profiler)
+    
+    def report_profile(self, profiler):
+        """Print the timings of a profiled run and save its trace"""
+        profiler.stop()
+        print(profiler.summary())
+        os.makedirs("signal_plots", exist_ok=True)
+        timestamp = datetime.datetime.now().strftime("%Y-%m-%d_%H-%M-%S")
+        path = f"signal_plots/profile_{timestamp}.json"
+        profiler.save_trace(path)
+        logger.info("profile trace saved", extra={"fields": {"path": path}})
+    
+    def on_simulation_failed(self, message):
+        self.progress_dialog.close()
+        QMessageBox.critical(self, "Simulation Error", message)
+    
+    def on_worker_finished(self):
+        # Also reached when the run was cancelled
+        self.progress_dialog.close()
+        if self.worker.profiler is not NULL_PROFILER:
+            self.worker.profiler.stop()
+        self.run_action.setEnabled(True)
+        self.worker = None
     
     def eventFilter(self, obj, event):
         if event.type() == event.Type.KeyPress and event.key() == Qt.Key.Key_Delete:
@@ -913,7 +843,7 @@ class SignalConfigDialog(QDialog):
         # Number of sinusoidal components
         form_layout = QFormLayout()
         self.n_components_spin = QSpinBox()
-        self.n_components_spin.setRange(1, 10)
+        self.n_components_spin.setRange(1, 64)
         self.n_components_spin.setValue(self.signal_params["n_components"])
         self.n_components_spin.valueChanged.connect(self.update_frequency_fields)
         form_layout.addRow("Number of components:", self.n_components_spin)
@@ -927,10 +857,14 @@ class SignalConfigDialog(QDialog):
         
         layout.addLayout(form_layout)
         
-        # Frequencies input
-        self.freq_layout = QFormLayout()
-        layout.addWidget(QLabel("Frequencies (Hz):"))
-        layout.addLayout(self.freq_layout)
+        # Frequency, relative amplitude and phase of each component (scrollable for many tones)
+        freq_widget = QWidget()
+        self.freq_layout = QFormLayout(freq_widget)
+        scroll = QScrollArea()
+        scroll.setWidgetResizable(True)
+        scroll.setWidget(freq_widget)
+        layout.addWidget(QLabel("Components (frequency, relative amplitude, phase):"))
+        layout.addWidget(scroll)
         
         # Create initial frequency fields
         self.freq_spinboxes = []
@@ -952,7 +886,11 @@ class SignalConfigDialog(QDialog):
             self.freq_layout.itemAt(i).widget().setParent(None)
         
         self.freq_spinboxes = []
+        self.weight_spinboxes = []
+        self.phase_spinboxes = []
         n_components = self.n_components_spin.value()
+        weights = self.signal_params.get("amplitudes") or []
+        phases = self.signal_params.get("phases") or []
         
         # Create/update frequency fields
         for i in range(n_components):
@@ -965,21 +903,46 @@ class SignalConfigDialog(QDialog):
                 freq_spin.setValue(self.signal_params["frequencies"][i])
             else:
                 freq_spin.setValue(1000 * (i + 1))  # Default to multiples of 1000Hz
-                
+            
+            weight_spin = QDoubleSpinBox()
+            weight_spin.setRange(0, 10)
+            weight_spin.setSingleStep(0.1)
+            weight_spin.setValue(weights[i] if i < len(weights) else 1.0)
+            
+            phase_spin = QDoubleSpinBox()
+            phase_spin.setRange(-360, 360)
+            phase_spin.setSuffix("°")
+            phase_spin.setValue(phases[i] if i < len(phases) else 0.0)
+            
+            row = QWidget()
+            row_layout = QHBoxLayout(row)
+            row_layout.setContentsMargins(0, 0, 0, 0)
+            row_layout.addWidget(freq_spin)
+            row_layout.addWidget(weight_spin)
+            row_layout.addWidget(phase_spin)
+            
             self.freq_spinboxes.append(freq_spin)
-            self.freq_layout.addRow(f"Frequency {i+1}:", freq_spin)
+            self.weight_spinboxes.append(weight_spin)
+            self.phase_spinboxes.append(phase_spin)
+            self.freq_layout.addRow(f"Component {i+1}:", row)
     
     def get_parameters(self):
         n_components = self.n_components_spin.value()
         frequencies = [spin.value() for spin in self.freq_spinboxes[:n_components]]
+        amplitudes = [spin.value() for spin in self.weight_spinboxes[:n_components]]
+        phases = [spin.value() for spin in self.phase_spinboxes[:n_components]]
         amplitude = self.amplitude_spin.value()
-        return {"n_components": n_components, "frequencies": frequencies, "amplitude": amplitude}
+        return {"n_components": n_components, "frequencies": frequencies, "amplitude": amplitude,
+                "amplitudes": amplitudes, "phases": phases}
 
 
 class FAAConfigDialog(QDialog):
-    def __init__(self, parent=None, filter_params=None):
+    def __init__(self, parent=None, filter_params=None, block_type='FAA'):
         super().__init__(parent)
-        self.setWindowTitle("Configure Antialiasing Filter")
+        if block_type == 'FR':
+            self.setWindowTitle("Configure Reconstruction Filter")
+        else:
+            self.setWindowTitle("Configure Antialiasing Filter")
         self.filter_params = filter_params or {"cutoff_frequency": 5000}
         
         layout = QVBoxLayout(self)
@@ -991,7 +954,20 @@ class FAAConfigDialog(QDialog):
         self.cutoff_spin.setSuffix(" Hz")
         self.cutoff_spin.setValue(self.filter_params["cutoff_frequency"])
         form_layout.addRow("Cutoff frequency:", self.cutoff_spin)
+        
+        # Ideal brick wall or causal analog approximation
+        self.type_combo = QComboBox()
+        self.type_combo.addItems(filters.FILTER_TYPES)
+        self.type_combo.setCurrentText(self.filter_params.get("filter_type", "ideal"))
+        self.type_combo.currentTextChanged.connect(self.update_order_field)
+        form_layout.addRow("Filter type:", self.type_combo)
+        
+        self.order_spin = QSpinBox()
+        self.order_spin.setRange(1, 12)
+        self.order_spin.setValue(self.filter_params.get("order", filters.DEFAULT_ORDER))
+        form_layout.addRow("Order:", self.order_spin)
         layout.addLayout(form_layout)
+        self.update_order_field(self.type_combo.currentText())
         
         # Buttons
         button_layout = QHBoxLayout()
@@ -1003,8 +979,13 @@ class FAAConfigDialog(QDialog):
         button_layout.addWidget(cancel_button)
         layout.addLayout(button_layout)
     
+    def update_order_field(self, filter_type):
+        self.order_spin.setEnabled(filter_type != "ideal")
+    
     def get_parameters(self):
-        return {"cutoff_frequency": self.cutoff_spin.value()}
+        return {"cutoff_frequency": self.cutoff_spin.value(),
+                "filter_type": self.type_combo.currentText(),
+                "order": self.order_spin.value()}
 
 
 class ClockConfigDialog(QDialog):
@@ -1057,447 +1038,341 @@ class ClockConfigDialog(QDialog):
             "phase": self.phase_spin.value()
         }
 
+class HoldConfigDialog(QDialog):
+    """S&H model: ideal staircase or closed-form hold with aperture, droop and settling"""
+    def __init__(self, parent=None, sh_params=None):
+        super().__init__(parent)
+        self.setWindowTitle("Configure Sample and Hold")
+        self.sh_params = sh_params or {"mode": "time"}
+        
+        layout = QVBoxLayout(self)
+        form_layout = QFormLayout()
+        
+        self.mode_combo = QComboBox()
+        self.mode_combo.addItems(hold.HOLD_MODES)
+        self.mode_combo.setCurrentText(self.sh_params.get("mode", "time"))
+        form_layout.addRow("Model:", self.mode_combo)
+        
+        # Times are edited in microseconds and stored in seconds
+        self.time_spins = {}
+        for key, label in [("aperture", "Aperture:"), ("droop_tau", "Droop time constant (0 = none):"),
+                           ("settling_tau", "Settling time constant:")]:
+            spin = QDoubleSpinBox()
+            spin.setRange(0, 1e6)
+            spin.setDecimals(3)
+            spin.setSuffix(" µs")
+            spin.setValue(self.sh_params.get(key, 0.0) * 1e6)
+            self.time_spins[key] = spin
+            form_layout.addRow(label, spin)
+        
+        layout.addLayout(form_layout)
+        
+        # Only the spectral model uses the hold parameters
+        self.mode_combo.currentTextChanged.connect(self.update_fields)
+        self.update_fields(self.mode_combo.currentText())
+        
+        # Buttons
+        button_layout = QHBoxLayout()
+        ok_button = QPushButton("OK")
+        cancel_button = QPushButton("Cancel")
+        ok_button.clicked.connect(self.accept)
+        cancel_button.clicked.connect(self.reject)
+        button_layout.addWidget(ok_button)
+        button_layout.addWidget(cancel_button)
+        layout.addLayout(button_layout)
+    
+    def update_fields(self, mode):
+        for spin in self.time_spins.values():
+            spin.setEnabled(mode == "spectral")
+    
+    def get_parameters(self):
+        params = {"mode": self.mode_combo.currentText()}
+        for key, spin in self.time_spins.items():
+            params[key] = spin.value() * 1e-6
+        return params
+
+class PlotExportWorker(QThread):
+    """Saves the PNGs of every block in worker processes"""
+    progress = pyqtSignal(int, int, str)
+    done = pyqtSignal(str, object)      # output dir, plot files
+    failed = pyqtSignal(str)
+    
+    def __init__(self, specs, signals, time_array, raw_input_signals, parent=None, profiler=NULL_PROFILER):
+        super().__init__(parent)
+        self.specs = specs
+        self.signals = signals
+        self.time_array = time_array
+        self.raw_input_signals = raw_input_signals
+        self.profiler = profiler
+    
+    def run(self):
+        try:
+            output_dir = plots.make_output_dir()
+            plot_files = plots.export_plots(self.specs, self.signals, self.time_array,
+                                            self.raw_input_signals, output_dir,
+                                            progress=self.progress.emit, profiler=self.profiler)
+        except Exception as e:
+            self.failed.emit(f"{type(e).__name__}: {e}")
+            return
+        self.done.emit(output_dir, plot_files)
+
+class DataExportWorker(QThread):
+    """Writes the simulated signals and their metadata to an NPZ or HDF5 file"""
+    done = pyqtSignal(str)              # output path
+    failed = pyqtSignal(str)
+    
+    def __init__(self, result, path, graph, sampling_rate, parent=None):
+        super().__init__(parent)
+        self.result = result
+        self.path = path
+        self.graph = graph
+        self.sampling_rate = sampling_rate
+    
+    def run(self):
+        try:
+            export.write_results(self.result, self.path, graph=self.graph,
+                                 sampling_rate=self.sampling_rate)
+        except Exception as e:
+            self.failed.emit(f"{type(e).__name__}: {e}")
+            return
+        self.done.emit(self.path)
+
 class SignalViewerDialog(QDialog):
     def __init__(self, signals=None, time_array=None, parent=None, block_info=None, 
-                 raw_input_signals=None):
+                 raw_input_signals=None, plot_specs=None, sampling_rate=44100, graph=None,
+                 profiler=NULL_PROFILER):
         super().__init__(parent)
         self.setWindowTitle("Signal Viewer")
-        self.setMinimumSize(400, 200)
+        self.setMinimumSize(900, 700)
         
         # Store signals and time array
         self.signals = {} if signals is None else signals  # Dict of {block_id: signal_data}
         self.time_array = np.linspace(0, 1, 1000) if time_array is None else time_array
         self.block_info = block_info or {}  # Dict of block information
         self.raw_input_signals = raw_input_signals or {}  # Dict of raw input signals for each block
-        
-        # Create timestamp for this simulation run
-        timestamp = datetime.datetime.now().strftime("%Y-%m-%d_%H-%M-%S")
-        
-        # Create a unique folder for this simulation run
-        self.output_dir = f"signal_plots/sim_{timestamp}"
-        os.makedirs(self.output_dir, exist_ok=True)
+        self.sampling_rate = sampling_rate
+        self.graph = graph  # Block diagram that produced the signals (saved with exported data)
+        self.profiler = profiler  # Times the lazy renders and the PNG export ("viewer" phase)
+        
+        # Plot specs are normally computed by the simulation worker
+        if plot_specs is None:
+            plot_specs = plots.compute_plot_specs(self.signals, self.time_array, self.block_info,
+                                                  self.raw_input_signals, fs=sampling_rate)
+        self.plot_specs = plot_specs
+        
+        # Rendered plots, filled in as blocks get selected
+        self.pixmaps = {}
+        self.export_worker = None
+        self.data_export_worker = None
+        self.pending_result = None  # Close requested while an export was running
         
         # Main layout
         layout = QVBoxLayout(self)
         
-        # Information label
-        self.label = QLabel(f"Plots saved to {self.output_dir} directory")
-        layout.addWidget(self.label)
-        
-        # List of generated files
-        self.file_list = QLabel()
-        layout.addWidget(self.file_list)
-        
-        # Signal list
         if not self.signals:
             layout.addWidget(QLabel("No signals to display"))
-        else:
-            signal_list = QLabel(f"Generated plots for {len(self.signals)} signals:")
-            layout.addWidget(signal_list)
-            
-            file_list_text = ""
-            
-            # Save plots for each signal
-            for block_id, signal_data in self.signals.items():
-                # Get block type and parameters for better naming
-                block_type = self.block_info.get(block_id, {}).get('type', "Unknown")
-                block_params = self.block_info.get(block_id, {}).get('params', {})
-                
-                # Create descriptive filename based on block type and parameters
-                param_info = ""
-                if block_type == 'Signal':
-                    freqs = block_params.get('frequencies', [])
-                    if freqs:
-                        param_info = f"{len(freqs)}freqs_{freqs[0]}Hz"
-                elif block_type == 'FAA':
-                    param_info = f"fc_{block_params.get('cutoff_frequency', 0)}Hz"
-                elif block_type == 'Clock':
-                    param_info = f"{block_params.get('frequency', 0)}Hz"
-                elif block_type == 'Noise':
-                    param_info = f"amp_{block_params.get('peak_to_peak', 1.0)}"
-                
-                # Create a unique and descriptive filename
-                if param_info:
-                    filename = f"{self.output_dir}/{block_type}_{param_info}.png"
-                else:
-                    filename = f"{self.output_dir}/{block_type}_{block_id[-6:]}.png"  # Use last 6 chars of ID
-                
-                # Create figure
-                fig, (ax1, ax2) = plt.subplots(2, 1, figsize=(10, 8))
-                
-                # Plot time domain - output signal first
-                ax1.plot(self.time_array, signal_data, 'b-', linewidth=2.0, label='Output')
-                
-                # For S&H blocks, also plot the input signal as a dashed line
-                if block_type in ['S&H', 'A.Switch'] and block_id in self.raw_input_signals:
-                    # Get the original input signal (first one if multiple)
-                    if self.raw_input_signals[block_id]:
-                        input_signal = self.raw_input_signals[block_id][0]
-                        
-                        # Plot the full original input signal
-                        ax1.plot(self.time_array, input_signal, 
-                                'r--',        # Red dashed line
-                                linewidth=1.5, # Slightly thicker
-                                alpha=0.7,     # Semi-transparent
-                                label='Input')
-                        
-                        ax1.legend()
-                
-                ax1.set_title(f"{block_type} - Time Domain{' - ' + param_info if param_info else ''}")
-                ax1.set_xlabel("Time (s)")
-                ax1.set_ylabel("Amplitude")
-                ax1.grid(True)
-                
-                # Adjust time domain display based on block type
-                if block_type == 'Signal':
-                    # Try to show 2-3 cycles for signal blocks
-                    try:
-                        freq = block_params.get('frequencies', [1000])[0]
-                        period = 1.0 / freq
-                        # Show 3 cycles
-                        display_time = 3 * period
-                        # Find index closest to display_time
-                        idx = min(len(self.time_array), max(1, int(display_time / (self.time_array[1] - self.time_array[0]))))
-                        ax1.set_xlim(0, self.time_array[idx-1])
-                    except (IndexError, ZeroDivisionError):
-                        # Default view if error
-                        pass
-                
-                elif block_type == 'FAA':
-                    # For FAA blocks, show time domain based on minimum frequency
-                    # First identify if there's frequency content
-                    if len(signal_data) > 0:
-                        # Compute FFT to find significant frequency components
-                        n = len(signal_data)
-                        fft_result = np.abs(np.fft.rfft(signal_data)) / n
-                        freqs = np.fft.rfftfreq(n, 1/44100)
-                        
-                        # Find frequencies with significant magnitude (above 1% of max)
-                        threshold = np.max(fft_result) * 0.01
-                        significant_freqs = freqs[fft_result > threshold]
-                        
-                        if len(significant_freqs) > 0:
-                            # Find minimum significant frequency (exclude near-zero DC component)
-                            min_freq = significant_freqs[significant_freqs > 10][0] if len(significant_freqs[significant_freqs > 10]) > 0 else 1000
-                            period = 1.0 / min_freq
-                            # Show 3 cycles of the minimum frequency
-                            display_time = 3 * period
-                            # Find index closest to display_time
-                            idx = min(len(self.time_array), max(1, int(display_time / (self.time_array[1] - self.time_array[0]))))
-                            ax1.set_xlim(0, self.time_array[idx-1])
-                            ax1.set_title(f"{block_type} (fc={block_params.get('cutoff_frequency', 'N/A')} Hz) - Time Domain")
-                
-                elif block_type == 'Clock':
-                    # Show a few cycles for clock blocks too
-                    try:
-                        freq = block_params.get('frequency', 1000)
-                        period = 1.0 / freq
-                        # Show 3 cycles
-                        display_time = 3 * period
-                        # Find index closest to display_time
-                        idx = min(len(self.time_array), max(1, int(display_time / (self.time_array[1] - self.time_array[0]))))
-                        ax1.set_xlim(0, self.time_array[idx-1])
-                    except (IndexError, ZeroDivisionError):
-                        # Default view if error
-                        pass
-                
-                elif block_type == 'S&H':
-                    # For S&H, show 3 cycles of the input signal (not the sampling frequency)
-                    try:
-                        # Find the fundamental frequency of the signal
-                        n = len(signal_data)
-                        fft_result = np.abs(np.fft.rfft(signal_data)) / n
-                        freqs = np.fft.rfftfreq(n, 1/44100)
-                        
-                        # Find significant peaks, excluding DC (first bin)
-                        peak_threshold = np.max(fft_result[1:]) * 0.1  # 10% of max non-DC
-                        peak_indices = np.where(fft_result[1:] > peak_threshold)[0] + 1  # Add 1 to account for skipping DC
-                        
-                        if len(peak_indices) > 0:
-                            # Find the lowest significant frequency peak (fundamental)
-                            sorted_peaks = sorted([(freqs[i], fft_result[i]) for i in peak_indices], key=lambda x: x[0])
-                            min_freq = sorted_peaks[0][0]
-                            
-                            # Make sure we have a reasonable frequency
-                            if min_freq < 10:  # If freq is too low, might be noise
-                                min_freq = 100  # Default to 100Hz
-                        else:
-                            # If no clear peaks, try to use connected clock info as fallback
-                            clock_freq = None
-                            for other_id, other_info in self.block_info.items():
-                                if other_info.get('type') == 'Clock' and other_id in block_info:
-                                    clock_freq = other_info.get('params', {}).get('frequency')
-                                    break
-                                    
-                            # Calculate a reasonable input frequency (half the clock is common)
-                            min_freq = clock_freq / 2 if clock_freq else 100  # Default to 100Hz
-                        
-                        # Calculate time to show 3 cycles of the input frequency
-                        period = 1.0 / min_freq
-                        display_time = 3 * period
-                        
-                        # Find index closest to display_time
-                        idx = min(len(self.time_array), max(1, int(display_time / (self.time_array[1] - self.time_array[0]))))
-                        ax1.set_xlim(0, self.time_array[idx-1])
-                        
-                        # Add annotation about input and sampling frequencies
-                        sampling_freq = clock_freq if 'clock_freq' in locals() else "unknown"
-                        ax1.set_title(f"{block_type} - Time Domain (Input={min_freq:.1f}Hz, Fs={sampling_freq}Hz){' - ' + param_info if param_info else ''}")
-                    except (IndexError, ZeroDivisionError, ValueError):
-                        # Default view if error
-                        pass
-                
-                # Compute and plot frequency domain (simple FFT)
-                if len(signal_data) > 0:
-                    n = len(signal_data)
-                    fft_result = np.abs(np.fft.rfft(signal_data)) / n
-                    freqs = np.fft.rfftfreq(n, 1/44100)  # Use default sampling rate
-                    
-                    # Plot frequency domain with block-specific limits
-                    ax2.plot(freqs, fft_result)
-                    ax2.set_title(f"{block_type} - Frequency Domain{' - ' + param_info if param_info else ''}")
-                    ax2.set_xlabel("Frequency (Hz)")
-                    ax2.set_ylabel("Magnitude")
-                    ax2.grid(True)
-                    
-                    # Adjust frequency domain display based on block type
-                    if block_type == 'FAA':
-                        # For FAA blocks, show up to cutoff frequency + 50%
-                        try:
-                            fc = block_params.get('cutoff_frequency', 5000)
-                            ax2.set_xlim(0, fc * 1.5)  # Show up to 150% of cutoff frequency
-                            
-                            # Add a vertical line at the cutoff frequency
-                            ax2.axvline(x=fc, color='r', linestyle='--', label=f'Cutoff: {fc} Hz')
-                            ax2.legend()
-                        except (TypeError, ValueError):
-                            # Default view if error
-                            pass
-                    
-                    elif block_type == 'Clock':
-                        # For clock blocks, show the first 7 harmonics
-                        try:
-                            freq = block_params.get('frequency', 1000)
-                            ax2.set_xlim(0, freq * 7)  # Show 7 harmonics
-                            
-                            # Mark the fundamental and harmonics
-                            for i in range(1, 8):
-                                harmonic = freq * i
-                                if i == 1:
-                                    ax2.axvline(x=harmonic, color='r', linestyle='--', 
-                                               label=f'Fundamental: {harmonic} Hz')
-                                else:
-                                    ax2.axvline(x=harmonic, color='g', linestyle=':', 
-                                               alpha=0.5, label=f'Harmonic {i}: {harmonic} Hz')
-                            ax2.legend()
-                        except (TypeError, ValueError):
-                            # Default view if error
-                            pass
-                    
-                    elif block_type == 'Signal':
-                        # For signal blocks, show twice the highest frequency component
-                        try:
-                            freqs_list = block_params.get('frequencies', [1000])
-                            max_freq = max(freqs_list) if freqs_list else 1000
-                            ax2.set_xlim(0, max_freq * 2)
-                            
-                            # Mark each frequency component
-                            for i, component_freq in enumerate(freqs_list):
-                                ax2.axvline(x=component_freq, color='r', linestyle='--', 
-                                          label=f'Component {i+1}: {component_freq} Hz')
-                            ax2.legend()
-                        except (TypeError, ValueError):
-                            # Default view if error
-                            pass
-                    
-                    elif block_type == 'S&H':
-                        # For S&H, show multiple replicas of the spectrum to visualize the sampling effect
-                        try:
-                            # Find corresponding clock block
-                            clock_freq = None
-                            # Look through all blocks to find connected clock
-                            for other_id, other_info in self.block_info.items():
-                                if other_info.get('type') == 'Clock' and other_id in block_info:
-                                    clock_freq = other_info.get('params', {}).get('frequency')
-                                    break
-                            
-                            if not clock_freq:
-                                # If no clock found, try to estimate from spectral content
-                                # Find peaks in the spectrum
-                                peak_indices = np.argsort(fft_result)[-10:]  # Get indices of top 10 peaks
-                                peak_freqs = [freqs[idx] for idx in peak_indices if idx < len(freqs)]
-                                
-                                if peak_freqs:
-                                    # Try to find regular spacing between peaks (clock frequency)
-                                    peak_diffs = np.diff(sorted(peak_freqs))
-                                    if len(peak_diffs) > 0:
-                                        # Use the most common difference as estimate of clock frequency
-                                        clock_freq = np.median(peak_diffs)
-                                    else:
-                                        clock_freq = 1000  # Default
-                                else:
-                                    clock_freq = 1000  # Default
-                            
-                            # Show 4x the clock frequency to see multiple replicas
-                            ax2.set_xlim(0, clock_freq * 4.5)
-                            
-                            # Draw vertical lines at the clock frequency and its multiples
-                            for i in range(1, 5):
-                                harmonic = clock_freq * i
-                                if i == 1:
-                                    ax2.axvline(x=harmonic, color='r', linestyle='--', 
-                                               label=f'Clock: {harmonic:.1f} Hz')
-                                else:
-                                    ax2.axvline(x=harmonic, color='g', linestyle=':', 
-                                               alpha=0.7, label=f'{i}×Clock: {harmonic:.1f} Hz')
-                            
-                            # Sinc envelope visualization is removed, but processing is still applied
-                            
-                            ax2.legend()
-                            ax2.set_title(f"{block_type} - Frequency Domain (with spectral replicas){' - ' + param_info if param_info else ''}")
-                        except (IndexError, ValueError):
-                            ax2.set_xlim(0, 5000)  # Default range
-                    
-                    elif block_type == 'A.Switch':
-                        # For A.Switch, show 3 cycles of the input signal's minimum frequency
-                        try:
-                            # Find the fundamental frequency of the input signal
-                            if block_id in self.raw_input_signals:
-                                input_signal = self.raw_input_signals[block_id][0]  # Use the first input signal
-                                n = len(input_signal)
-                                fft_result = np.abs(np.fft.rfft(input_signal)) / n
-                                freqs = np.fft.rfftfreq(n, 1/44100)
-
-                                # Find significant peaks, excluding DC (first bin)
-                                peak_threshold = np.max(fft_result[1:]) * 0.1  # 10% of max non-DC
-                                peak_indices = np.where(fft_result[1:] > peak_threshold)[0] + 1  # Add 1 to account for skipping DC
-
-                                if len(peak_indices) > 0:
-                                    # Find the lowest significant frequency peak (fundamental)
-                                    sorted_peaks = sorted([(freqs[i], fft_result[i]) for i in peak_indices], key=lambda x: x[0])
-                                    min_freq = sorted_peaks[0][0]
-
-                                    # Make sure we have a reasonable frequency
-                                    if min_freq < 10:  # If freq is too low, might be noise
-                                        min_freq = 100  # Default to 100Hz
-                                    else:
-                                        min_freq = 100  # Default to 100Hz
-
-                                # Calculate time to show 3 cycles of the input frequency
-                                period = 1.0 / min_freq
-                                display_time = 3 * period
-
-                                # Find index closest to display_time
-                                idx = min(len(self.time_array), max(1, int(display_time / (self.time_array[1] - self.time_array[0]))))
-                                ax1.set_xlim(0, self.time_array[idx-1])
-
-                                ax1.set_title(f"{block_type} - Time Domain (Input={min_freq:.1f}Hz){' - ' + param_info if param_info else ''}")
-                        except (IndexError, ZeroDivisionError, ValueError):
-                            # Default view if error
-                            pass
-                    
-                    elif block_type == 'Adder':
-                        # For Adder blocks, try to show a reasonable frequency range
-                        try:
-                            # Find peak frequencies in the spectrum
-                            peak_indices = np.argsort(fft_result)[-5:]  # Get indices of top 5 peaks
-                            if len(peak_indices) > 0:
-                                highest_freq = max(freqs[idx] for idx in peak_indices if idx < len(freqs))
-                                ax2.set_xlim(0, highest_freq * 1.5)  # Show 1.5x the highest peak frequency
-                                
-                                # Mark the most significant peak frequencies
-                                for i, idx in enumerate(reversed(peak_indices)):
-                                    if idx < len(freqs):
-                                        ax2.axvline(x=freqs[idx], color='r' if i == 0 else 'g', 
-                                                   linestyle='--', alpha=0.7,
-                                                   label=f'Peak {i+1}: {freqs[idx]:.1f} Hz')
-                                ax2.legend()
-                            else:
-                                ax2.set_xlim(0, 10000)  # Default range
-                            
-                            # In time domain, show four cycles of the lowest frequency from both inputs
-                            if block_id in self.raw_input_signals:
-                                # Get both input signals
-                                input_signals = self.raw_input_signals[block_id]
-                                
-                                # Find the lowest frequency in each input signal
-                                min_freqs = []
-                                for input_signal in input_signals:
-                                    if input_signal is not None:
-                                        n = len(input_signal)
-                                        fft_result = np.abs(np.fft.rfft(input_signal)) / n
-                                        freqs = np.fft.rfftfreq(n, 1/44100)
-                                        
-                                        # Find significant peaks, excluding DC (first bin)
-                                        peak_threshold = np.max(fft_result[1:]) * 0.1  # 10% of max non-DC
-                                        peak_indices = np.where(fft_result[1:] > peak_threshold)[0] + 1
-                                        
-                                        if len(peak_indices) > 0:
-                                            # Find the lowest significant frequency peak
-                                            sorted_peaks = sorted([(freqs[i], fft_result[i]) for i in peak_indices], key=lambda x: x[0])
-                                            min_freq = sorted_peaks[0][0]
-                                            
-                                            # Make sure we have a reasonable frequency
-                                            if min_freq >= 10:  # Only consider frequencies above 10 Hz
-                                                min_freqs.append(min_freq)
-                                
-                                if min_freqs:
-                                    # Use the lowest frequency among all inputs
-                                    lowest_freq = min(min_freqs)
-                                    period = 1.0 / lowest_freq
-                                    # Show 4 cycles
-                                    display_time = 4 * period
-                                    # Find index closest to display_time
-                                    idx = min(len(self.time_array), max(1, int(display_time / (self.time_array[1] - self.time_array[0]))))
-                                    ax1.set_xlim(0, self.time_array[idx-1])
-                                    
-                                    # Add annotation about the frequency
-                                    ax1.set_title(f"{block_type} - Time Domain (4 cycles of {lowest_freq:.1f}Hz){' - ' + param_info if param_info else ''}")
-                        except (IndexError, ZeroDivisionError, ValueError):
-                            # Default view if error
-                            pass
-                    
-                    elif block_type == 'Noise':
-                        # For Noise blocks, show a wide spectrum
-                        try:
-                            # Show up to Nyquist frequency (half of sampling rate)
-                            nyquist = 44100 / 2  # Assuming 44.1 kHz sampling rate
-                            ax2.set_xlim(0, nyquist)
-                            
-                            # Add peak-to-peak annotation
-                            peak_to_peak = block_params.get('peak_to_peak', 1.0)
-                            ax2.set_title(f"{block_type} (Amp={peak_to_peak}) - Frequency Domain{' - ' + param_info if param_info else ''}")
-                            
-                            # In time domain, show appropriate amplitude range
-                            ax1.set_ylim(-peak_to_peak/2, peak_to_peak/2)
-                            ax1.set_title(f"{block_type} (Amp={peak_to_peak}) - Time Domain{' - ' + param_info if param_info else ''}")
-                        except (TypeError, ValueError):
-                            # Default view if error
-                            pass
-                    
-                    else:
-                        # Generic display for other block types
-                        # Limit to a reasonable range (e.g., 10 kHz)
-                        ax2.set_xlim(0, 10000)
-                
-                plt.tight_layout()
-                plt.savefig(filename)
-                plt.close(fig)
-                
-                file_list_text += f"{block_type} {param_info}: {os.path.basename(filename)}\n"
-            
-            # Show list of generated files
-            self.file_list.setText(file_list_text)
         
-        # Close button
+        # Block list on the left, plot of the selected block on the right
+        splitter = QSplitter(Qt.Orientation.Horizontal)
+        self.block_list = QListWidget()
+        for block_id, spec in self.plot_specs.items():
+            item = QListWidgetItem(spec['description'])
+            item.setData(Qt.ItemDataRole.UserRole, block_id)
+            self.block_list.addItem(item)
+        self.block_list.currentItemChanged.connect(self.show_selected_plot)
+        splitter.addWidget(self.block_list)
+        
+        self.plot_label = QLabel("Select a block to plot its signals")
+        self.plot_label.setAlignment(Qt.AlignmentFlag.AlignCenter)
+        splitter.addWidget(self.plot_label)
+        splitter.setStretchFactor(1, 1)
+        layout.addWidget(splitter)
+        
+        # Information label
+        self.label = QLabel(f"{len(self.signals)} signals simulated")
+        layout.addWidget(self.label)
+        
+        # Buttons
+        button_layout = QHBoxLayout()
+        self.export_button = QPushButton("Export PNGs")
+        self.export_button.clicked.connect(self.export_plots)
+        self.export_button.setEnabled(bool(self.plot_specs))
+        self.export_data_button = QPushButton("Export Data")
+        self.export_data_button.clicked.connect(self.export_data)
+        self.export_data_button.setEnabled(bool(self.signals))
         self.close_button = QPushButton("Close")
         self.close_button.clicked.connect(self.accept)
-        layout.addWidget(self.close_button)
+        button_layout.addWidget(self.export_button)
+        button_layout.addWidget(self.export_data_button)
+        button_layout.addWidget(self.close_button)
+        layout.addLayout(button_layout)
         
-        # Show a message box
+        if self.block_list.count():
+            self.block_list.setCurrentRow(0)
+    
+    def show_selected_plot(self, current, previous=None):
+        if current is None:
+            return
+        block_id = current.data(Qt.ItemDataRole.UserRole)
+        
+        # Render only the first time a block is selected
+        if block_id not in self.pixmaps:
+            spec = self.plot_specs[block_id]
+            inputs = self.raw_input_signals.get(block_id)
+            samples = len(self.signals[block_id])
+            with self.profiler.section("viewer", "phase", samples=samples), \
+                    self.profiler.section(f"render {str(block_id)[-6:]}", "viewer", samples=samples):
+                figure = plots.render_figure(spec, self.signals[block_id], self.time_array,
+                                             inputs[0] if inputs else None)
+                buffer = io.BytesIO()
+                figure.savefig(buffer, format='png')
+            pixmap = QPixmap()
+            pixmap.loadFromData(buffer.getvalue(), "PNG")
+            self.pixmaps[block_id] = pixmap
+        
+        self.plot_label.setPixmap(self.pixmaps[block_id].scaled(
+            self.plot_label.size(), Qt.AspectRatioMode.KeepAspectRatio,
+            Qt.TransformationMode.SmoothTransformation))
+    
+    def export_plots(self):
+        self.export_button.setEnabled(False)
+        self.label.setText("Exporting plots...")
+        self.export_worker = PlotExportWorker(self.plot_specs, self.signals, self.time_array,
+                                              self.raw_input_signals, self, self.profiler)
+        self.export_worker.progress.connect(
+            lambda done, total, msg: self.label.setText(f"Exported {done}/{total}: {msg}"))
+        self.export_worker.done.connect(self.on_export_done)
+        self.export_worker.failed.connect(self.on_export_failed)
+        self.export_worker.finished.connect(self.close_if_pending)
+        self.export_worker.start()
+    
+    def exports_running(self):
+        return any(worker is not None and worker.isRunning()
+                   for worker in (self.export_worker, self.data_export_worker))
+    
+    def wait_for_exports(self):
+        """Block until the PNG and data exports still running have finished"""
+        for worker in (self.export_worker, self.data_export_worker):
+            if worker is not None:
+                worker.wait()
+    
+    def on_export_done(self, output_dir, plot_files):
+        self.export_button.setEnabled(True)
+        self.label.setText(f"Plots saved to {output_dir} directory")
+        if self.pending_result is not None:
+            return
         QMessageBox.information(self, "Plots Generated", 
-                              f"Signal plots have been saved to the '{self.output_dir}' directory.\n"
-                              f"Total signals processed: {len(self.signals)}")
+                              f"Signal plots have been saved to the '{output_dir}' directory.\n"
+                              f"Total signals processed: {len(plot_files)}")
+    
+    def export_data(self):
+        path, _ = QFileDialog.getSaveFileName(self, "Export Signals", "",
+                                              "NPZ files (*.npz);;HDF5 files (*.h5 *.hdf5)")
+        if not path:
+            return
+        self.export_data_button.setEnabled(False)
+        self.label.setText(f"Exporting signals to {path}...")
+        result = engine.SimulationResult(self.time_array, self.signals, self.raw_input_signals,
+                                         self.block_info)
+        self.data_export_worker = DataExportWorker(result, path, self.graph, self.sampling_rate, self)
+        self.data_export_worker.done.connect(self.on_data_export_done)
+        self.data_export_worker.failed.connect(self.on_export_failed)
+        self.data_export_worker.finished.connect(self.close_if_pending)
+        self.data_export_worker.start()
+    
+    def on_data_export_done(self, path):
+        self.export_data_button.setEnabled(True)
+        self.label.setText(f"Signals saved to {path}")
+    
+    def on_export_failed(self, message):
+        self.export_button.setEnabled(True)
+        self.export_data_button.setEnabled(True)
+        self.label.setText("Export failed")
+        QMessageBox.critical(self, "Export Error", message)
+    
+    def done(self, result):
+        # Do not leave an export running after the dialog closes: the window
+        # stays responsive, showing the export progress, and closes once it ends
+        if self.exports_running():
+            self.pending_result = result
+            self.close_button.setEnabled(False)
+            self.close_button.setText("Closing after export...")
+            return
+        self.wait_for_exports()
+        super().done(result)
+    
+    def close_if_pending(self):
+        if self.pending_result is not None and not self.exports_running():
+            self.done(self.pending_result)
+
+class FanInConfigDialog(QDialog):
+    """Number of inputs and input weights (Adder) or gain (Multiplier)"""
+    def __init__(self, parent=None, fan_in_params=None, block_type='Adder'):
+        super().__init__(parent)
+        self.setWindowTitle(f"Configure {block_type}")
+        self.block_type = block_type
+        self.fan_in_params = fan_in_params or {"n_inputs": 2}
+        
+        layout = QVBoxLayout(self)
+        form_layout = QFormLayout()
+        
+        self.n_inputs_spin = QSpinBox()
+        self.n_inputs_spin.setRange(1, 32)
+        self.n_inputs_spin.setValue(self.fan_in_params.get("n_inputs", 2))
+        form_layout.addRow("Number of inputs:", self.n_inputs_spin)
+        
+        if block_type == 'Multiplier':
+            self.gain_spin = QDoubleSpinBox()
+            self.gain_spin.setRange(-100, 100)
+            self.gain_spin.setSingleStep(0.1)
+            self.gain_spin.setValue(self.fan_in_params.get("gain", 1.0))
+            form_layout.addRow("Gain:", self.gain_spin)
+        layout.addLayout(form_layout)
+        
+        # One weight per input of the adder
+        self.weight_spinboxes = []
+        if block_type == 'Adder':
+            weight_widget = QWidget()
+            self.weight_layout = QFormLayout(weight_widget)
+            scroll = QScrollArea()
+            scroll.setWidgetResizable(True)
+            scroll.setWidget(weight_widget)
+            layout.addWidget(QLabel("Input weights:"))
+            layout.addWidget(scroll)
+            self.n_inputs_spin.valueChanged.connect(self.update_weight_fields)
+            self.update_weight_fields()
+        
+        # Buttons
+        button_layout = QHBoxLayout()
+        ok_button = QPushButton("OK")
+        cancel_button = QPushButton("Cancel")
+        ok_button.clicked.connect(self.accept)
+        cancel_button.clicked.connect(self.reject)
+        button_layout.addWidget(ok_button)
+        button_layout.addWidget(cancel_button)
+        layout.addLayout(button_layout)
+    
+    def update_weight_fields(self):
+        weights = [spin.value() for spin in self.weight_spinboxes] or self.fan_in_params.get("weights", [])
+        for i in reversed(range(self.weight_layout.count())):
+            self.weight_layout.itemAt(i).widget().setParent(None)
+        
+        self.weight_spinboxes = []
+        for i in range(self.n_inputs_spin.value()):
+            weight_spin = QDoubleSpinBox()
+            weight_spin.setRange(-100, 100)
+            weight_spin.setSingleStep(0.1)
+            weight_spin.setValue(weights[i] if i < len(weights) else 1.0)
+            self.weight_spinboxes.append(weight_spin)
+            self.weight_layout.addRow(f"In{i+1}:", weight_spin)
+    
+    def get_parameters(self):
+        params = {"n_inputs": self.n_inputs_spin.value()}
+        if self.block_type == 'Multiplier':
+            params["gain"] = self.gain_spin.value()
+        else:
+            params["weights"] = [spin.value() for spin in self.weight_spinboxes]
+        return params
 
 class NoiseConfigDialog(QDialog):
     def __init__(self, parent=None, noise_params=None):
@@ -1516,7 +1391,36 @@ class NoiseConfigDialog(QDialog):
         self.peak_to_peak_spin.setValue(self.noise_params["peak_to_peak"])
         form_layout.addRow("Peak-to-peak amplitude:", self.peak_to_peak_spin)
         
+        # Noise color
+        self.type_combo = QComboBox()
+        self.type_combo.addItems(noise.NOISE_TYPES)
+        self.type_combo.setCurrentText(self.noise_params.get("noise_type", "white"))
+        self.type_combo.currentTextChanged.connect(self.update_band_fields)
+        form_layout.addRow("Noise type:", self.type_combo)
+        
+        # Band limits of band noise
+        self.low_freq_spin = QDoubleSpinBox()
+        self.low_freq_spin.setRange(0, 100000)
+        self.low_freq_spin.setSuffix(" Hz")
+        self.low_freq_spin.setValue(self.noise_params.get("low_frequency", 100.0))
+        form_layout.addRow("Low frequency:", self.low_freq_spin)
+        
+        self.high_freq_spin = QDoubleSpinBox()
+        self.high_freq_spin.setRange(1, 100000)
+        self.high_freq_spin.setSuffix(" Hz")
+        self.high_freq_spin.setValue(self.noise_params.get("high_frequency", 5000.0))
+        form_layout.addRow("High frequency:", self.high_freq_spin)
+        
+        # Seed for reproducible runs (lowest value means a new signal every run)
+        self.seed_spin = QSpinBox()
+        self.seed_spin.setRange(-1, 2**31 - 1)
+        self.seed_spin.setSpecialValueText("Random")
+        seed = self.noise_params.get("seed")
+        self.seed_spin.setValue(-1 if seed is None else seed)
+        form_layout.addRow("Seed:", self.seed_spin)
+        
         layout.addLayout(form_layout)
+        self.update_band_fields(self.type_combo.currentText())
         
         # Buttons
         button_layout = QHBoxLayout()
@@ -1528,13 +1432,31 @@ class NoiseConfigDialog(QDialog):
         button_layout.addWidget(cancel_button)
         layout.addLayout(button_layout)
     
+    def update_band_fields(self, noise_type):
+        self.low_freq_spin.setEnabled(noise_type == "band")
+        self.high_freq_spin.setEnabled(noise_type == "band")
+    
+    def accept(self):
+        if self.type_combo.currentText() == "band":
+            try:
+                noise.check_band(self.low_freq_spin.value(), self.high_freq_spin.value(), blocks.DEFAULT_FS)
+            except ValueError as e:
+                QMessageBox.warning(self, "Invalid Band", str(e))
+                return
+        super().accept()
+    
     def get_parameters(self):
+        seed = self.seed_spin.value()
         return {
             "peak_to_peak": self.peak_to_peak_spin.value(),
-            "noise_type": "white"  # Only white noise for now
+            "noise_type": self.type_combo.currentText(),
+            "seed": None if seed < 0 else seed,
+            "low_frequency": self.low_freq_spin.value(),
+            "high_frequency": self.high_freq_spin.value()
         }
 
 if __name__ == '__main__':
+    logs.configure()
     app = QApplication(sys.argv)
     
     # Create and display the splash screen with a further scaled logo
@@ -0,0 +1,174 @@
+"""
+Headless batch runner for block diagrams saved as JSON.
+
+Runs the same engine as the GUI, without Qt, and writes every block output to
+a chunked NPZ or HDF5 file (see sim.export). Parameter sweeps run in parallel
+worker processes.
+
+Usage (from the gui/ folder):
+    python -m sim.batch graph.json -o results.npz
+    python -m sim.batch graph.json -o sweep/ --sweep Clock.frequency=1000,2000,5000
+    python -m sim.batch graph.json -o sweep/ --sweep FAA.cutoff_frequency=3000,5000 --workers 4
+    python -m sim.batch graph.json -o results.h5
+    python -m sim.batch graph.json -o sweep/ --sweep Clock.frequency=1000,2000 --format h5
+    python -m sim.batch graph.json -o results.npz --profile --trace --log-level debug
+    python -m sim.batch graph.json -o results.npz --duration 60 --float32 --spill-mb 512 --keep FR
+
+--profile prints the time, throughput and memory of every block; --trace also
+writes a Chrome trace (<output>.trace.json) next to each output file.
+
+For long runs, --float32 halves the memory of the signals, --spill-mb moves
+signals to memory-mapped files past that many MB in RAM, and --keep saves only
+the listed blocks (ids or types) so intermediates are freed during the run.
+"""
+
+import argparse
+import logging
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+
+from sim import blocks, engine, export, graph_io, logs
+from sim.profiler import NULL_PROFILER, Profiler
+from sim.store import SignalStore
+
+logger = logging.getLogger(__name__)
+
+
+def parse_value(text):
+    """Parse a sweep value as int or float when possible"""
+    try:
+        value = float(text)
+    except ValueError:
+        return text
+    return int(value) if value.is_integer() else value
+
+
+def parse_sweep(spec):
+    """Parse 'TARGET.PARAM=v1,v2,...' into (target, param, [values])"""
+    try:
+        name, values = spec.split("=", 1)
+        target, param = name.rsplit(".", 1)
+    except ValueError:
+        raise argparse.ArgumentTypeError(
+            f"Invalid sweep '{spec}', expected TARGET.PARAM=v1,v2,...")
+    return target, param, [parse_value(v) for v in values.split(",") if v]
+
+
+def trace_path(output_path):
+    """Trace file written next to an output file"""
+    return os.path.splitext(output_path)[0] + ".trace.json"
+
+
+def run_graph(graph, output_path, sampling_rate=blocks.DEFAULT_FS, duration=1.0,
+              profile=False, trace=False, float32=False, spill_mb=None, keep=None):
+    """
+    Simulate one graph and write its outputs.
+
+    Returns (path, elapsed seconds, profile summary). The summary is None
+    unless `profile` or `trace` is set; `trace` also writes the trace file.
+    `keep` lists the block ids or types to save (default: all).
+    """
+    profiler = Profiler() if profile or trace else NULL_PROFILER
+    store = SignalStore(np.float32 if float32 else np.float64,
+                        spill_bytes=None if spill_mb is None else int(spill_mb * 2**20))
+    if keep is not None:
+        keep = {block["id"] for target in keep for block in graph_io.match_blocks(graph, target)}
+    start = time.perf_counter()
+    result = engine.simulate(graph, sampling_rate, duration, profiler=profiler, store=store, keep=keep)
+    with profiler.section("export", "phase", samples=len(result.time_array) * len(result.output_signals)):
+        export.write_results(result, output_path, graph=graph, sampling_rate=sampling_rate)
+    elapsed = time.perf_counter() - start
+
+    if profiler is NULL_PROFILER:
+        return output_path, elapsed, None
+    profiler.stop()
+    if trace:
+        profiler.save_trace(trace_path(output_path))
+    return output_path, elapsed, profiler.summary()
+
+
+def _run_job(job):
+    # Module level so it can be pickled for the process pool
+    graph, path, sampling_rate, duration, options, log_level = job
+    logs.configure(log_level)
+    return run_graph(graph, path, sampling_rate, duration, **options)
+
+
+def sweep_jobs(graph, sweep, output_dir, sampling_rate, duration, log_level=None,
+               extension="npz", **options):
+    """
+    Build one (graph, path, fs, duration, options, log level) job per sweep
+    value; `options` are the keyword arguments of run_graph.
+    """
+    target, param, values = sweep
+    stem = f"{target}_{param}".replace("&", "").replace(".", "")
+    jobs = []
+    for value in values:
+        swept = graph_io.with_param(graph, target, param, value)
+        path = os.path.join(output_dir, f"{stem}_{value}.{extension}")
+        jobs.append((swept, path, sampling_rate, duration, options, log_level))
+    return jobs
+
+
+def _print_run(path, elapsed, summary):
+    print(f"Saved {path} ({elapsed:.2f} s)")
+    if summary is not None:
+        print(summary)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run a tp1 block diagram without the GUI")
+    parser.add_argument("graph", help="graph JSON file saved from the simulator")
+    parser.add_argument("-o", "--output", required=True,
+                        help="output file (.npz or .h5), or output folder when sweeping")
+    parser.add_argument("--fs", type=float, default=blocks.DEFAULT_FS, help="sampling rate (Hz)")
+    parser.add_argument("--duration", type=float, default=1.0, help="simulated time (s)")
+    parser.add_argument("--format", choices=["npz", "h5"], default="npz",
+                        help="file format of the sweep outputs (default: npz)")
+    parser.add_argument("--sweep", type=parse_sweep,
+                        help="sweep a parameter: TARGET.PARAM=v1,v2,... where TARGET "
+                             "is a block id or type (e.g. Clock.frequency=1000,2000)")
+    parser.add_argument("--workers", type=int, default=None,
+                        help="worker processes for sweeps (default: CPU count)")
+    parser.add_argument("--log-level", default=None,
+                        help=f"debug, info, warning or error (default: ${logs.LOG_LEVEL_ENV} or warning)")
+    parser.add_argument("--profile", action="store_true",
+                        help="print per block time, throughput and memory")
+    parser.add_argument("--trace", action="store_true",
+                        help="write a Chrome trace next to each output file")
+    parser.add_argument("--float32", action="store_true",
+                        help="store signals in single precision")
+    parser.add_argument("--spill-mb", type=float, default=None,
+                        help="spill signals to memory-mapped files past this many MB in RAM")
+    parser.add_argument("--keep", type=lambda text: [t for t in text.split(",") if t],
+                        help="comma separated block ids or types to save (default: all)")
+    args = parser.parse_args(argv)
+
+    logs.configure(args.log_level)
+    if args.sweep is None:
+        # Checked before simulating, so a bad output name does not waste the run
+        try:
+            export.check_path(args.output)
+        except ValueError as e:
+            parser.error(str(e))
+    graph = graph_io.load_graph(args.graph)
+    options = {"profile": args.profile, "trace": args.trace, "float32": args.float32,
+               "spill_mb": args.spill_mb, "keep": args.keep}
+
+    if args.sweep is None:
+        _print_run(*run_graph(graph, args.output, args.fs, args.duration, **options))
+        return
+
+    os.makedirs(args.output, exist_ok=True)
+    jobs = sweep_jobs(graph, args.sweep, args.output, args.fs, args.duration,
+                      log_level=args.log_level, extension=args.format, **options)
+    logger.info("sweep started", extra={"fields": {"points": len(jobs), "workers": args.workers}})
+    with ProcessPoolExecutor(max_workers=args.workers) as pool:
+        for run in pool.map(_run_job, jobs):
+            _print_run(*run)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,166 @@
+"""
+Signal processing for every block type of the sampling circuit simulator.
+
+These functions only depend on numpy so they can run outside the Qt GUI thread
+(simulation worker, batch runs). The `Block` graphics item delegates to them.
+"""
+
+import numpy as np
+
+from sim.clock import clock_edges, clock_from_params, high_mask
+from sim.filters import sos_from_params, StreamingFilter
+from sim.hold import sample_and_hold_spectral
+from sim.noise import generator_from_params
+from sim.oscillators import bank_from_params
+from sim.spectrum import get_spectrum
+
+# Default sampling rate assumed by the block models
+DEFAULT_FS = 44100
+
+# Blocks combining any number of inputs ("n_inputs" parameter)
+FAN_IN_TYPES = ['Adder', 'Multiplier']
+
+
+def generate_signal(signal_params, t):
+    """Generate a sum of sinusoids from the Signal block parameters (see sim.oscillators)"""
+    bank = bank_from_params(signal_params)
+    if len(t) < 2:
+        return bank.evaluate(t)
+    # The simulation time grid is uniform
+    return bank.sample(t[0], (t[-1] - t[0]) / (len(t) - 1), len(t))
+
+
+def generate_noise(noise_params, t, fs=DEFAULT_FS):
+    """Generate a noise signal based on the Noise block parameters (see sim.noise)"""
+    return generator_from_params(noise_params, fs).generate(len(t))
+
+
+def generate_clock(clock_params, t):
+    """Generate a square clock signal (dense 0/1 samples) based on the Clock block parameters"""
+    return clock_from_params(clock_params, t).dense()
+
+
+def generate_source(block_type, params, t, fs=DEFAULT_FS):
+    """
+    Generate the output of a source block (Signal, Clock or Noise). Clocks
+    are returned as a ClockSignal (edge list, dense samples on demand).
+    """
+    if block_type == 'Signal':
+        return generate_signal(params, t)
+    elif block_type == 'Clock':
+        return clock_from_params(params, t)
+    elif block_type == 'Noise':
+        return generate_noise(params, t, fs)
+
+    # Default return empty signal
+    return np.zeros_like(t)
+
+
+def ideal_lowpass(input_signal, fc, fs=DEFAULT_FS):
+    """Ideal (brick wall) low-pass filter applied in the frequency domain"""
+    # The input spectrum is shared with the viewer through the spectrum cache
+    spectrum = get_spectrum(input_signal, fs)
+    # Apply filter (the cached spectrum is read-only, so this builds a new array)
+    signal_fft = np.where(spectrum.freqs > fc, 0, spectrum.fft)
+    # Convert back to time domain
+    return np.fft.irfft(signal_fft, len(input_signal))
+
+
+def lowpass_filter(input_signal, filter_params, fs=DEFAULT_FS):
+    """FAA/FR filter: ideal brick wall or a causal analog model (see sim.filters)"""
+    sos = sos_from_params(filter_params, fs)
+    if sos is None:
+        return ideal_lowpass(input_signal, filter_params["cutoff_frequency"], fs)
+    # The filter starts at rest, like the circuit when the simulation starts
+    return StreamingFilter(sos).process(input_signal)
+
+
+def sample_and_hold(input_signal, clock_signal):
+    """
+    Sample the input on every rising clock edge and hold it until the next one.
+    `clock_signal` is a ClockSignal or sampled clock; the output is 0 before the first edge.
+    """
+    rising, _, _ = clock_edges(clock_signal)
+    # Held values (0 before the first edge) repeated over each hold interval
+    held = np.zeros(len(rising) + 1, dtype=input_signal.dtype)
+    held[1:] = input_signal[rising]
+    hold_lengths = np.diff(np.concatenate(([0], rising, [len(input_signal)])))
+    output_signal = np.repeat(held, hold_lengths)
+
+    # Note: We're no longer applying the sinc envelope in the frequency domain
+    # The staircase pattern in the time domain already correctly represents
+    # sample-and-hold behavior, and applying the sinc transform was distorting it
+
+    return output_signal
+
+
+def analog_switch(input_signal, clock_signal):
+    """Let the input through only while the clock is high (ClockSignal or sampled clock)"""
+    # When clock is low, output remains zero
+    output_signal = np.zeros_like(input_signal)
+    np.copyto(output_signal, input_signal, where=high_mask(clock_signal, len(input_signal)))
+    return output_signal
+
+
+def fan_in(input_signals, weights=None, mode="sum", gain=1.0):
+    """
+    Combine the signals of an N-input block in a single reduction: the
+    weighted sum `weights @ inputs` (Adder) or the product of the inputs
+    times `gain` (Multiplier/mixer). Unconnected ports (None) are skipped;
+    `weights` is indexed by port.
+    """
+    connected = [(port, sig) for port, sig in enumerate(input_signals) if sig is not None]
+    if not connected:
+        return np.array([])
+    lengths = {len(sig) for _, sig in connected}
+    if len(lengths) > 1:
+        # If signals have different lengths, return zeros
+        return np.zeros_like(connected[0][1])
+
+    if len(connected) == 1:
+        port, sig = connected[0]
+        scale = gain if mode == "product" else (weights[port] if weights and port < len(weights) else 1.0)
+        # A single unscaled input is passed through without a copy
+        return sig if scale == 1.0 else scale * sig
+
+    # One (inputs x samples) stack, then one BLAS/ufunc reduction over all inputs
+    stack = np.stack([sig for _, sig in connected])
+    if mode == "product":
+        output = np.prod(stack, axis=0)
+        if gain != 1.0:
+            output *= gain
+        return output
+    port_weights = np.array([weights[port] if weights and port < len(weights) else 1.0
+                             for port, _ in connected], dtype=stack.dtype)
+    return port_weights @ stack
+
+
+def process_signal(block_type, params, input_signal, clock_signal=None, fs=DEFAULT_FS):
+    """Process an input signal based on block type and parameters"""
+    if block_type in ['FAA', 'FR']:
+        return lowpass_filter(input_signal, params, fs)
+
+    elif block_type == 'S&H':
+        if clock_signal is not None:
+            if params.get("mode", "time") == "spectral":
+                # Aperture, droop and settling in closed form (see sim.hold)
+                return sample_and_hold_spectral(input_signal, clock_signal, params, fs)
+            return sample_and_hold(input_signal, clock_signal)
+        # If no clock signal, just pass through
+        return input_signal
+
+    elif block_type == 'A.Switch':
+        if clock_signal is not None:
+            return analog_switch(input_signal, clock_signal)
+        # If no clock signal, just pass through
+        return input_signal
+
+    elif block_type in FAN_IN_TYPES:
+        # N-input blocks get the list of their port signals (None for unconnected ports)
+        signals = input_signal if isinstance(input_signal, list) else [input_signal]
+        if block_type == 'Multiplier':
+            return fan_in(signals, mode="product", gain=params.get("gain", 1.0))
+        return fan_in(signals, weights=params.get("weights"))
+
+    # Default case - pass through
+    return input_signal
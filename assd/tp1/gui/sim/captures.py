@@ -0,0 +1,255 @@
+"""
+Loader for oscilloscope and network analyzer captures saved as CSV.
+
+Handles the formats in the measurement folders:
+
+  - Digilent WaveForms exports: `#Key: value` header lines (sample rate,
+    device, trigger, channel ranges...), a blank line and a column header
+    such as `Time (s),Channel 1 (V)`.
+  - Scope exports with a names row and a units row (`x-axis,1,2` /
+    `second,Volt,Volt`); missing values are empty fields.
+  - Bode tables with a `#, Frequency (Hz), ...` column header.
+
+The numeric block is parsed in one vectorized `np.loadtxt` call (empty fields
+become nan). The parsed data is cached next to the CSV as a `.npy` file plus
+a JSON sidecar with the metadata; later loads memory-map the array and only
+re-parse when the CSV modification time or size changes:
+
+    capture = load_capture("mediciones_tp1_assd/oscilador100k.csv")
+    capture.sample_rate, capture.time, capture.channel(1)
+
+    captures = load_directory("mediciones_tp1_assd")   # parallel first parse
+"""
+
+import glob
+import io
+import json
+import os
+import re
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+
+CACHE_DIR_NAME = ".capture_cache"
+CACHE_VERSION = 1
+TIME_UNITS = ("s", "second")
+
+# Empty CSV fields (",," or a trailing ",") are read as nan
+_EMPTY_FIELD = re.compile(r"(?<=,)(?=,|\r?$)|^(?=,)", re.MULTILINE)
+# "Channel 1 (V)" -> ("Channel 1", "V")
+_NAME_UNIT = re.compile(r"^\s*(.*?)\s*\(([^)]*)\)\s*$")
+_NUMBER_UNIT = re.compile(r"^\s*([-+]?[\d.]+(?:[eE][-+]?\d+)?)\s*([a-zA-Z]*)")
+_SI_PREFIXES = {"": 1.0, "k": 1e3, "M": 1e6, "G": 1e9, "m": 1e-3, "u": 1e-6, "n": 1e-9}
+
+
+class Capture:
+    """Columns of a capture (memory-mapped when loaded from the cache) and its metadata"""
+
+    def __init__(self, path, data, columns, units, metadata):
+        self.path = path
+        self.data = data              # (samples, columns) array
+        self.columns = columns        # column names
+        self.units = units            # column units ('' when unknown)
+        self.metadata = metadata      # {key: value} from the '#Key: value' header lines
+
+    @property
+    def name(self):
+        return os.path.splitext(os.path.basename(self.path))[0]
+
+    @property
+    def time(self):
+        """First column (time for scope captures, frequency for bode tables)"""
+        return self.data[:, 0]
+
+    def channel(self, number):
+        """Column `number` (1 is the first column after time/frequency)"""
+        return self.data[:, number]
+
+    @property
+    def n_channels(self):
+        return self.data.shape[1] - 1
+
+    @property
+    def sample_rate(self):
+        """Sample rate from the header, or from the time column spacing (None for bode tables)"""
+        if "Sample rate" in self.metadata:
+            rate = parse_quantity(self.metadata["Sample rate"])
+            if rate:
+                return rate
+        if self.units[0] not in TIME_UNITS:
+            return None
+        time = self.time
+        valid = time[np.isfinite(time)]
+        if len(valid) < 2:
+            return None
+        return (len(valid) - 1) / (valid[-1] - valid[0])
+
+
+def parse_quantity(text):
+    """Number with an optional SI prefix and unit: '62.5kHz' -> 62500.0 (None if not a number)"""
+    match = _NUMBER_UNIT.match(text)
+    if match is None:
+        return None
+    value, unit = match.groups()
+    prefix = unit[0] if len(unit) > 1 and unit[0] in _SI_PREFIXES else ""
+    return float(value) * _SI_PREFIXES[prefix]
+
+
+def _is_numeric_row(line):
+    field = line.split(",", 1)[0].strip()
+    try:
+        float(field)
+    except ValueError:
+        return False
+    return True
+
+
+def _split_header(text):
+    """Split a CSV into (metadata, header rows, numeric body)"""
+    metadata = {}
+    header_rows = []
+    lines = text.splitlines(keepends=True)
+    for index, line in enumerate(lines):
+        stripped = line.strip()
+        if not stripped:
+            continue
+        if stripped.startswith("#") and not stripped.startswith("#,"):
+            key, _, value = stripped[1:].partition(":")
+            if value:
+                metadata[key.strip()] = value.strip()
+            continue
+        if _is_numeric_row(stripped):
+            return metadata, header_rows, "".join(lines[index:])
+        header_rows.append([field.strip() for field in stripped.lstrip("#").split(",")])
+    return metadata, header_rows, ""
+
+
+def _column_names(header_rows, n_columns):
+    """Column names and units from the header rows (both CSV styles)"""
+    names = [f"column {i}" for i in range(n_columns)]
+    units = [""] * n_columns
+    if header_rows:
+        for i, field in enumerate(header_rows[0][:n_columns]):
+            match = _NAME_UNIT.match(field)
+            if match:
+                names[i], units[i] = match.groups()
+            elif field:
+                names[i] = field
+    if len(header_rows) > 1:
+        # Scope exports: separate units row
+        for i, unit in enumerate(header_rows[1][:n_columns]):
+            units[i] = unit
+    if not header_rows or not header_rows[0][0]:
+        names[0] = "index"
+    return names, units
+
+
+def parse_csv(path):
+    """Parse a capture CSV without using the cache"""
+    with open(path, "rb") as f:
+        raw = f.read()
+    # Some exports write the degree sign in Latin-1
+    try:
+        text = raw.decode("utf-8")
+    except UnicodeDecodeError:
+        text = raw.decode("latin-1")
+
+    metadata, header_rows, body = _split_header(text)
+    if body:
+        data = np.loadtxt(io.StringIO(_EMPTY_FIELD.sub("nan", body)), delimiter=",", ndmin=2)
+    else:
+        data = np.empty((0, len(header_rows[0]) if header_rows else 0))
+    columns, units = _column_names(header_rows, data.shape[1])
+    return Capture(path, data, columns, units, metadata)
+
+
+def _cache_paths(path, cache_dir=None):
+    directory = cache_dir or os.path.join(os.path.dirname(os.path.abspath(path)), CACHE_DIR_NAME)
+    stem = os.path.basename(path)
+    return os.path.join(directory, stem + ".npy"), os.path.join(directory, stem + ".json")
+
+
+def _source_stamp(path):
+    stat = os.stat(path)
+    return {"mtime_ns": stat.st_mtime_ns, "size": stat.st_size}
+
+
+def _read_cache(path, cache_dir=None):
+    npy_path, json_path = _cache_paths(path, cache_dir)
+    try:
+        with open(json_path, "r", encoding="utf-8") as f:
+            sidecar = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if sidecar.get("version") != CACHE_VERSION or sidecar.get("source") != _source_stamp(path):
+        return None
+    try:
+        data = np.load(npy_path, mmap_mode="r")
+    except (OSError, ValueError):
+        return None
+    return Capture(path, data, sidecar["columns"], sidecar["units"], sidecar["metadata"])
+
+
+def _write_cache(capture, cache_dir=None):
+    npy_path, json_path = _cache_paths(capture.path, cache_dir)
+    os.makedirs(os.path.dirname(npy_path), exist_ok=True)
+    sidecar = {"version": CACHE_VERSION, "source": _source_stamp(capture.path),
+               "columns": capture.columns, "units": capture.units, "metadata": capture.metadata}
+    # Both files are written under temporary names and renamed into place: an
+    # earlier Capture may still memory-map the old .npy, which must never be
+    # truncated. The sidecar is replaced last, so an interrupted write is never
+    # taken as valid.
+    _replace_file(npy_path, lambda f: np.save(f, capture.data), "wb")
+    _replace_file(json_path, lambda f: json.dump(sidecar, f, indent=1), "w", encoding="utf-8")
+
+
+def _replace_file(path, write, mode, encoding=None):
+    temp_path = f"{path}.{os.getpid()}.tmp"
+    try:
+        with open(temp_path, mode, encoding=encoding) as f:
+            write(f)
+        os.replace(temp_path, path)
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+
+
+def load_capture(path, cache_dir=None, use_cache=True):
+    """Load a capture, from the cache when it is up to date"""
+    if use_cache:
+        capture = _read_cache(path, cache_dir)
+        if capture is not None:
+            return capture
+    capture = parse_csv(path)
+    if use_cache:
+        try:
+            _write_cache(capture, cache_dir)
+        except OSError:
+            # Read-only folders still work, just without the cache
+            pass
+    return capture
+
+
+def _build_cache(args):
+    # Module level so it can be pickled for the process pool
+    path, cache_dir = args
+    if _read_cache(path, cache_dir) is None:
+        _write_cache(parse_csv(path), cache_dir)
+    return path
+
+
+def load_directory(directory, pattern="*.csv", cache_dir=None, max_workers=None):
+    """
+    Load every capture matching `pattern` in `directory` as {name: Capture}.
+    Files without an up to date cache are parsed in parallel worker processes.
+    """
+    paths = sorted(glob.glob(os.path.join(directory, pattern)))
+    stale = [path for path in paths if _read_cache(path, cache_dir) is None]
+    if len(stale) > 1 and max_workers != 1:
+        with ProcessPoolExecutor(max_workers=max_workers) as pool:
+            list(pool.map(_build_cache, [(path, cache_dir) for path in stale]))
+    captures = {}
+    for path in paths:
+        capture = load_capture(path, cache_dir)
+        captures[capture.name] = capture
+    return captures
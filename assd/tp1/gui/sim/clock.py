@@ -0,0 +1,133 @@
+"""
+Analytic clock signals for the Clock block.
+
+A square clock of frequency f, duty cycle d and phase φ is high on the
+intervals [(k - φ/2π) / f, (k - φ/2π + d) / f), so its edges are known in
+closed form. `ClockSignal` keeps them as lists of edge times and of the
+sample indices where the sampled clock changes level. Clocked blocks (S&H,
+A.Switch) work on these edge lists directly; the dense 0/1 array is only
+built when something asks for it (the viewer, a regular input port):
+
+    clock = clock_from_params({"frequency": 1000, "duty_cycle": 50, "phase": 0}, t)
+    rising, falling, initial = clock.edges()
+    samples = clock.dense()          # same values as blocks.generate_clock
+
+Sampled clocks (any signal wired to a clock port) are turned into the same
+edge lists with `clock_edges`.
+"""
+
+import numpy as np
+
+# Above this many edges per sample the clock is faster than the grid can
+# show, and scanning the dense array is cheaper than locating every edge
+MAX_EDGE_DENSITY = 0.25
+
+
+def _level(t, period, phase_cycles, duty):
+    """Clock level (bool) at the instants `t`; the formula of the dense clock"""
+    return ((t % period) / period + phase_cycles) % 1.0 < duty
+
+
+def _edges_from_levels(high):
+    """(rising, falling, initial level) sample indices of a boolean level array"""
+    if len(high) == 0:
+        return np.array([], dtype=np.intp), np.array([], dtype=np.intp), False
+    steps = np.diff(high.view(np.int8))
+    return np.flatnonzero(steps == 1) + 1, np.flatnonzero(steps == -1) + 1, bool(high[0])
+
+
+class ClockSignal:
+    """Square clock on the time grid `t`, described by its edges"""
+
+    def __init__(self, frequency, duty_cycle, phase, t):
+        self.frequency = float(frequency)
+        self.duty = duty_cycle / 100.0
+        self.phase = phase * np.pi / 180.0  # Convert to radians
+        self.period = 1.0 / self.frequency
+        self.t = t
+        self._edges = None
+        self._dense = None
+
+    def __len__(self):
+        return len(self.t)
+
+    def __array__(self, dtype=None, copy=None):
+        dense = self.dense()
+        return dense if dtype is None else dense.astype(dtype)
+
+    @property
+    def _phase_cycles(self):
+        return self.phase / (2 * np.pi)
+
+    def _edge_times(self, offset):
+        """Times (k - φ/2π + offset) * period within the time grid (plus one period on each side)"""
+        if len(self.t) == 0:
+            return np.array([])
+        first = np.ceil(self.t[0] / self.period + self._phase_cycles - offset) - 1
+        last = np.floor(self.t[-1] / self.period + self._phase_cycles - offset) + 1
+        return (np.arange(first, last + 1) - self._phase_cycles + offset) * self.period
+
+    def rising_times(self):
+        """Instants (s) where the clock goes high"""
+        return self._edge_times(0.0)
+
+    def falling_times(self):
+        """Instants (s) where the clock goes low"""
+        return self._edge_times(self.duty)
+
+    def level(self, index):
+        """Clock level (bool) at the given sample indices"""
+        return _level(self.t[index], self.period, self._phase_cycles, self.duty)
+
+    def edges(self):
+        """
+        (rising, falling, initial level): sample indices where the sampled
+        clock goes high / low, and its level at the first sample. Matches a
+        scan of the dense array, without building it.
+        """
+        if self._edges is None:
+            n = len(self.t)
+            rising_times, falling_times = self.rising_times(), self.falling_times()
+            if self._dense is not None or len(rising_times) + len(falling_times) > MAX_EDGE_DENSITY * n:
+                self._edges = _edges_from_levels(self.dense() > 0.5)
+            else:
+                self._edges = (self._transitions(rising_times, True), self._transitions(falling_times, False),
+                               bool(self.level(0)) if n else False)
+        return self._edges
+
+    def _transitions(self, times, rising):
+        """Sample indices of the level changes next to the analytic edge `times`"""
+        # Rounding can move an edge by one sample, so check the neighbors of each candidate
+        nearest = np.searchsorted(self.t, times)
+        candidates = np.unique((nearest[:, None] + np.arange(-1, 2)).ravel())
+        candidates = candidates[(candidates >= 1) & (candidates < len(self.t))]
+        before, after = self.level(candidates - 1), self.level(candidates)
+        changed = (~before & after) if rising else (before & ~after)
+        return candidates[changed]
+
+    def dense(self):
+        """0/1 samples of the clock on the time grid (built once, on demand)"""
+        if self._dense is None:
+            self._dense = np.where(_level(self.t, self.period, self._phase_cycles, self.duty), 1.0, 0.0)
+        return self._dense
+
+
+def clock_from_params(clock_params, t):
+    """ClockSignal of the Clock block parameters"""
+    return ClockSignal(clock_params["frequency"], clock_params["duty_cycle"], clock_params["phase"], t)
+
+
+def clock_edges(clock):
+    """(rising, falling, initial level) of a ClockSignal or of a sampled clock (high above 0.5)"""
+    if isinstance(clock, ClockSignal):
+        return clock.edges()
+    return _edges_from_levels(np.asarray(clock) > 0.5)
+
+
+def high_mask(clock, length):
+    """Boolean array that is True while the clock is high"""
+    rising, falling, initial = clock_edges(clock)
+    # Level changes alternate, so the segments between them alternate too
+    boundaries = np.sort(np.concatenate(([0], rising, falling, [length])))
+    levels = (np.arange(len(boundaries) - 1) + initial) % 2 == 1
+    return np.repeat(levels, np.diff(boundaries))
@@ -0,0 +1,253 @@
+"""
+Comparison of simulated block outputs against bench captures.
+
+For each capture, the matching block output is read from an exported result
+(see sim.export); only a window slightly longer than the capture is loaded.
+Both signals are resampled to a common rate (FFT resampling) and aligned by
+FFT cross-correlation. Then the error metrics are computed:
+
+    rms_error         RMS of the difference after alignment (V)
+    nrms_error        rms_error relative to the RMS of the capture
+    thd_capture/_sim  total harmonic distortion of each signal (ratio)
+    spectral_diff_db  mean |dB difference| of the windowed magnitude spectra,
+                      clipped 60 dB below their peaks, over the bins above
+                      the floor in either signal
+
+Usage (from the gui/ folder):
+    python -m sim.compare results.npz ../mediciones_tp1_assd/oscilador100k.csv --block Clock --channel 2
+    python -m sim.compare results.npz ../mediciones_tp1_assd --block FAA --csv metrics.csv
+    python -m sim.compare results.npz captures/ --map mapping.json --workers 4
+
+A mapping file assigns a block (id or type) and channel to each capture
+name: {"oscilador100k": {"block": "Clock", "channel": 2}, ...}.
+"""
+
+import argparse
+import csv
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+from scipy import signal as sps
+
+from sim import captures, export
+
+# Fraction of the capture length added on each side of the simulated window for the alignment search
+SEARCH_MARGIN = 1.0
+SPECTRAL_FLOOR_DB = -60.0
+MAX_HARMONICS = 20
+
+
+def finite(samples):
+    """Replace nan samples (empty CSV fields) by linear interpolation"""
+    samples = np.asarray(samples, dtype=float)
+    bad = ~np.isfinite(samples)
+    if not bad.any():
+        return samples
+    if bad.all():
+        return np.zeros_like(samples)
+    index = np.arange(len(samples))
+    samples = samples.copy()
+    samples[bad] = np.interp(index[bad], index[~bad], samples[~bad])
+    return samples
+
+
+def resample_to(samples, fs, rate):
+    """Resample `samples` from `fs` to `rate` (band-limited FFT resampling)"""
+    if np.isclose(fs, rate):
+        return np.asarray(samples, dtype=float)
+    count = max(int(round(len(samples) * rate / fs)), 1)
+    return sps.resample(samples, count)
+
+
+def align(reference, longer):
+    """
+    Offset of `longer` where it best matches `reference` (FFT cross-correlation
+    of the mean-removed signals); returns (offset, aligned slice of `longer`).
+    """
+    scores = sps.correlate(longer - np.mean(longer), reference - np.mean(reference),
+                           mode="valid", method="fft")
+    offset = int(np.argmax(scores))
+    return offset, longer[offset:offset + len(reference)]
+
+
+def _windowed_spectrum(samples):
+    window = np.hanning(len(samples))
+    return np.abs(np.fft.rfft((samples - np.mean(samples)) * window)) / np.sum(window)
+
+
+def thd(samples):
+    """Total harmonic distortion (ratio) from the largest spectral peak and its harmonics"""
+    magnitude = _windowed_spectrum(samples)
+    if len(magnitude) < 3:
+        return float("nan")
+    fundamental = int(np.argmax(magnitude[1:])) + 1
+    # Peak of each harmonic, allowing one bin of leakage on each side
+    harmonics = np.arange(2, MAX_HARMONICS + 1) * fundamental
+    harmonics = harmonics[harmonics + 1 < len(magnitude)]
+    if len(harmonics) == 0:
+        return 0.0
+    neighborhood = harmonics[:, None] + np.arange(-1, 2)
+    peaks = magnitude[neighborhood].max(axis=1)
+    base = magnitude[fundamental - 1:fundamental + 2].max()
+    return float(np.sqrt(np.sum(peaks ** 2)) / base)
+
+
+def _spectrum_db(samples):
+    """Windowed magnitude spectrum in dB, clipped SPECTRAL_FLOOR_DB below its peak"""
+    spectrum = 20 * np.log10(_windowed_spectrum(samples) + 1e-15)
+    return np.maximum(spectrum, spectrum.max() + SPECTRAL_FLOOR_DB)
+
+
+def spectral_difference_db(a, b):
+    """Mean absolute dB difference of two equally long signals over their significant bins"""
+    spec_a, spec_b = _spectrum_db(a), _spectrum_db(b)
+    significant = (spec_a > spec_a.min()) | (spec_b > spec_b.min())
+    if not significant.any():
+        return 0.0
+    return float(np.mean(np.abs(spec_a - spec_b)[significant]))
+
+
+def compare_signals(capture_samples, capture_fs, sim_samples, sim_fs, rate=None):
+    """Metrics of one capture against a (longer) simulated signal; see the module docstring"""
+    rate = rate or capture_fs
+    capture_samples = resample_to(finite(capture_samples), capture_fs, rate)
+    sim_samples = resample_to(finite(sim_samples), sim_fs, rate)
+    if len(sim_samples) < len(capture_samples):
+        raise ValueError("The simulated signal is shorter than the capture; simulate a longer run")
+
+    offset, aligned = align(capture_samples, sim_samples)
+    error = capture_samples - aligned
+    rms_capture = np.sqrt(np.mean(capture_samples ** 2))
+    rms_error = float(np.sqrt(np.mean(error ** 2)))
+    return {
+        "rate": rate,
+        "samples": len(capture_samples),
+        "lag_s": offset / rate,   # start of the capture within the simulated window
+        "rms_error": rms_error,
+        "nrms_error": float(rms_error / rms_capture) if rms_capture > 0 else float("nan"),
+        "thd_capture": thd(capture_samples),
+        "thd_sim": thd(aligned),
+        "spectral_diff_db": spectral_difference_db(capture_samples, aligned),
+    }
+
+
+def _resolve_block(results, target):
+    """Block id of `target` (an id or a block type) in an exported result"""
+    if target in results.block_ids:
+        return target
+    matches = [block_id for block_id in results.block_ids
+               if results.block_info.get(block_id, {}).get("type") == target]
+    if not matches:
+        raise ValueError(f"No block with id or type '{target}' in {results.path}")
+    return matches[-1]
+
+
+def compare_capture(capture_path, results_path, block, channel=1, rate=None):
+    """Compare one capture file against the output of `block` in an exported result"""
+    capture = captures.load_capture(capture_path)
+    capture_fs = capture.sample_rate
+    if capture_fs is None:
+        raise ValueError(f"{capture_path} is not a time domain capture")
+
+    with export.open_results(results_path) as results:
+        block_id = _resolve_block(results, block)
+        sim_fs = results.sampling_rate
+        duration = len(capture.time) / capture_fs
+        # Steady state: the end of the run, with room around the capture for the alignment search
+        window = min(int(np.ceil(duration * (1 + 2 * SEARCH_MARGIN) * sim_fs)) + 1, results.length)
+        sim_samples = results.read(block_id, results.length - window)
+
+    metrics = compare_signals(capture.channel(channel), capture_fs, sim_samples, sim_fs, rate)
+    metrics.update(capture=capture.name, block=block_id, channel=channel)
+    return metrics
+
+
+def _compare_job(job):
+    # Module level so it can be pickled for the process pool
+    try:
+        return compare_capture(*job)
+    except Exception as e:
+        return {"capture": os.path.splitext(os.path.basename(job[0]))[0], "error": f"{type(e).__name__}: {e}"}
+
+
+def capture_jobs(results_path, capture_paths, block=None, channel=1, rate=None, mapping=None):
+    """One (capture, results, block, channel, rate) job per capture; `mapping` overrides per capture name"""
+    jobs = []
+    for path in capture_paths:
+        name = os.path.splitext(os.path.basename(path))[0]
+        entry = (mapping or {}).get(name, {})
+        if mapping is not None and not entry and block is None:
+            continue
+        target = entry.get("block", block)
+        if target is None:
+            raise ValueError(f"No block given for capture '{name}' (use --block or --map)")
+        jobs.append((path, results_path, target, entry.get("channel", channel), rate))
+    return jobs
+
+
+def compare_all(jobs, max_workers=None):
+    """Run comparison jobs in parallel worker processes; results keep the job order"""
+    if len(jobs) <= 1 or max_workers == 1:
+        return [_compare_job(job) for job in jobs]
+    with ProcessPoolExecutor(max_workers=max_workers) as pool:
+        return list(pool.map(_compare_job, jobs))
+
+
+COLUMNS = ["capture", "block", "channel", "rate", "samples", "lag_s", "rms_error", "nrms_error",
+           "thd_capture", "thd_sim", "spectral_diff_db"]
+
+
+def format_table(rows):
+    lines = [f"{'capture':<22} {'block':<10} {'ch':>2} {'rms err':>9} {'nrms':>7} "
+             f"{'THD cap':>8} {'THD sim':>8} {'spec dB':>8}"]
+    for row in rows:
+        if "error" in row:
+            lines.append(f"{row['capture']:<22} {row['error']}")
+            continue
+        lines.append(f"{row['capture'][:22]:<22} {str(row['block'])[-10:]:<10} {row['channel']:>2} "
+                     f"{row['rms_error']:>9.4f} {row['nrms_error']:>7.3f} {row['thd_capture']:>8.4f} "
+                     f"{row['thd_sim']:>8.4f} {row['spectral_diff_db']:>8.2f}")
+    return "\n".join(lines)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Compare simulated tp1 outputs against bench captures")
+    parser.add_argument("results", help="exported simulation result (.npz or .h5)")
+    parser.add_argument("captures", help="capture CSV file or folder of captures")
+    parser.add_argument("--block", help="block id or type compared with every capture")
+    parser.add_argument("--channel", type=int, default=1, help="capture channel (default: 1)")
+    parser.add_argument("--map", help="JSON file with the block and channel of each capture name")
+    parser.add_argument("--rate", type=float, default=None,
+                        help="common sampling rate (default: the capture rate)")
+    parser.add_argument("--workers", type=int, default=None,
+                        help="worker processes (default: CPU count)")
+    parser.add_argument("--csv", help="also write the metrics to this CSV file")
+    args = parser.parse_args(argv)
+
+    mapping = None
+    if args.map:
+        with open(args.map, "r", encoding="utf-8") as f:
+            mapping = json.load(f)
+
+    if os.path.isdir(args.captures):
+        # Parse (or refresh the cache of) every capture once, in parallel
+        capture_paths = [capture.path for capture in
+                         captures.load_directory(args.captures, max_workers=args.workers).values()
+                         if capture.sample_rate is not None]
+    else:
+        capture_paths = [args.captures]
+
+    rows = compare_all(capture_jobs(args.results, capture_paths, args.block, args.channel,
+                                    args.rate, mapping), args.workers)
+    print(format_table(rows))
+
+    if args.csv:
+        with open(args.csv, "w", newline="", encoding="utf-8") as f:
+            writer = csv.DictWriter(f, fieldnames=COLUMNS + ["error"], extrasaction="ignore")
+            writer.writeheader()
+            writer.writerows(rows)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,265 @@
+"""
+Qt-free simulation engine for the sampling circuit simulator.
+
+The GUI takes a snapshot of the block diagram as a plain graph description:
+
+    {
+        "blocks": [{"id": "...", "type": "FAA", "params": {...}}, ...],
+        "connections": [{"source": "<block id>", "target": "<block id>",
+                         "port": 0, "clock": False}, ...]
+    }
+
+`port` is the index of the target input port (or clock port when `clock` is
+True). The engine never touches scene items, so it can run in a worker thread.
+"""
+
+import logging
+from collections import Counter
+import numpy as np
+
+from sim import blocks
+from sim.clock import ClockSignal
+from sim.profiler import NULL_PROFILER
+from sim.store import SignalStore
+
+logger = logging.getLogger(__name__)
+
+# Blocks that generate a signal without any input
+SOURCE_TYPES = ['Signal', 'Clock', 'Noise']
+
+# Number of regular (non clock) input ports of each block type
+# (default for fan-in blocks, which set it with their "n_inputs" parameter)
+INPUT_PORTS = {'FAA': 1, 'FR': 1, 'S&H': 1, 'A.Switch': 1, 'Adder': 2, 'Multiplier': 2}
+
+
+class SimulationCancelled(Exception):
+    """Raised when a simulation is cancelled before it finishes"""
+
+
+class SimulationResult:
+    """Signals produced by a simulation run, ready for the viewer"""
+
+    def __init__(self, time_array, output_signals, raw_input_signals, block_info):
+        self.time_array = time_array
+        self.output_signals = output_signals          # {block_id: output signal} (a SignalStore)
+        self.raw_input_signals = raw_input_signals    # {block_id: [input signals]}
+        self.block_info = block_info                  # {block_id: {'type', 'params'}}
+
+
+def _check_cancelled(is_cancelled):
+    if is_cancelled is not None and is_cancelled():
+        raise SimulationCancelled()
+
+
+def _report(progress, done, total, message):
+    if progress is not None:
+        progress(done, total, message)
+
+
+def _group_connections(graph):
+    """Map each block id to {(is_clock, port index): [source block ids]}"""
+    inputs = {block["id"]: {} for block in graph["blocks"]}
+    for conn in graph["connections"]:
+        if conn["target"] not in inputs:
+            continue
+        key = (conn.get("clock", False), conn.get("port", 0))
+        inputs[conn["target"]].setdefault(key, []).append(conn["source"])
+    return inputs
+
+
+def build_block_info(graph):
+    """Dictionary with block types and parameters used for plotting"""
+    block_info = {}
+    for block in graph["blocks"]:
+        block_info[block["id"]] = {'type': block["type"]}
+        if block.get("params"):
+            block_info[block["id"]]['params'] = block["params"]
+    return block_info
+
+
+def input_count(block):
+    """Number of regular input ports of a graph block"""
+    default = INPUT_PORTS.get(block["type"], 1)
+    if block["type"] in blocks.FAN_IN_TYPES:
+        return int(block.get("params", {}).get("n_inputs", default))
+    return default
+
+
+def _needed_signals(inputs, keep, keep_inputs=False):
+    """
+    Ids of the signals that must survive the run: the kept blocks and, with
+    `keep_inputs`, the inputs the viewer shows next to them. None when
+    everything is kept.
+    """
+    if keep is None:
+        return None
+    needed = set(keep)
+    if not keep_inputs:
+        return needed
+    for block_id in keep:
+        for source_ids in inputs.get(block_id, {}).values():
+            needed.update(source_ids)
+    return needed
+
+
+def _block_label(block):
+    return f"{block['type']} {block['id'][-6:]}"
+
+
+def simulate(graph, sampling_rate=blocks.DEFAULT_FS, duration=1.0,
+             progress=None, is_cancelled=None, profiler=NULL_PROFILER,
+             store=None, keep=None, keep_inputs=False):
+    """
+    Run the block diagram described by `graph`.
+
+    `progress(done, total, message)` is called after every block and
+    `is_cancelled()` is polled between blocks; when it returns True the run
+    stops with SimulationCancelled. Blocks and phases are timed by `profiler`.
+
+    Outputs are written to `store` (a default SignalStore if None). With
+    `keep` (block ids), only those outputs end up in the result and every
+    other signal is freed as soon as its last consumer has run. With
+    `keep_inputs` (for the viewer) the sources feeding the kept blocks are
+    kept too, along with their raw input signals.
+    """
+    all_blocks = graph["blocks"]
+    logger.info("simulation started", extra={"fields": {
+        "blocks": len(all_blocks), "fs": sampling_rate, "duration": duration}})
+
+    time_array = np.linspace(0, duration, int(sampling_rate * duration))
+    inputs = _group_connections(graph)
+    total = len(all_blocks)
+    done = 0
+
+    # Store for the output signals of each block
+    output_signals = SignalStore() if store is None else store
+    needed = _needed_signals(inputs, keep, keep_inputs)
+    # Number of blocks still waiting for each signal
+    pending = Counter(source_id for ports in inputs.values()
+                      for source_ids in ports.values() for source_id in source_ids)
+
+    # Clock outputs as edge lists; their dense samples are only stored when a
+    # regular input port reads them or they are kept
+    clocks = {}
+    dense_needed = {source_id for ports in inputs.values()
+                    for (is_clock, _), source_ids in ports.items() if not is_clock
+                    for source_id in source_ids}
+
+    # Process source blocks first (Signal, Clock, Noise)
+    source_blocks = [block for block in all_blocks if block["type"] in SOURCE_TYPES]
+
+    with profiler.section("sources", "phase", samples=len(time_array) * len(source_blocks)):
+        for block in source_blocks:
+            _check_cancelled(is_cancelled)
+            with profiler.section(_block_label(block), "block", samples=len(time_array)):
+                output = blocks.generate_source(block["type"], block["params"], time_array, sampling_rate)
+                if isinstance(output, ClockSignal):
+                    clocks[block["id"]] = output
+                if not isinstance(output, ClockSignal) or needed is None or block["id"] in needed \
+                        or block["id"] in dense_needed:
+                    output_signals[block["id"]] = output
+            logger.debug("source generated", extra={"fields": {"block_id": block["id"], "type": block["type"]}})
+            _release(output_signals, block["id"], pending, needed)
+            done += 1
+            _report(progress, done, total, f"Generated {block['type']}")
+
+    # Sort the remaining blocks to ensure we process in order (simple topological sort)
+    remaining_blocks = [block for block in all_blocks if block["type"] not in SOURCE_TYPES]
+    with profiler.section("processing", "phase") as phase:
+        raw_input_signals = _process_blocks(remaining_blocks, inputs, output_signals, clocks, time_array,
+                                            sampling_rate, progress, is_cancelled, profiler, done, total,
+                                            pending, needed, keep_inputs)
+        phase.samples = len(time_array) * (len(output_signals) - len(source_blocks))
+
+    logger.info("simulation finished", extra={"fields": {
+        "outputs": len(output_signals), "memory_mb": round(output_signals.memory_bytes / 2**20, 1),
+        "disk_mb": round(output_signals.disk_bytes / 2**20, 1)}})
+    return SimulationResult(time_array, output_signals, raw_input_signals, build_block_info(graph))
+
+
+def _release(output_signals, block_id, pending, needed):
+    """Free the signal of `block_id` if no block is waiting for it and it is not kept"""
+    if needed is not None and pending[block_id] <= 0 and block_id not in needed:
+        if block_id in output_signals:
+            del output_signals[block_id]
+            logger.debug("signal released", extra={"fields": {"block_id": block_id}})
+
+
+def _process_blocks(remaining_blocks, inputs, output_signals, clocks, time_array, sampling_rate,
+                    progress, is_cancelled, profiler, done, total, pending, needed, keep_inputs=False):
+    """
+    Process the non-source blocks in dependency order; returns their raw input
+    signals. Clock ports read the edge lists in `clocks` when the source is a Clock.
+    """
+
+    # Store the original input signals for visualization
+    raw_input_signals = {}
+
+    # Repeat until all blocks are processed or no more can be processed
+    while remaining_blocks:
+        blocks_processed_this_round = []
+
+        for block in remaining_blocks:
+            _check_cancelled(is_cancelled)
+            ports = inputs[block["id"]]
+
+            # Check if all inputs are processed
+            if any(source_id not in output_signals and source_id not in clocks
+                   for source_ids in ports.values() for source_id in source_ids):
+                continue
+
+            # Gather one signal per input port (the last connection wins)
+            port_signals = []
+            block_inputs = []
+            for index in range(input_count(block)):
+                source_ids = ports.get((False, index), [])
+                block_inputs.extend(output_signals[source_id] for source_id in source_ids)
+                port_signals.append(output_signals[source_ids[-1]] if source_ids else None)
+
+            clock_ids = ports.get((True, 0), [])
+            clock_signal = None
+            if clock_ids:
+                clock_id = clock_ids[-1]
+                clock_signal = clocks[clock_id] if clock_id in clocks else output_signals[clock_id]
+
+            if block_inputs and (needed is None or (keep_inputs and block["id"] in needed)):
+                raw_input_signals[block["id"]] = block_inputs
+
+            # Process the block based on its type
+            with profiler.section(_block_label(block), "block", samples=len(time_array)):
+                if block["type"] in blocks.FAN_IN_TYPES and any(s is not None for s in port_signals):
+                    output_signals[block["id"]] = blocks.process_signal(block["type"], block["params"],
+                                                                        port_signals)
+                elif block["type"] not in blocks.FAN_IN_TYPES and port_signals[0] is not None:
+                    output_signals[block["id"]] = blocks.process_signal(
+                        block["type"], block["params"], port_signals[0], clock_signal, sampling_rate)
+                else:
+                    # If no input signal, use zeros
+                    output_signals[block["id"]] = np.zeros_like(time_array)
+            logger.debug("block processed", extra={"fields": {
+                "block_id": block["id"], "type": block["type"],
+                "inputs": len(block_inputs), "clock": clock_signal is not None}})
+
+            # Intermediate signals nobody else needs can go now
+            for source_ids in ports.values():
+                for source_id in source_ids:
+                    pending[source_id] -= 1
+                    _release(output_signals, source_id, pending, needed)
+            _release(output_signals, block["id"], pending, needed)
+
+            blocks_processed_this_round.append(block)
+            done += 1
+            _report(progress, done, total, f"Processed {block['type']}")
+
+        # Remove processed blocks from the list
+        for block in blocks_processed_this_round:
+            remaining_blocks.remove(block)
+
+        # If no blocks were processed in this round and there are still remaining blocks,
+        # there might be a cyclic dependency or disconnected blocks
+        if not blocks_processed_this_round and remaining_blocks:
+            logger.warning("could not process all blocks, check for cycles or disconnected blocks",
+                           extra={"fields": {"blocks": ",".join(_block_label(b) for b in remaining_blocks)}})
+            break
+
+    return raw_input_signals
@@ -0,0 +1,187 @@
+"""
+Export of simulation results for offline analysis.
+
+Every block output is written together with the time axis, the sampling
+rate, the block parameters and the graph topology, split in chunks of
+`chunk_size` samples so large runs can be read back piece by piece:
+
+  - `.h5` / `.hdf5`: HDF5 file (needs h5py), one gzip compressed, chunked
+    dataset per block under /blocks, metadata as attributes.
+  - `.npz`: compressed NPZ with one member per chunk (`block_<id>_c00000`,
+    ...) and a JSON `meta` member.
+
+Other extensions are rejected (numpy would silently append `.npz`).
+
+    write_results(result, "run.npz", graph=graph, sampling_rate=44100)
+    with open_results("run.npz") as results:
+        faa = results.read_time("140", 0.010, 0.020)   # only loads that range
+"""
+
+import json
+import numpy as np
+
+try:
+    import h5py
+except ImportError:  # HDF5 export is optional
+    h5py = None
+
+FORMAT_VERSION = 1
+DEFAULT_CHUNK_SIZE = 1 << 16
+HDF5_EXTENSIONS = (".h5", ".hdf5")
+NPZ_EXTENSIONS = (".npz",)
+
+
+def _is_hdf5(path):
+    return str(path).lower().endswith(HDF5_EXTENSIONS)
+
+
+def check_path(path):
+    """Raise ValueError unless `path` has a result file extension (.npz, .h5 or .hdf5)"""
+    if not str(path).lower().endswith(NPZ_EXTENSIONS + HDF5_EXTENSIONS):
+        raise ValueError(f"Unknown result file extension: '{path}' (use .npz, .h5 or .hdf5)")
+
+
+def _require_h5py():
+    if h5py is None:
+        raise ImportError("HDF5 export needs h5py (pip install h5py); use an .npz file instead")
+
+
+def _chunk_key(name, index):
+    return f"{name}_c{index:05d}"
+
+
+def write_results(result, path, graph=None, sampling_rate=None, chunk_size=DEFAULT_CHUNK_SIZE):
+    """Write a SimulationResult to `path`; the format follows the file extension"""
+    check_path(path)
+    meta = {
+        "version": FORMAT_VERSION,
+        "sampling_rate": sampling_rate,
+        "length": len(result.time_array),
+        "chunk_size": chunk_size,
+        "block_info": result.block_info,
+        "graph": graph,
+        "blocks": list(result.output_signals.keys()),
+    }
+    if _is_hdf5(path):
+        _write_hdf5(result, path, meta)
+    else:
+        _write_npz(result, path, meta)
+
+
+def _write_npz(result, path, meta):
+    chunk_size = meta["chunk_size"]
+    # Chunks are views of the signals (memory-mapped ones are read piecewise)
+    arrays = {"meta": np.array(json.dumps(meta))}
+    named = [("time", result.time_array)]
+    named += [(f"block_{block_id}", signal) for block_id, signal in result.output_signals.items()]
+    for name, signal in named:
+        for index, start in enumerate(range(0, len(signal), chunk_size)):
+            arrays[_chunk_key(name, index)] = signal[start:start + chunk_size]
+    np.savez_compressed(path, **arrays)
+
+
+def _write_hdf5(result, path, meta):
+    _require_h5py()
+    chunk_size = meta["chunk_size"]
+    with h5py.File(path, "w") as f:
+        f.attrs["version"] = FORMAT_VERSION
+        f.attrs["meta"] = json.dumps(meta)
+        if meta["sampling_rate"] is not None:
+            f.attrs["sampling_rate"] = meta["sampling_rate"]
+
+        def dataset(group, name, signal):
+            data = group.create_dataset(name, shape=signal.shape, dtype=signal.dtype,
+                                        chunks=(min(chunk_size, max(len(signal), 1)),),
+                                        compression="gzip", shuffle=True)
+            for start in range(0, len(signal), chunk_size):
+                data[start:start + chunk_size] = signal[start:start + chunk_size]
+            return data
+
+        dataset(f, "time", result.time_array)
+        blocks = f.create_group("blocks")
+        for block_id, signal in result.output_signals.items():
+            data = dataset(blocks, str(block_id), signal)
+            info = result.block_info.get(block_id, {})
+            data.attrs["type"] = info.get("type", "Unknown")
+            data.attrs["params"] = json.dumps(info.get("params", {}))
+
+
+class Results:
+    """Read access to an exported result; use `open_results` to create one"""
+
+    def __init__(self, path):
+        self.path = path
+        if _is_hdf5(path):
+            _require_h5py()
+            self._h5 = h5py.File(path, "r")
+            self._npz = None
+            meta = json.loads(self._h5.attrs["meta"])
+        else:
+            self._h5 = None
+            # NpzFile only decompresses the members that are accessed
+            self._npz = np.load(path)
+            if "meta" not in self._npz.files:
+                self._npz.close()
+                raise ValueError(f"{path} is not an exported simulation result")
+            meta = json.loads(self._npz["meta"].item())
+        self.meta = meta
+        self.sampling_rate = meta.get("sampling_rate")
+        self.length = meta["length"]
+        self.chunk_size = meta["chunk_size"]
+        self.block_info = meta.get("block_info", {})
+        self.graph = meta.get("graph")
+        self.block_ids = meta["blocks"]
+
+    def _read(self, name, start, stop):
+        start, stop, _ = slice(start, stop).indices(self.length)
+        if stop <= start:
+            return np.array([])
+        if self._h5 is not None:
+            data = self._h5["time"] if name == "time" else self._h5["blocks"][name[len("block_"):]]
+            return data[start:stop]
+        # Only the chunks that overlap [start, stop) are decompressed
+        first, last = start // self.chunk_size, (stop - 1) // self.chunk_size
+        pieces = [self._npz[_chunk_key(name, index)] for index in range(first, last + 1)]
+        offset = first * self.chunk_size
+        return np.concatenate(pieces)[start - offset:stop - offset]
+
+    def read(self, block_id, start=None, stop=None):
+        """Samples [start, stop) of a block output"""
+        if block_id not in self.block_ids:
+            raise KeyError(f"No output of block '{block_id}' in {self.path}")
+        return self._read(f"block_{block_id}", start, stop)
+
+    def time(self, start=None, stop=None):
+        """Samples [start, stop) of the time axis"""
+        return self._read("time", start, stop)
+
+    def index_range(self, t_start, t_stop):
+        """Sample indices covering the time range [t_start, t_stop] (seconds)"""
+        # The time axis is uniform, so two samples locate any instant
+        t0, t1 = self.time(0, 2) if self.length > 1 else (0.0, 1.0)
+        dt = t1 - t0
+        start = max(int(np.floor((t_start - t0) / dt)), 0)
+        stop = min(int(np.ceil((t_stop - t0) / dt)) + 1, self.length)
+        return start, stop
+
+    def read_time(self, block_id, t_start, t_stop):
+        """(time, samples) of a block output over the time range [t_start, t_stop]"""
+        start, stop = self.index_range(t_start, t_stop)
+        return self.time(start, stop), self.read(block_id, start, stop)
+
+    def close(self):
+        if self._h5 is not None:
+            self._h5.close()
+        if self._npz is not None:
+            self._npz.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def open_results(path):
+    """Open an exported result for (partial) reading"""
+    return Results(path)
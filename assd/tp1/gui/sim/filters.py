@@ -0,0 +1,72 @@
+"""
+Causal low-pass models of the anti-aliasing (FAA) and reconstruction (FR) filters.
+
+Besides the ideal brick wall (applied on the whole signal in the frequency
+domain), the filter blocks can use the classic analog approximations:
+Butterworth, Chebyshev (type I), Cauer (elliptic) and Bessel. They are
+digitized with the bilinear transform and run as second order sections with
+`sosfilt`, so the output is causal like the hardware filter.
+
+Designs are cached by (type, order, fc, fs, ripple, attenuation), and
+`StreamingFilter` carries the filter state between chunks so long or
+multi-rate runs can be filtered piecewise.
+"""
+
+import functools
+import numpy as np
+from scipy import signal
+
+FILTER_TYPES = ["ideal", "butterworth", "chebyshev", "cauer", "bessel"]
+
+DEFAULT_ORDER = 5
+DEFAULT_RIPPLE_DB = 1.0        # passband ripple of Chebyshev and Cauer filters
+DEFAULT_ATTENUATION_DB = 60.0  # stopband attenuation of Cauer filters
+
+
+@functools.lru_cache(maxsize=64)
+def design_sos(filter_type, order, fc, fs, ripple_db=DEFAULT_RIPPLE_DB,
+               attenuation_db=DEFAULT_ATTENUATION_DB):
+    """
+    Second order sections of a digital low-pass with cutoff `fc` (Hz).
+    The result is shared between callers and must not be modified.
+    """
+    if not 0 < fc < fs / 2:
+        raise ValueError(f"Cutoff frequency {fc} Hz must be between 0 and fs/2 = {fs / 2} Hz")
+    if filter_type == "butterworth":
+        return signal.butter(order, fc, fs=fs, output="sos")
+    if filter_type == "chebyshev":
+        return signal.cheby1(order, ripple_db, fc, fs=fs, output="sos")
+    if filter_type == "cauer":
+        return signal.ellip(order, ripple_db, attenuation_db, fc, fs=fs, output="sos")
+    if filter_type == "bessel":
+        # Normalized so fc is the -3 dB frequency, like the other types
+        return signal.bessel(order, fc, fs=fs, norm="mag", output="sos")
+    raise ValueError(f"Unknown filter type '{filter_type}', expected one of {FILTER_TYPES}")
+
+
+def sos_from_params(filter_params, fs):
+    """Design of the FAA/FR block parameters (None for the ideal filter)"""
+    filter_type = filter_params.get("filter_type", "ideal")
+    if filter_type == "ideal":
+        return None
+    return design_sos(filter_type, int(filter_params.get("order", DEFAULT_ORDER)),
+                      float(filter_params["cutoff_frequency"]), float(fs),
+                      float(filter_params.get("ripple_db", DEFAULT_RIPPLE_DB)),
+                      float(filter_params.get("attenuation_db", DEFAULT_ATTENUATION_DB)))
+
+
+class StreamingFilter:
+    """Applies a SOS design chunk by chunk, keeping the state between calls"""
+
+    def __init__(self, sos):
+        self.sos = sos
+        self.reset()
+
+    def reset(self):
+        """Start again from rest (zero state)"""
+        self.zi = np.zeros((self.sos.shape[0], 2))
+
+    def process(self, chunk):
+        output, self.zi = signal.sosfilt(self.sos, chunk, zi=self.zi)
+        return output
+
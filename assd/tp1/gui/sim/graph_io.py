@@ -0,0 +1,69 @@
+"""
+JSON serialization of block diagrams (simulation results are written by sim.export).
+
+A graph file holds the same description the GUI hands to `sim.engine`, plus
+the block positions so the scene can be rebuilt:
+
+    {
+        "version": 1,
+        "blocks": [{"id": "1", "type": "Clock", "x": 0, "y": 0,
+                    "params": {"frequency": 1000, "duty_cycle": 50, "phase": 0}}],
+        "connections": [{"source": "1", "target": "2", "port": 0, "clock": true}]
+    }
+"""
+
+import copy
+import json
+
+GRAPH_VERSION = 1
+
+
+def save_graph(graph, path):
+    """Write a graph description to a JSON file"""
+    data = {"version": GRAPH_VERSION,
+            "blocks": graph["blocks"],
+            "connections": graph["connections"]}
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(data, f, indent=2)
+
+
+def load_graph(path):
+    """Read a graph description from a JSON file"""
+    with open(path, "r", encoding="utf-8") as f:
+        data = json.load(f)
+
+    if data.get("version", GRAPH_VERSION) > GRAPH_VERSION:
+        raise ValueError(f"Unsupported graph version {data['version']} in {path}")
+    for key in ("blocks", "connections"):
+        if key not in data:
+            raise ValueError(f"Missing '{key}' in graph file {path}")
+
+    for block in data["blocks"]:
+        block["id"] = str(block["id"])
+        block.setdefault("params", {})
+    for conn in data["connections"]:
+        conn["source"] = str(conn["source"])
+        conn["target"] = str(conn["target"])
+        conn.setdefault("port", 0)
+        conn.setdefault("clock", False)
+    return {"blocks": data["blocks"], "connections": data["connections"]}
+
+
+def match_blocks(graph, target):
+    """
+    Blocks selected by `target`, either a block id or a block type
+    (e.g. 'Clock' or 'FAA').
+    """
+    matched = [block for block in graph["blocks"] if target in (block["id"], block["type"])]
+    if not matched:
+        raise ValueError(f"No block with id or type '{target}' in graph")
+    return matched
+
+
+def with_param(graph, target, param, value):
+    """Return a copy of `graph` with `param` set to `value` on the target blocks"""
+    graph = copy.deepcopy(graph)
+    for block in match_blocks(graph, target):
+        block["params"][param] = value
+    return graph
+
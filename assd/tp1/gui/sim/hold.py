@@ -0,0 +1,253 @@
+"""
+Closed-form (frequency domain) model of a non-ideal sample and hold.
+
+Sample k is taken at the edge time t_k as the average of the input over an
+aperture of `aperture` seconds ending at t_k. It is then held until the next
+edge while the hold capacitor leaks with time constant `droop_tau`, and the
+output settles through a first-order RC with time constant `settling_tau`:
+
+    y(t) = h_settle * sum_k v_k exp(-(t - t_k) / droop_tau) [t_k <= t < t_k+1]
+
+Every piece has a closed-form spectrum:
+
+    aperture    A(f) = sinc(f a) exp(-j pi f a)          (on the input)
+    hold pulse  (1 - exp(-(1/droop_tau + j w) T_k)) / (1/droop_tau + j w)
+    settling    H(f) = 1 / (1 + j w settling_tau)
+
+so the output spectrum is two sums over the edges (pulse starts and pulse
+ends) times H(f). For uniform clocks the sums are chirp z-transforms, which
+gives the spectrum at any set of uniformly spaced frequencies without
+simulating the hold waveform on an oversampled grid:
+
+    Y = hold_spectrum(values, edge_times, freqs, end_time, droop_tau=1e-3)
+
+`sample_and_hold_spectral` is the S&H block in "spectral" mode: the held
+output on the simulation grid is the inverse FFT of Y, so it is band-limited
+(free of the staircase aliasing of the time-domain mode).
+
+`python -m sim.hold` (or `run_checks()`) checks the model against an
+oversampled time-domain simulation of the same circuit, and that uniform
+clocks take the chirp z-transform path; a failed check raises AssertionError.
+"""
+
+import time
+import numpy as np
+from scipy import signal as sps
+
+from sim.clock import ClockSignal, clock_edges
+
+HOLD_MODES = ["time", "spectral"]
+
+# Relative spacing deviation below which the edges count as uniform (chirp z-transform)
+UNIFORM_TOLERANCE = 1e-9
+# Edge x frequency products evaluated at once by the direct (non-uniform) sum
+DIRECT_BLOCK_ELEMENTS = 1 << 20
+# Settling time constants simulated past the end of the record by check_equivalence
+SETTLING_TAILS = 30
+# check_equivalence fails past EQUIVALENCE_TOLERANCE / oversampling: the residual
+# is the discretization of the reference, first order in the time step
+EQUIVALENCE_TOLERANCE = 1.5
+# Number of edge sums computed by each path ("czt" or "direct"), for the checks
+EDGE_SUM_PATHS = {"czt": 0, "direct": 0}
+
+
+def aperture_response(freqs, aperture):
+    """Averaging over `aperture` seconds ending at the sampling instant"""
+    if not aperture:
+        return np.ones(len(freqs), dtype=complex)
+    return np.sinc(freqs * aperture) * np.exp(-1j * np.pi * freqs * aperture)
+
+
+def settling_response(freqs, settling_tau):
+    """First-order settling of the output (1 when `settling_tau` is 0)"""
+    if not settling_tau:
+        return np.ones(len(freqs), dtype=complex)
+    return 1.0 / (1.0 + 2j * np.pi * freqs * settling_tau)
+
+
+def _is_uniform(values):
+    if len(values) < 3:
+        return True
+    steps = np.diff(values)
+    return np.ptp(steps) <= UNIFORM_TOLERANCE * abs(steps.mean())
+
+
+def edge_sum(weights, times, freqs):
+    """
+    sum_k weights_k exp(-j 2 pi f t_k) at each frequency. A chirp
+    z-transform when both the times and the frequencies are uniform.
+    """
+    weights = np.asarray(weights, dtype=complex)
+    freqs = np.asarray(freqs, dtype=float)
+    if len(weights) == 0:
+        return np.zeros(len(freqs), dtype=complex)
+    if len(weights) > 1 and len(freqs) > 1 and _is_uniform(times) and _is_uniform(freqs):
+        EDGE_SUM_PATHS["czt"] += 1
+        step = (times[-1] - times[0]) / (len(times) - 1)
+        df = (freqs[-1] - freqs[0]) / (len(freqs) - 1)
+        # z_m = exp(j 2 pi f_m step) = a w^-m
+        sums = sps.czt(weights, len(freqs), w=np.exp(-2j * np.pi * df * step),
+                       a=np.exp(2j * np.pi * freqs[0] * step))
+        return sums * np.exp(-2j * np.pi * freqs * times[0])
+
+    # Direct sum over blocks of edges to bound the (edges x frequencies) matrix
+    EDGE_SUM_PATHS["direct"] += 1
+    sums = np.zeros(len(freqs), dtype=complex)
+    block = max(DIRECT_BLOCK_ELEMENTS // max(len(freqs), 1), 1)
+    for start in range(0, len(weights), block):
+        phases = np.exp(-2j * np.pi * np.outer(times[start:start + block], freqs))
+        sums += weights[start:start + block] @ phases
+    return sums
+
+
+def hold_spectrum(values, edge_times, freqs, end_time, droop_tau=0.0, settling_tau=0.0):
+    """
+    Spectrum (continuous Fourier transform, V/Hz) of the held output.
+    `values[k]` is held from `edge_times[k]` to the next edge, the last one
+    until `end_time`; the output is 0 before the first edge.
+    """
+    values = np.asarray(values, dtype=float)
+    edge_times = np.asarray(edge_times, dtype=float)
+    freqs = np.asarray(freqs, dtype=float)
+    ends = np.append(edge_times[1:], end_time)
+    lengths = ends - edge_times
+
+    decay = 1.0 / droop_tau if droop_tau else 0.0
+    s = decay + 2j * np.pi * freqs
+    # Pulse k contributes v_k (exp(-s t_k) - exp(-decay T_k) exp(-s t_k+1)) / s
+    starts = edge_sum(values, edge_times, freqs)
+    # Pulse k ends at edge k+1 and the last one at end_time: the sum over the
+    # next edges (uniform for a uniform clock) plus the last pulse on its own
+    weights = values * np.exp(-decay * lengths)
+    stops = edge_sum(weights[:-1], edge_times[1:], freqs)
+    if len(weights):
+        stops += weights[-1] * np.exp(-2j * np.pi * freqs * end_time)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        spectrum = (starts - stops) / s
+    # Without droop, the pulse area at DC
+    spectrum[s == 0] = np.sum(values * lengths)
+    return spectrum * settling_response(freqs, settling_tau)
+
+
+def held_samples(input_signal, dt, edge_times, aperture=0.0, t0=0.0):
+    """Input averaged over the aperture and read at the edge times (linear interpolation)"""
+    if aperture:
+        freqs = np.fft.rfftfreq(len(input_signal), dt)
+        input_signal = np.fft.irfft(np.fft.rfft(input_signal) * aperture_response(freqs, aperture),
+                                    len(input_signal))
+    grid = t0 + dt * np.arange(len(input_signal))
+    return np.interp(edge_times, grid, input_signal)
+
+
+def _edge_times(clock_signal, t0, dt, n):
+    """Sampling instants of a clock: analytic for a ClockSignal, else the rising edge samples"""
+    if isinstance(clock_signal, ClockSignal):
+        times = clock_signal.rising_times()
+        # The first sample is never a rising edge (like the time-domain S&H)
+        return times[(times > t0) & (times <= t0 + dt * (n - 1))]
+    rising, _, _ = clock_edges(clock_signal)
+    return t0 + dt * rising
+
+
+def sample_and_hold_spectral(input_signal, clock_signal, params, fs):
+    """
+    S&H block in spectral mode: held output on the simulation grid, computed
+    as the inverse FFT of `hold_spectrum` (so the record is taken as one
+    period). The grid is the clock time axis for Clock blocks, else uniform at `fs`.
+    """
+    n = len(input_signal)
+    if isinstance(clock_signal, ClockSignal) and n > 1:
+        t0, dt = clock_signal.t[0], (clock_signal.t[-1] - clock_signal.t[0]) / (n - 1)
+    else:
+        t0, dt = 0.0, 1.0 / fs
+    edge_times = _edge_times(clock_signal, t0, dt, n)
+    values = held_samples(input_signal, dt, edge_times, params.get("aperture", 0.0), t0)
+
+    freqs = np.fft.rfftfreq(n, dt)
+    # Shift the spectrum so the record starts at t = 0; the last value is held to the end of the record
+    spectrum = hold_spectrum(values, edge_times - t0, freqs, n * dt,
+                             params.get("droop_tau", 0.0), params.get("settling_tau", 0.0))
+    return np.fft.irfft(spectrum / dt, n)
+
+
+def check_equivalence(oversampling=256, verbose=True):
+    """
+    Compare `hold_spectrum` with the FFT of an oversampled time-domain
+    simulation of the same S&H (aperture, droop and settling). Returns the
+    largest error relative to the spectrum peak over the first clock harmonics;
+    raises AssertionError if it exceeds EQUIVALENCE_TOLERANCE / oversampling.
+    """
+    clock_frequency, input_frequency, periods = 10e3, 1.3e3, 40
+    aperture, droop_tau, settling_tau = 8e-6, 300e-6, 5e-6
+    period = 1 / clock_frequency
+    duration = periods * period
+    edge_times = (np.arange(periods) + 0.5) * period
+
+    def input_signal(t):
+        return np.sin(2 * np.pi * input_frequency * t + 0.3)
+
+    started = time.perf_counter()
+    # Time domain: average over the aperture, staircase with droop, RC settling.
+    # The record runs past `duration` until the settling tail has decayed, since
+    # the model spectrum includes that tail
+    dt = period / oversampling
+    t = np.arange(int(round((duration + SETTLING_TAILS * settling_tau) / dt))) * dt
+    window = np.arange(-int(round(aperture / dt)), 0) + 0.5
+    values = np.array([np.mean(input_signal(edge + window * dt)) for edge in edge_times])
+    index = np.searchsorted(edge_times, t, side="right") - 1
+    held = np.where(index >= 0, values[index] * np.exp(-(t - edge_times[np.maximum(index, 0)]) / droop_tau), 0.0)
+    held[t >= duration] = 0.0
+    pole = np.exp(-dt / settling_tau)
+    output = sps.lfilter([1 - pole], [1, -pole], held)
+    reference = np.fft.rfft(output) * dt
+    time_domain = time.perf_counter() - started
+
+    started = time.perf_counter()
+    freqs = np.fft.rfftfreq(len(t), dt)
+    band = freqs <= 8 * clock_frequency
+    # Aperture average of the sinusoid in closed form: Im(A(f) exp(j(w t_k + 0.3)))
+    gain = aperture_response(np.array([input_frequency]), aperture)[0]
+    samples = np.imag(gain * np.exp(1j * (2 * np.pi * input_frequency * edge_times + 0.3)))
+    model = hold_spectrum(samples, edge_times, freqs[band], duration, droop_tau, settling_tau)
+    closed_form = time.perf_counter() - started
+
+    error = np.max(np.abs(model - reference[band])) / np.max(np.abs(model))
+    if verbose:
+        print(f"time domain ({oversampling}x oversampled): {time_domain * 1e3:.1f} ms, "
+              f"closed form: {closed_form * 1e3:.1f} ms, max relative error: {error:.2e}")
+    if not error < EQUIVALENCE_TOLERANCE / oversampling:
+        raise AssertionError(f"spectral S&H error {error:.2e} at {oversampling}x oversampling "
+                             f"(limit {EQUIVALENCE_TOLERANCE / oversampling:.2e})")
+    return error
+
+
+def check_czt_path(clock_frequency=8e3, fs=44100.0, duration=1.0, verbose=True):
+    """
+    A uniform clock must take the chirp z-transform for both edge sums (pulse
+    starts and pulse ends) of the spectral S&H. Returns the run time (s);
+    raises AssertionError if an edge sum took the direct path.
+    """
+    t = np.arange(int(duration * fs)) / fs
+    clock = ClockSignal(clock_frequency, 50, 0, t)
+    params = {"aperture": 5e-6, "droop_tau": 1e-3, "settling_tau": 2e-6}
+    EDGE_SUM_PATHS.update(czt=0, direct=0)
+    started = time.perf_counter()
+    sample_and_hold_spectral(np.sin(2 * np.pi * 1e3 * t), clock, params, fs)
+    elapsed = time.perf_counter() - started
+    if verbose:
+        print(f"spectral S&H, {clock_frequency:g} Hz clock, {duration:g} s at {fs:g} Hz: "
+              f"{elapsed * 1e3:.1f} ms, edge sums {EDGE_SUM_PATHS}")
+    if EDGE_SUM_PATHS != {"czt": 2, "direct": 0}:
+        raise AssertionError(f"uniform clock edge sums took {EDGE_SUM_PATHS}, expected 2 chirp z-transforms")
+    return elapsed
+
+
+def run_checks(verbose=True):
+    """All the checks of the spectral S&H; raises AssertionError on the first failure"""
+    for factor in (256, 1024, 4096):
+        check_equivalence(factor, verbose)
+    check_czt_path(verbose=verbose)
+
+
+if __name__ == "__main__":
+    run_checks()
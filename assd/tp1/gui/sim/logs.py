@@ -0,0 +1,41 @@
+"""
+Logging setup for the simulator.
+
+Modules log through `logging.getLogger(__name__)` and attach structured fields
+with `extra={"fields": {...}}`; they are printed as key=value pairs:
+
+    12:00:01 DEBUG sim.engine: block processed block_id=140 type=FAA samples=44100
+
+Nothing below WARNING is shown unless `configure` is called with a lower
+level (GUI: TP1_LOG_LEVEL environment variable, batch runner: --log-level).
+"""
+
+import logging
+import os
+
+LOG_LEVEL_ENV = "TP1_LOG_LEVEL"
+
+
+class KeyValueFormatter(logging.Formatter):
+    """Formats the record message followed by its structured fields"""
+
+    def __init__(self):
+        super().__init__("%(asctime)s %(levelname)s %(name)s: %(message)s", "%H:%M:%S")
+
+    def format(self, record):
+        text = super().format(record)
+        fields = getattr(record, "fields", None)
+        if fields:
+            text += " " + " ".join(f"{key}={value}" for key, value in fields.items())
+        return text
+
+
+def configure(level=None):
+    """Send the simulator logs to stderr; the level defaults to $TP1_LOG_LEVEL or WARNING"""
+    level = level or os.environ.get(LOG_LEVEL_ENV, "WARNING")
+    handler = logging.StreamHandler()
+    handler.setFormatter(KeyValueFormatter())
+    logger = logging.getLogger("sim")
+    logger.handlers[:] = [handler]
+    logger.setLevel(level.upper() if isinstance(level, str) else level)
+    logger.propagate = False
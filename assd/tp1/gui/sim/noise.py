@@ -0,0 +1,146 @@
+"""
+Colored noise generators for the Noise block.
+
+Every noise type is white Gaussian noise shaped by a fixed IIR filter:
+
+    white    flat spectrum
+    pink     -10 dB/decade (1/f), 3-pole/3-zero approximation
+    brown    -20 dB/decade (1/f^2), leaky integrator
+    blue     +10 dB/decade (f), first difference of pink noise
+    band     Butterworth band-pass between `low_frequency` and `high_frequency`
+
+The filter state is carried between calls, so a long run can be generated in
+chunks that join without discontinuities:
+
+    gen = NoiseGenerator("pink", peak_to_peak=1.0, fs=44100, seed=3)
+    for chunk in gen.chunks(10 * 44100, 8192):
+        ...
+
+With a seed the output is reproducible and does not depend on the chunk size.
+`peak_to_peak` is mapped to six standard deviations of the output (the filter
+gain is known from its impulse response) and each chunk is clipped to
++-peak_to_peak/2, so no pass over the whole signal is needed.
+"""
+
+import functools
+import numpy as np
+from scipy import signal
+
+NOISE_TYPES = ["white", "pink", "brown", "blue", "band"]
+
+# Pink noise filter (J. O. Smith, "Spectral Audio Signal Processing"), accurate
+# within 0.3 dB from fs/2000 up to fs/2
+PINK_B = np.array([0.049922035, -0.095993537, 0.050612699, -0.004408786])
+PINK_A = np.array([1.0, -2.494956002, 2.017265875, -0.522189400])
+
+# Corner frequency of the brown noise integrator (keeps its variance finite)
+BROWN_CORNER_HZ = 5.0
+
+# Longest warm-up run through the shaping filter before the first sample (s)
+MAX_SETTLE_S = 0.1
+
+
+def check_band(low_frequency, high_frequency, fs):
+    """Raise ValueError unless 0 <= low_frequency < high_frequency < fs/2 (None: no limit)"""
+    nyquist = fs / 2
+    low = low_frequency or 0.0
+    high = nyquist if high_frequency is None else high_frequency
+    if low < 0:
+        raise ValueError(f"Band noise low frequency must not be negative (got {low:g} Hz)")
+    if high_frequency is not None and not high < nyquist:
+        raise ValueError(f"Band noise high frequency must be below fs/2 = {nyquist:g} Hz (got {high:g} Hz)")
+    if not low < high:
+        raise ValueError(f"Band noise low frequency ({low:g} Hz) must be below the high frequency ({high:g} Hz)")
+
+
+@functools.lru_cache(maxsize=32)
+def shaping_filter(noise_type, fs, low_frequency=None, high_frequency=None, order=4):
+    """
+    Shaping filter of a noise type as (sos, gain, settle): second order
+    sections, RMS gain for unit variance white input and the number of
+    warm-up samples before steady state (at most MAX_SETTLE_S). None for
+    white noise. The result is shared between generators and must not be
+    modified.
+    """
+    if noise_type == "white":
+        return None
+    if noise_type == "pink":
+        sos = signal.tf2sos(PINK_B, PINK_A)
+    elif noise_type == "brown":
+        pole = np.exp(-2 * np.pi * BROWN_CORNER_HZ / fs)
+        sos = signal.tf2sos([1.0 - pole], [1.0, -pole])
+    elif noise_type == "blue":
+        sos = signal.tf2sos(np.convolve(PINK_B, [1.0, -1.0]), PINK_A)
+    elif noise_type == "band":
+        check_band(low_frequency, high_frequency, fs)
+        low = low_frequency or 0.0
+        high = fs / 2 * 0.999 if high_frequency is None else high_frequency
+        if low <= 0:
+            sos = signal.butter(order, high, btype="lowpass", fs=fs, output="sos")
+        else:
+            sos = signal.butter(order, [low, high], btype="bandpass", fs=fs, output="sos")
+    else:
+        raise ValueError(f"Unknown noise type '{noise_type}', expected one of {NOISE_TYPES}")
+
+    # Settling time from the slowest pole (down to 1e-6 of the initial state)
+    _, poles, _ = signal.sos2zpk(sos)
+    slowest = np.max(np.abs(poles)) if len(poles) else 0.0
+    settle = int(np.ceil(np.log(1e-6) / np.log(slowest))) if slowest > 0 else 0
+    # Very slow poles (band noise from a fraction of a Hz) would need seconds of
+    # warm-up per generator; the energy left past the cap is negligible
+    settle = min(settle, int(MAX_SETTLE_S * fs))
+
+    # The output variance of unit white noise is the energy of the impulse response
+    impulse = np.zeros(max(settle, 1024))
+    impulse[0] = 1.0
+    gain = np.sqrt(np.sum(signal.sosfilt(sos, impulse) ** 2))
+
+    return sos, gain, settle
+
+
+class NoiseGenerator:
+    """Streaming noise source; consecutive `generate` calls continue the same signal"""
+
+    def __init__(self, noise_type="white", peak_to_peak=1.0, fs=44100, seed=None,
+                 low_frequency=None, high_frequency=None, order=4):
+        self.noise_type = noise_type
+        self.fs = fs
+        self.rng = np.random.default_rng(seed)
+        self.limit = peak_to_peak / 2
+        self.sigma = peak_to_peak / 6  # 6 sigma range for normal distribution
+        self.filter = shaping_filter(noise_type, fs, low_frequency, high_frequency, order)
+
+        self.zi = None
+        if self.filter is not None:
+            sos, gain, settle = self.filter
+            self.scale = self.sigma / gain
+            # Run the filter into steady state so the first chunk has no start-up transient
+            self.zi = np.zeros((sos.shape[0], 2))
+            if settle:
+                _, self.zi = signal.sosfilt(sos, self.rng.standard_normal(settle), zi=self.zi)
+
+    def generate(self, n):
+        """Next `n` samples of the noise signal"""
+        white = self.rng.standard_normal(n)
+        if self.filter is None:
+            white *= self.sigma
+            return np.clip(white, -self.limit, self.limit, out=white)
+        noise, self.zi = signal.sosfilt(self.filter[0], white, zi=self.zi)
+        noise *= self.scale
+        # Only the output is clipped: the filter state stays that of the unclipped signal
+        return np.clip(noise, -self.limit, self.limit, out=noise)
+
+    def chunks(self, total, chunk_size=65536):
+        """Yield `total` samples in chunks of at most `chunk_size`"""
+        for start in range(0, total, chunk_size):
+            yield self.generate(min(chunk_size, total - start))
+
+
+def generator_from_params(noise_params, fs):
+    """NoiseGenerator configured from the Noise block parameters"""
+    return NoiseGenerator(noise_params.get("noise_type", "white"),
+                          noise_params.get("peak_to_peak", 1.0), fs,
+                          seed=noise_params.get("seed"),
+                          low_frequency=noise_params.get("low_frequency"),
+                          high_frequency=noise_params.get("high_frequency"),
+                          order=noise_params.get("order", 4))
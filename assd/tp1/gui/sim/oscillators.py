@@ -0,0 +1,101 @@
+"""
+Oscillator bank for multi-component test signals.
+
+All the sinusoids of a Signal block are generated together, block by block.
+Over a block of L samples each component is
+
+    sin(phase + w*k) = sin(phase) * cos(w*k) + cos(phase) * sin(w*k),   k < L
+
+The cos(w*k) and sin(w*k) matrices (components x L) are the same for every
+block, so they are computed once. Each block then costs two matrix-vector
+products with no trigonometric functions. Between blocks only the phase
+accumulators advance, wrapped to [0, 2*pi) so long runs stay accurate.
+
+`generate` streams the signal at a fixed sampling rate and keeps the phases
+between calls, so consecutive chunks join continuously.
+"""
+
+import numpy as np
+
+# Size of the basis matrices of one block (components x samples)
+BLOCK_ELEMENTS = 1 << 18
+MAX_BLOCK_LENGTH = 8192
+
+
+class OscillatorBank:
+    """Sum of sinusoids with per-component frequency, amplitude and phase (radians)"""
+
+    def __init__(self, frequencies, amplitudes=None, phases=None, fs=44100):
+        self.frequencies = np.asarray(frequencies, dtype=float)
+        count = len(self.frequencies)
+        self.amplitudes = np.ones(count) if amplitudes is None else np.asarray(amplitudes, dtype=float)
+        self.initial_phases = np.zeros(count) if phases is None else np.asarray(phases, dtype=float)
+        if self.amplitudes.shape != (count,) or self.initial_phases.shape != (count,):
+            raise ValueError("amplitudes and phases need one value per frequency")
+        self.fs = fs
+        self.omega = 2 * np.pi * self.frequencies
+        self.block_length = int(np.clip(BLOCK_ELEMENTS // max(count, 1), 1, MAX_BLOCK_LENGTH))
+        self._basis = {}
+        self.reset()
+
+    def reset(self):
+        """Restart the streamed signal at t = 0"""
+        self.phase = self.initial_phases.copy()
+
+    def _basis_for(self, dt):
+        """cos(w*k*dt) and sin(w*k*dt) for one block, cached per time step"""
+        if dt not in self._basis:
+            angles = np.multiply.outer(self.omega * dt, np.arange(self.block_length))
+            self._basis[dt] = (np.cos(angles), np.sin(angles))
+        return self._basis[dt]
+
+    def _run(self, phase, n, dt):
+        """n samples spaced dt starting at the given phases; returns (signal, next phases)"""
+        out = np.zeros(n)
+        if len(self.frequencies) == 0:
+            return out, phase
+        cos_basis, sin_basis = self._basis_for(dt)
+        step = self.omega * dt
+        for start in range(0, n, self.block_length):
+            length = min(self.block_length, n - start)
+            block = out[start:start + length]
+            block += (self.amplitudes * np.sin(phase)) @ cos_basis[:, :length]
+            block += (self.amplitudes * np.cos(phase)) @ sin_basis[:, :length]
+            phase = np.mod(phase + step * length, 2 * np.pi)
+        return out, phase
+
+    def sample(self, t0, dt, n):
+        """Signal on the uniform grid t0 + k*dt, k < n (does not touch the streaming phase)"""
+        out, _ = self._run(self.initial_phases + self.omega * t0, n, dt)
+        return out
+
+    def evaluate(self, t):
+        """Signal at arbitrary time instants `t` (seconds)"""
+        t = np.asarray(t, dtype=float)
+        phases = np.multiply.outer(self.omega, t) + self.initial_phases[:, None]
+        return self.amplitudes @ np.sin(phases)
+
+    def generate(self, n):
+        """Next `n` samples of the streamed signal"""
+        out, self.phase = self._run(self.phase, n, 1.0 / self.fs)
+        return out
+
+    def chunks(self, total, chunk_size=65536):
+        """Yield `total` samples in chunks of at most `chunk_size`"""
+        for start in range(0, total, chunk_size):
+            yield self.generate(min(chunk_size, total - start))
+
+
+def bank_from_params(signal_params, fs=44100):
+    """
+    OscillatorBank of the Signal block parameters. The block amplitude is
+    split evenly between components; the optional "amplitudes" (relative
+    weights) and "phases" (degrees) lists set each component.
+    """
+    frequencies = signal_params["frequencies"]
+    amplitude = signal_params["amplitude"] / signal_params["n_components"]
+    weights = signal_params.get("amplitudes") or [1.0] * len(frequencies)
+    phases = signal_params.get("phases") or [0.0] * len(frequencies)
+    return OscillatorBank(frequencies,
+                          amplitude * np.asarray(weights[:len(frequencies)], dtype=float),
+                          np.deg2rad(phases[:len(frequencies)]), fs)
@@ -0,0 +1,324 @@
+"""
+Plot generation for simulation results.
+
+Plotting is split in two steps:
+  - `compute_plot_spec` decides, once per block, everything that depends on
+    the analysis of the signals: axis limits, titles and marker lines.
+  - `render_figure` draws a spec. The viewer calls it lazily when a block is
+    selected, and `export_plots` renders PNG batches in worker processes.
+
+Figures are built with the object oriented matplotlib API on the Agg canvas
+instead of pyplot, so they can be rendered from worker threads and processes.
+"""
+
+import os
+import datetime
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import numpy as np
+from matplotlib.figure import Figure
+
+from sim import blocks
+from sim.profiler import NULL_PROFILER
+from sim.spectrum import get_spectrum
+
+
+def make_output_dir(base_dir="signal_plots"):
+    """Create a unique folder for this simulation run"""
+    timestamp = datetime.datetime.now().strftime("%Y-%m-%d_%H-%M-%S")
+    output_dir = f"{base_dir}/sim_{timestamp}"
+    os.makedirs(output_dir, exist_ok=True)
+    return output_dir
+
+
+def _spectrum(signal_data, fs):
+    """Normalized magnitude spectrum and its frequency bins"""
+    spectrum = get_spectrum(signal_data, fs)
+    return spectrum.magnitude, spectrum.freqs
+
+
+def _cycles_xlim(time_array, freq, cycles=3):
+    """Time axis limits that show `cycles` periods of `freq`"""
+    display_time = cycles / freq
+    # Find index closest to display_time
+    idx = min(len(time_array), max(1, int(display_time / (time_array[1] - time_array[0]))))
+    return (0, time_array[idx-1])
+
+
+def _first_clock_frequency(block_info):
+    """Frequency of the first Clock block of the diagram (None if there is none)"""
+    for other_info in block_info.values():
+        if other_info.get('type') == 'Clock':
+            return other_info.get('params', {}).get('frequency')
+    return None
+
+
+def compute_plot_spec(block_id, signal_data, time_array, block_info, raw_input_signals,
+                      fs=blocks.DEFAULT_FS):
+    """
+    Decide how the output of one block is plotted.
+
+    Returns a small dict with the file name, titles, axis limits and marker lines
+    (tuples of x, color, linestyle, alpha, label) of the time and frequency plots.
+    """
+    # Get block type and parameters for better naming
+    block_type = block_info.get(block_id, {}).get('type', "Unknown")
+    block_params = block_info.get(block_id, {}).get('params', {})
+
+    # Create descriptive filename based on block type and parameters
+    param_info = ""
+    if block_type == 'Signal':
+        freqs = block_params.get('frequencies', [])
+        if freqs:
+            param_info = f"{len(freqs)}freqs_{freqs[0]}Hz"
+    elif block_type in ['FAA', 'FR']:
+        param_info = f"fc_{block_params.get('cutoff_frequency', 0)}Hz"
+        if block_params.get('filter_type', 'ideal') != 'ideal':
+            param_info += f"_{block_params['filter_type']}{block_params.get('order', '')}"
+    elif block_type == 'Clock':
+        param_info = f"{block_params.get('frequency', 0)}Hz"
+    elif block_type == 'Noise':
+        param_info = f"amp_{block_params.get('peak_to_peak', 1.0)}"
+    suffix = ' - ' + param_info if param_info else ''
+
+    spec = {
+        'block_id': block_id,
+        'block_type': block_type,
+        'description': f"{block_type} {param_info}",
+        # Last 6 chars of the ID keep blocks with the same type and parameters apart
+        'filename': "_".join(part for part in (block_type, param_info, block_id[-6:]) if part) + ".png",
+        'time_title': f"{block_type} - Time Domain{suffix}",
+        'freq_title': f"{block_type} - Frequency Domain{suffix}",
+        'time_xlim': None,
+        'time_ylim': None,
+        'freq_xlim': None,
+        'freq_lines': [],
+        # For S&H and A.Switch blocks, also plot the input signal as a dashed line
+        'show_input': block_type in ['S&H', 'A.Switch'] and bool(raw_input_signals.get(block_id)),
+        'fs': fs,
+    }
+
+    if len(signal_data) == 0:
+        return spec
+
+    try:
+        if block_type == 'Signal':
+            # Show 3 cycles of the first component and twice the highest frequency
+            freqs_list = block_params.get('frequencies', [1000])
+            spec['time_xlim'] = _cycles_xlim(time_array, freqs_list[0])
+            spec['freq_xlim'] = (0, (max(freqs_list) if freqs_list else 1000) * 2)
+            # Mark each frequency component
+            for i, component_freq in enumerate(freqs_list):
+                spec['freq_lines'].append((component_freq, 'r', '--', 1.0,
+                                           f'Component {i+1}: {component_freq} Hz'))
+
+        elif block_type in ['FAA', 'FR']:
+            # Time domain based on the lowest significant frequency (above 1% of max)
+            spectrum = get_spectrum(signal_data, fs)
+            significant_freqs = spectrum.freqs[spectrum.peaks(0.01, skip_dc=False)]
+            if len(significant_freqs) > 0:
+                # Exclude near-zero DC component
+                above_dc = significant_freqs[significant_freqs > 10]
+                min_freq = above_dc[0] if len(above_dc) > 0 else 1000
+                spec['time_xlim'] = _cycles_xlim(time_array, min_freq)
+                spec['time_title'] = (f"{block_type} (fc={block_params.get('cutoff_frequency', 'N/A')} Hz)"
+                                      f" - Time Domain")
+            # Show up to 150% of the cutoff frequency and mark the cutoff
+            fc = block_params.get('cutoff_frequency', 5000)
+            spec['freq_xlim'] = (0, fc * 1.5)
+            spec['freq_lines'].append((fc, 'r', '--', 1.0, f'Cutoff: {fc} Hz'))
+
+        elif block_type == 'Clock':
+            # Show 3 cycles and the first 7 harmonics
+            freq = block_params.get('frequency', 1000)
+            spec['time_xlim'] = _cycles_xlim(time_array, freq)
+            spec['freq_xlim'] = (0, freq * 7)
+            spec['freq_lines'].append((freq, 'r', '--', 1.0, f'Fundamental: {freq} Hz'))
+            for i in range(2, 8):
+                spec['freq_lines'].append((freq * i, 'g', ':', 0.5, f'Harmonic {i}: {freq * i} Hz'))
+
+        elif block_type == 'S&H':
+            clock_freq = _first_clock_frequency(block_info)
+
+            # Show 3 cycles of the input signal (not the sampling frequency)
+            min_freq = get_spectrum(signal_data, fs).fundamental()
+            if min_freq is None:
+                # Half the clock is a common input frequency
+                min_freq = clock_freq / 2 if clock_freq else 100
+            elif min_freq < 10:
+                # If freq is too low, might be noise
+                min_freq = 100
+            spec['time_xlim'] = _cycles_xlim(time_array, min_freq)
+            spec['time_title'] = (f"{block_type} - Time Domain (Input={min_freq:.1f}Hz, "
+                                  f"Fs={clock_freq if clock_freq else 'unknown'}Hz){suffix}")
+
+            if not clock_freq:
+                # If no clock found, estimate it from the spacing of the top 10 spectral peaks
+                spectrum = get_spectrum(signal_data, fs)
+                peak_freqs = np.sort(spectrum.freqs[spectrum.largest(10)])
+                clock_freq = np.median(np.diff(peak_freqs)) if len(peak_freqs) > 1 else 1000
+
+            # Show 4x the clock frequency to see multiple spectral replicas
+            spec['freq_xlim'] = (0, clock_freq * 4.5)
+            spec['freq_lines'].append((clock_freq, 'r', '--', 1.0, f'Clock: {clock_freq:.1f} Hz'))
+            for i in range(2, 5):
+                spec['freq_lines'].append((clock_freq * i, 'g', ':', 0.7,
+                                           f'{i}×Clock: {clock_freq * i:.1f} Hz'))
+            spec['freq_title'] = f"{block_type} - Frequency Domain (with spectral replicas){suffix}"
+
+        elif block_type == 'A.Switch':
+            # Show 3 cycles of the input signal's fundamental frequency
+            if raw_input_signals.get(block_id):
+                min_freq = get_spectrum(raw_input_signals[block_id][0], fs).fundamental()
+                if min_freq is None or min_freq < 10:
+                    min_freq = 100
+                spec['time_xlim'] = _cycles_xlim(time_array, min_freq)
+                spec['time_title'] = f"{block_type} - Time Domain (Input={min_freq:.1f}Hz){suffix}"
+
+        elif block_type in ['Adder', 'Multiplier']:
+            # Show 1.5x the highest of the top 5 spectral peaks and mark them
+            spectrum = get_spectrum(signal_data, fs)
+            freqs = spectrum.freqs
+            peak_indices = spectrum.largest(5)
+            spec['freq_xlim'] = (0, freqs[peak_indices].max() * 1.5)
+            for i, idx in enumerate(reversed(peak_indices)):
+                spec['freq_lines'].append((freqs[idx], 'r' if i == 0 else 'g', '--', 0.7,
+                                           f'Peak {i+1}: {freqs[idx]:.1f} Hz'))
+
+            # In time domain, show four cycles of the lowest frequency of the inputs
+            min_freqs = [get_spectrum(sig, fs).fundamental() for sig in raw_input_signals.get(block_id, [])
+                         if sig is not None]
+            min_freqs = [f for f in min_freqs if f is not None and f >= 10]
+            if min_freqs:
+                lowest_freq = min(min_freqs)
+                spec['time_xlim'] = _cycles_xlim(time_array, lowest_freq, cycles=4)
+                spec['time_title'] = f"{block_type} - Time Domain (4 cycles of {lowest_freq:.1f}Hz){suffix}"
+
+        elif block_type == 'Noise':
+            # Show up to the Nyquist frequency and the peak-to-peak range
+            peak_to_peak = block_params.get('peak_to_peak', 1.0)
+            spec['freq_xlim'] = (0, fs / 2)
+            spec['time_ylim'] = (-peak_to_peak/2, peak_to_peak/2)
+            spec['time_title'] = f"{block_type} (Amp={peak_to_peak}) - Time Domain{suffix}"
+            spec['freq_title'] = f"{block_type} (Amp={peak_to_peak}) - Frequency Domain{suffix}"
+
+        else:
+            # Generic display for other block types, limited to 10 kHz
+            spec['freq_xlim'] = (0, 10000)
+
+    except (IndexError, ZeroDivisionError, ValueError, TypeError):
+        # Default view if error
+        pass
+
+    return spec
+
+
+def compute_plot_specs(signals, time_array, block_info, raw_input_signals,
+                       fs=blocks.DEFAULT_FS, progress=None, is_cancelled=None,
+                       profiler=NULL_PROFILER):
+    """
+    Plot specs of every block output, keyed by block id.
+
+    `progress(done, total, message)` is called after each spec and
+    `is_cancelled()` is polled between blocks; when it returns True the
+    remaining specs are skipped.
+    """
+    specs = {}
+    with profiler.section("analysis", "phase", samples=len(time_array) * len(signals)):
+        for done, (block_id, signal_data) in enumerate(signals.items(), start=1):
+            if is_cancelled is not None and is_cancelled():
+                break
+            block_type = block_info.get(block_id, {}).get('type', 'Unknown')
+            with profiler.section(f"{block_type} {str(block_id)[-6:]}", "analysis", samples=len(signal_data)):
+                specs[block_id] = compute_plot_spec(block_id, signal_data, time_array, block_info,
+                                                    raw_input_signals, fs)
+            if progress is not None:
+                progress(done, len(signals), specs[block_id]['description'])
+    return specs
+
+
+def render_figure(spec, signal_data, time_array, input_signal=None):
+    """Draw the time and frequency domain plots described by `spec`"""
+    fig = Figure(figsize=(10, 8))
+    ax1, ax2 = fig.subplots(2, 1)
+
+    # Only draw the visible part of the time axis
+    if spec['time_xlim'] is not None:
+        stop = np.searchsorted(time_array, spec['time_xlim'][1], side='right') + 1
+    else:
+        stop = len(time_array)
+
+    # Plot time domain - output signal first
+    ax1.plot(time_array[:stop], signal_data[:stop], 'b-', linewidth=2.0, label='Output')
+    if spec['show_input'] and input_signal is not None:
+        ax1.plot(time_array[:stop], input_signal[:stop],
+                 'r--',         # Red dashed line
+                 linewidth=1.5,
+                 alpha=0.7,     # Semi-transparent
+                 label='Input')
+        ax1.legend()
+
+    ax1.set_title(spec['time_title'])
+    ax1.set_xlabel("Time (s)")
+    ax1.set_ylabel("Amplitude")
+    ax1.grid(True)
+    if spec['time_xlim'] is not None:
+        ax1.set_xlim(*spec['time_xlim'])
+    if spec['time_ylim'] is not None:
+        ax1.set_ylim(*spec['time_ylim'])
+
+    # Frequency domain (simple FFT)
+    if len(signal_data) > 0:
+        fft_result, freqs = _spectrum(signal_data, spec['fs'])
+        ax2.plot(freqs, fft_result)
+        ax2.set_title(spec['freq_title'])
+        ax2.set_xlabel("Frequency (Hz)")
+        ax2.set_ylabel("Magnitude")
+        ax2.grid(True)
+        if spec['freq_xlim'] is not None:
+            ax2.set_xlim(*spec['freq_xlim'])
+        for x, color, linestyle, alpha, label in spec['freq_lines']:
+            ax2.axvline(x=x, color=color, linestyle=linestyle, alpha=alpha, label=label)
+        if spec['freq_lines']:
+            ax2.legend()
+
+    fig.tight_layout()
+    return fig
+
+
+def save_plot(spec, signal_data, time_array, input_signal, output_dir):
+    """Render a spec and save it as PNG; returns (description, filename)"""
+    filename = os.path.join(output_dir, spec['filename'])
+    render_figure(spec, signal_data, time_array, input_signal).savefig(filename)
+    return spec['description'], filename
+
+
+def _save_plot_job(job):
+    # Module level so it can be pickled for the process pool
+    return save_plot(*job)
+
+
+def export_plots(specs, signals, time_array, raw_input_signals, output_dir,
+                 max_workers=None, progress=None, profiler=NULL_PROFILER):
+    """
+    Save the PNGs of every spec into `output_dir` using a process pool.
+    Returns the list of (description, filename) tuples.
+    """
+    jobs = []
+    for block_id, spec in specs.items():
+        inputs = raw_input_signals.get(block_id)
+        input_signal = inputs[0] if spec['show_input'] and inputs else None
+        jobs.append((spec, signals[block_id], time_array, input_signal, output_dir))
+
+    # Spawned workers only import this module (and the Agg canvas), never Qt state
+    context = multiprocessing.get_context("spawn")
+    plot_files = []
+    with profiler.section("viewer", "phase", samples=len(time_array) * len(jobs)), \
+            profiler.section("export PNGs", "viewer", samples=len(time_array) * len(jobs)), \
+            ProcessPoolExecutor(max_workers=max_workers, mp_context=context) as pool:
+        futures = [pool.submit(_save_plot_job, job) for job in jobs]
+        for done, future in enumerate(as_completed(futures), start=1):
+            plot_files.append(future.result())
+            if progress is not None:
+                progress(done, len(jobs), plot_files[-1][0])
+    return plot_files
@@ -0,0 +1,141 @@
+"""
+Per-block and per-phase profiler for simulation runs.
+
+Each profiled section records wall time, samples processed and memory
+allocated (through tracemalloc, which also sees numpy buffers):
+
+    profiler = Profiler()
+    with profiler.section("sources", "phase"):
+        with profiler.section("Clock 1000Hz", "block", samples=len(t)):
+            ...
+    print(profiler.summary())
+    profiler.save_trace("trace.json")
+
+The trace uses the Chrome trace event format, so it opens in chrome://tracing
+or https://ui.perfetto.dev.
+"""
+
+import contextlib
+import json
+import os
+import threading
+import time
+import tracemalloc
+
+
+class Section:
+    """Measurements of one profiled section"""
+
+    def __init__(self, name, category, start, samples):
+        self.name = name
+        self.category = category
+        self.start = start            # seconds, relative to the profiler start
+        self.duration = 0.0           # seconds
+        self.samples = samples
+        self.allocated = None         # bytes still allocated at the end of the section
+        self.peak = None              # highest allocation above the start level, in bytes
+        self.thread_id = threading.get_ident()
+
+
+class Profiler:
+    """Collects timed sections; with `trace_memory` it also tracks allocations"""
+
+    def __init__(self, trace_memory=True):
+        self.trace_memory = trace_memory
+        self.sections = []
+        self._origin = time.perf_counter()
+        # Running allocation peaks of the open sections of every thread (the
+        # viewer profiles from the GUI and the export threads). tracemalloc has
+        # one process-wide peak, so each reset first folds it into all of them
+        # under the lock: a section's peak includes what other threads allocate
+        self._open_peaks = {}
+        self._lock = threading.Lock()
+        # Only stop tracemalloc in stop() if this profiler started it
+        self._started_tracing = trace_memory and not tracemalloc.is_tracing()
+        if self._started_tracing:
+            tracemalloc.start()
+
+    @contextlib.contextmanager
+    def section(self, name, category, samples=0):
+        """Profile the body of a `with` block; `samples` can also be set on the yielded Section"""
+        record = Section(name, category, time.perf_counter() - self._origin, samples)
+        if self.trace_memory:
+            with self._lock:
+                start_memory = self._fold_peak()
+                tracemalloc.reset_peak()
+                self._open_peaks[id(record)] = start_memory
+
+        try:
+            yield record
+        finally:
+            record.duration = time.perf_counter() - self._origin - record.start
+            if self.trace_memory:
+                with self._lock:
+                    current = self._fold_peak()
+                    record.allocated = current - start_memory
+                    record.peak = self._open_peaks.pop(id(record)) - start_memory
+            self.sections.append(record)
+
+    def _fold_peak(self):
+        """Fold the tracemalloc peak into every open section; returns the current memory"""
+        current, peak = tracemalloc.get_traced_memory()
+        for key, open_peak in self._open_peaks.items():
+            self._open_peaks[key] = max(open_peak, peak)
+        return current
+
+    def stop(self):
+        """Stop tracking allocations (only if this profiler started tracemalloc)"""
+        if self._started_tracing and tracemalloc.is_tracing():
+            tracemalloc.stop()
+
+    def summary(self):
+        """Text table with the totals of every (category, name) pair"""
+        rows = {}
+        for record in self.sections:
+            row = rows.setdefault((record.category, record.name),
+                                  {"count": 0, "time": 0.0, "samples": 0, "allocated": 0, "peak": 0})
+            row["count"] += 1
+            row["time"] += record.duration
+            row["samples"] += record.samples
+            if record.allocated is not None:
+                row["allocated"] += record.allocated
+                row["peak"] = max(row["peak"], record.peak)
+
+        header = (f"{'category':<10} {'name':<28} {'calls':>5} {'time ms':>10} "
+                  f"{'samples':>10} {'Msamp/s':>9} {'alloc MB':>9} {'peak MB':>8}")
+        lines = [header, "-" * len(header)]
+        for (category, name), row in rows.items():
+            rate = row["samples"] / row["time"] / 1e6 if row["time"] > 0 and row["samples"] else 0.0
+            lines.append(f"{category:<10} {name[:28]:<28} {row['count']:>5} {row['time'] * 1e3:>10.2f} "
+                         f"{row['samples']:>10} {rate:>9.2f} {row['allocated'] / 2**20:>9.2f} "
+                         f"{row['peak'] / 2**20:>8.2f}")
+        return "\n".join(lines)
+
+    def trace_events(self):
+        """Sections as Chrome trace 'complete' events"""
+        events = []
+        for record in self.sections:
+            args = {"samples": record.samples}
+            if record.allocated is not None:
+                args["allocated_bytes"] = record.allocated
+                args["peak_bytes"] = record.peak
+            events.append({"name": record.name, "cat": record.category, "ph": "X",
+                           "ts": record.start * 1e6, "dur": record.duration * 1e6,
+                           "pid": os.getpid(), "tid": record.thread_id, "args": args})
+        return events
+
+    def save_trace(self, path):
+        """Write the sections as a JSON trace"""
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump({"traceEvents": self.trace_events(), "displayTimeUnit": "ms"}, f)
+
+
+class NullProfiler:
+    """Profiler stand-in that records nothing"""
+
+    @contextlib.contextmanager
+    def section(self, name, category, samples=0):
+        yield Section(name, category, 0.0, samples)
+
+
+NULL_PROFILER = NullProfiler()
@@ -0,0 +1,136 @@
+"""
+Shared spectrum cache.
+
+The same signal is analyzed by several consumers (FAA/FR filtering of an
+input, plot specs of the block and of its downstream blocks, rendering), so
+its rfft is computed once and shared. Entries are keyed by the identity and
+length of the signal array and dropped as soon as the array is freed, or
+least recently used first once the cache holds more than CACHE_BYTES.
+Signals memory-mapped from disk (spilled by the SignalStore) are analyzed
+without caching, so their spectra never pile up in RAM.
+
+Signals must not be modified in place after they have been analyzed.
+"""
+
+import functools
+import weakref
+from collections import OrderedDict
+import numpy as np
+
+# Memory budget of the shared cache (bytes)
+CACHE_BYTES = 256 * 2**20
+
+
+@functools.lru_cache(maxsize=32)
+def rfft_frequencies(n, fs):
+    """Frequency bins of an n-point rfft (shared, read-only)"""
+    freqs = np.fft.rfftfreq(n, 1/fs)
+    freqs.setflags(write=False)
+    return freqs
+
+
+class Spectrum:
+    """rfft of a signal with its magnitude and peaks derived on first use"""
+
+    def __init__(self, signal, fs):
+        self.n = len(signal)
+        self.fs = fs
+        self.fft = np.fft.rfft(signal)
+        if signal.dtype == np.float32:
+            # Single precision signals keep a single precision spectrum
+            self.fft = self.fft.astype(np.complex64, copy=False)
+        self.fft.setflags(write=False)
+        self.freqs = rfft_frequencies(self.n, fs)
+        self._magnitude = None
+        self._peaks = {}
+        self._largest = {}
+
+    @property
+    def magnitude(self):
+        """Magnitude spectrum normalized by the signal length"""
+        if self._magnitude is None:
+            self._magnitude = np.abs(self.fft) / self.n
+            self._magnitude.setflags(write=False)
+        return self._magnitude
+
+    def peaks(self, threshold=0.1, skip_dc=True):
+        """
+        Indices of the bins above `threshold` times the largest magnitude,
+        in increasing frequency. With `skip_dc` the DC bin is ignored.
+        """
+        key = (threshold, skip_dc)
+        if key not in self._peaks:
+            start = 1 if skip_dc else 0
+            magnitude = self.magnitude[start:]
+            if len(magnitude) == 0:
+                indices = np.array([], dtype=int)
+            else:
+                indices = np.flatnonzero(magnitude > np.max(magnitude) * threshold) + start
+            indices.setflags(write=False)
+            self._peaks[key] = indices
+        return self._peaks[key]
+
+    def fundamental(self, threshold=0.1):
+        """Lowest non-DC peak frequency (None if there is no peak)"""
+        indices = self.peaks(threshold)
+        return self.freqs[indices[0]] if len(indices) else None
+
+    def largest(self, count):
+        """Indices of the `count` largest bins, from smallest to largest magnitude"""
+        if count not in self._largest:
+            self._largest[count] = np.argsort(self.magnitude)[-count:]
+        return self._largest[count]
+
+
+class SpectrumCache:
+    """Spectra keyed by (signal identity, length, sampling rate), LRU within `max_bytes`"""
+
+    def __init__(self, max_bytes=CACHE_BYTES):
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()
+        self._bytes = 0
+
+    def get(self, signal, fs):
+        if isinstance(signal, np.memmap):
+            return Spectrum(signal, fs)
+        key = (id(signal), len(signal), fs)
+        entry = self._entries.get(key)
+        if entry is not None and entry[0]() is signal:
+            self._entries.move_to_end(key)
+            return entry[1]
+
+        spectrum = Spectrum(signal, fs)
+        # Forget the spectrum when the signal is garbage collected
+        ref = weakref.ref(signal, lambda _, key=key: self._drop(key))
+        self._drop(key)
+        self._entries[key] = (ref, spectrum)
+        # The fft and, once derived, its magnitude
+        self._bytes += spectrum.fft.nbytes * 3 // 2
+        while self._bytes > self.max_bytes and len(self._entries) > 1:
+            self._drop(next(iter(self._entries)))
+        return spectrum
+
+    def _drop(self, key):
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self._bytes -= entry[1].fft.nbytes * 3 // 2
+
+    def clear(self):
+        self._entries.clear()
+        self._bytes = 0
+
+    @property
+    def nbytes(self):
+        return self._bytes
+
+    def __len__(self):
+        return len(self._entries)
+
+
+# Cache shared by the blocks, the plot specs and the viewer
+_cache = SpectrumCache()
+
+
+def get_spectrum(signal, fs):
+    """Cached spectrum of `signal` sampled at `fs`"""
+    return _cache.get(signal, fs)
@@ -0,0 +1,97 @@
+"""
+Memory-bounded storage of block output signals.
+
+`SignalStore` is the mapping the engine writes block outputs to. It can
+
+  - keep samples in single precision (`dtype=np.float32`, half the memory),
+  - spill arrays to memory-mapped `.npy` files once the signals held in RAM
+    exceed `spill_bytes`; the OS pages them in when a block or the viewer
+    reads them,
+  - free outputs nobody needs any more: the engine deletes an intermediate
+    signal as soon as its last consumer has run, unless it has to be kept
+    for the viewer or the output file.
+
+Spilled files live in a private temporary folder that is removed with the
+store (or at interpreter exit).
+"""
+
+import itertools
+import os
+import shutil
+import tempfile
+import weakref
+from collections.abc import MutableMapping
+import numpy as np
+
+
+class SignalStore(MutableMapping):
+    """{block_id: signal} mapping with optional float32 storage and spill to disk"""
+
+    def __init__(self, dtype=np.float64, spill_bytes=None, spill_dir=None):
+        self.dtype = np.dtype(dtype)
+        self.spill_bytes = spill_bytes
+        self._parent_dir = spill_dir
+        self._spill_dir = None
+        self._signals = {}
+        self._spilled = {}          # {block_id: .npy path} of the memory-mapped signals
+        self._memory_bytes = 0
+        self._file_numbers = itertools.count()
+
+    @property
+    def memory_bytes(self):
+        """Bytes of the signals held in RAM"""
+        return self._memory_bytes
+
+    @property
+    def disk_bytes(self):
+        """Bytes of the signals spilled to disk"""
+        return sum(self._signals[key].nbytes for key in self._spilled)
+
+    def _spill_path(self):
+        if self._spill_dir is None:
+            if self._parent_dir is not None:
+                os.makedirs(self._parent_dir, exist_ok=True)
+            self._spill_dir = tempfile.mkdtemp(prefix="tp1_signals_", dir=self._parent_dir)
+            weakref.finalize(self, shutil.rmtree, self._spill_dir, ignore_errors=True)
+        return os.path.join(self._spill_dir, f"signal_{next(self._file_numbers)}.npy")
+
+    def __setitem__(self, key, signal):
+        if key in self._signals:
+            del self[key]
+        signal = np.asarray(signal).astype(self.dtype, copy=False)
+
+        if self.spill_bytes is not None and self._memory_bytes + signal.nbytes > self.spill_bytes:
+            path = self._spill_path()
+            mapped = np.lib.format.open_memmap(path, mode="w+", dtype=self.dtype, shape=signal.shape)
+            mapped[:] = signal
+            mapped.flush()
+            self._spilled[key] = path
+            self._signals[key] = mapped
+        else:
+            self._signals[key] = signal
+            self._memory_bytes += signal.nbytes
+
+    def __getitem__(self, key):
+        return self._signals[key]
+
+    def __delitem__(self, key):
+        signal = self._signals.pop(key)
+        path = self._spilled.pop(key, None)
+        if path is None:
+            self._memory_bytes -= signal.nbytes
+        else:
+            # The file goes away once the last view of the map is released (immediately on POSIX)
+            del signal
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+    def __iter__(self):
+        return iter(self._signals)
+
+    def __len__(self):
+        return len(self._signals)
+
+    def is_spilled(self, key):
+        return key in self._spilled
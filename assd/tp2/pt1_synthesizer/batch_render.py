@@ -0,0 +1,286 @@
+"""
+/**
+ * @file batch_render.py
+ * @brief Non-interactive render of MIDI songs from a render spec (JSON or YAML).
+ *
+ * The spec maps the tracks of each song to a synthesis engine and its
+ * parameters, so nothing is asked through input():
+ *
+ *     output: output/batch            # output folder (default: output/batch)
+ *     workers: 4                      # worker processes (default: CPU count)
+ *     default: {engine: fm, timbre: brass}    # tracks without an entry
+ *     songs:
+ *       - midi: midis/love-me-do.mid
+ *         tracks:
+ *           3: {engine: sample, instrumento: guitarra, render_mode: fast}
+ *           5: {engine: ks, modelo: percusion, ruido: true, seed: 7}
+ *           "*": {engine: fm, timbre: woodwind}   # every other track
+ *         effects: {eco: {delay_ms: 150, attenuation_db: 6}, pasabajos: {cutoff: 3000}}
+ *         spectrogram: true
+ *       - midi: midis/                # a folder: every .mid in it
+ *
+ * Engines are the registered synths (synth.get_synth): "sample", "ks" and
+ * "fm". The track params are the keyword arguments of their synthesis
+ * function. For "ks", `modelo` (arpa, guitarra, percusion) can replace `b`,
+ * and the seed defaults to one derived from the song and track, so a spec
+ * always renders the same audio. Without `tracks`, every track uses `default`;
+ * with `tracks` and no "*", the tracks not listed are skipped. A song listed
+ * on its own keeps its entry when its folder is listed too. Every param an
+ * engine would otherwise ask for must be given (REQUIRED_PARAMS) and named
+ * values must be valid (PARAM_CHOICES): a spec that breaks either is rejected
+ * before anything renders.
+ *
+ * Every track renders in a worker process. The outputs have fixed names:
+ *
+ *     <output>/<song>/Pista-<idx>-<engine>.wav   each track
+ *     <output>/<song>/master_mix.wav             mix of the tracks
+ *     <output>/<song>/master_mix_FX.wav          with the effects (if any)
+ *
+ * Usage (from pt1_synthesizer/):
+ *     python batch_render.py render.yaml
+ *     python batch_render.py render.json --workers 2 --output output/run1
+ *
+ * @date 2025
+ */
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import os
+import time
+import zlib
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import soundfile as sf
+import pretty_midi
+
+import synth.sample  # noqa: F401  (registers the synths)
+import synth.ks  # noqa: F401
+import synth.fm  # noqa: F401
+from synth import get_synth
+from synth.ks import KS_MODELS
+from synth.fm import FM_TIMBRES
+from synth.sample import INSTRUMENT_RENDER_MODES, RENDER_MODES
+from synth.wavetable import QUALITIES
+from core.mixer import mix_buffers
+from core.effects import process_effects
+from core.espectograma import plot_spectrogram
+
+SAMPLE_RATE = 44100
+DEFAULT_OUTPUT = os.path.join("output", "batch")
+
+# Params each engine needs so it does not prompt for them (alternatives in a tuple)
+REQUIRED_PARAMS = {
+    "sample": [("instrumento",)],
+    "ks": [("ruido",), ("b", "modelo")],
+    "fm": [("timbre",)],
+}
+
+# Accepted values of the params that take one of a few names
+PARAM_CHOICES = {
+    "sample": {"instrumento": list(INSTRUMENT_RENDER_MODES), "render_mode": RENDER_MODES},
+    "ks": {"modelo": list(KS_MODELS)},
+    "fm": {"timbre": FM_TIMBRES, "quality": QUALITIES},
+}
+
+
+def load_spec(path):
+    """Render spec from a .json or .yaml/.yml file"""
+    with open(path, "r", encoding="utf-8") as f:
+        if path.lower().endswith((".yaml", ".yml")):
+            import yaml
+            return yaml.safe_load(f)
+        return json.load(f)
+
+
+def song_files(spec):
+    """
+    (midi path, song entry) of every song of the spec; folders give all their
+    .mid files. A file listed on its own overrides its folder entry.
+    """
+    songs = {}
+    for entry in spec.get("songs", []):
+        midi = entry["midi"]
+        if os.path.isdir(midi):
+            for name in sorted(os.listdir(midi)):
+                path = os.path.join(midi, name)
+                if name.lower().endswith(".mid"):
+                    songs.setdefault(os.path.normcase(os.path.abspath(path)), (path, entry, False))
+        else:
+            key = os.path.normcase(os.path.abspath(midi))
+            if key in songs and songs[key][2]:
+                raise ValueError(f"Song listed twice: {midi}")
+            songs[key] = (midi, entry, True)
+    names = [song_name(path) for path, _, _ in songs.values()]
+    repeated = sorted({name for name in names if names.count(name) > 1})
+    if repeated:
+        raise ValueError(f"Songs with the same name would share an output folder: {', '.join(repeated)}")
+    return [(path, entry) for path, entry, _ in songs.values()]
+
+
+def song_name(midi_path):
+    return os.path.splitext(os.path.basename(midi_path))[0]
+
+
+def track_params(entry, default, track_idx):
+    """Engine params of a track (None: the track is skipped)"""
+    tracks = entry.get("tracks")
+    if tracks is None:
+        return default
+    # YAML gives int keys and JSON string keys
+    tracks = {str(key): value for key, value in tracks.items()}
+    return tracks.get(str(track_idx), tracks.get("*"))
+
+
+def track_seed(song, track_idx):
+    """Deterministic seed of a track"""
+    return zlib.crc32(f"{song}:{track_idx}".encode("utf-8"))
+
+
+def check_params(song, track_idx, params):
+    """Raise ValueError if the track params miss something its engine would prompt for, or have a bad value"""
+    where = f"song '{song}', track {track_idx}"
+    engine = params.get("engine")
+    if engine not in REQUIRED_PARAMS:
+        raise ValueError(f"{where}: 'engine' must be one of {', '.join(REQUIRED_PARAMS)} (got {engine!r})")
+    for keys in REQUIRED_PARAMS[engine]:
+        if all(params.get(key) is None for key in keys):
+            raise ValueError(f"{where}: engine '{engine}' needs {' or '.join(repr(key) for key in keys)}")
+    for key, choices in PARAM_CHOICES[engine].items():
+        if params.get(key) is not None and params[key] not in choices:
+            raise ValueError(f"{where}: '{key}' must be one of {', '.join(choices)} (got {params[key]!r})")
+
+
+def track_jobs(spec, output_dir):
+    """One (midi path, track, engine, synth kwargs, wav path) job per rendered track"""
+    default = spec.get("default")
+    jobs = []
+    for midi_path, entry in song_files(spec):
+        song = song_name(midi_path)
+        if entry.get("tracks") is None and default is None:
+            raise ValueError(f"song '{song}': no 'tracks' and the spec has no 'default'")
+        midi_data = pretty_midi.PrettyMIDI(midi_path)
+        for track_idx, instrument in enumerate(midi_data.instruments):
+            params = track_params(entry, default, track_idx)
+            if not params or not instrument.notes:
+                continue
+            check_params(song, track_idx, params)
+            params = dict(params)
+            engine = params.pop("engine")
+            if engine == "ks":
+                if "modelo" in params:
+                    params["b"] = KS_MODELS[params.pop("modelo")]
+                params.setdefault("seed", track_seed(song, track_idx))
+            path = os.path.join(output_dir, song, f"Pista-{track_idx}-{engine}.wav")
+            jobs.append((midi_path, track_idx, engine, params, path))
+    return jobs
+
+
+_midi_cache = {}
+
+
+def render_track_job(job):
+    """
+    Render one track (in a worker process). Returns (midi path, track,
+    engine, audio buffer, render seconds).
+    """
+    midi_path, track_idx, engine, params, path = job
+    if midi_path not in _midi_cache:
+        _midi_cache[midi_path] = pretty_midi.PrettyMIDI(midi_path)
+    started = time.perf_counter()
+    # The synths report each file they write; the summary replaces that
+    with contextlib.redirect_stdout(io.StringIO()):
+        audio = get_synth(engine)(_midi_cache[midi_path], track_idx, output_path=path, **params)
+    return midi_path, track_idx, engine, audio, time.perf_counter() - started
+
+
+def finish_song(song_dir, entry, buffers):
+    """Mix, effects and spectrogram of a song; returns the final master path"""
+    master = mix_buffers(buffers)
+    path = os.path.join(song_dir, "master_mix.wav")
+    sf.write(path, master, SAMPLE_RATE)
+    if entry.get("effects"):
+        path = process_effects(path, entry["effects"], os.path.join(song_dir, "master_mix_FX.wav"))
+    if entry.get("spectrogram"):
+        with contextlib.redirect_stdout(io.StringIO()):
+            plot_spectrogram(path, ask=False)
+    return path
+
+
+def render_spec(spec, output_dir=None, workers=None):
+    """
+    Render every song of a spec. Tracks render in parallel; each song is
+    mixed as soon as its last track is done. Returns the summary rows.
+    """
+    output_dir = output_dir or spec.get("output", DEFAULT_OUTPUT)
+    workers = workers or spec.get("workers")
+    entries = {midi_path: entry for midi_path, entry in song_files(spec)}
+    jobs = track_jobs(spec, output_dir)
+
+    pending = {}
+    for job in jobs:
+        pending[job[0]] = pending.get(job[0], 0) + 1
+    buffers = {midi_path: {} for midi_path in pending}
+    rows = []
+
+    def collect(result):
+        midi_path, track_idx, engine, audio, elapsed = result
+        rows.append({"song": song_name(midi_path), "track": track_idx, "engine": engine,
+                     "audio_s": len(audio) / SAMPLE_RATE, "render_s": elapsed})
+        buffers[midi_path][track_idx] = audio
+        pending[midi_path] -= 1
+        if pending[midi_path] == 0:
+            started = time.perf_counter()
+            tracks = buffers.pop(midi_path)
+            path = finish_song(os.path.join(output_dir, song_name(midi_path)), entries[midi_path],
+                               [tracks[idx] for idx in sorted(tracks)])
+            rows.append({"song": song_name(midi_path), "track": "master", "engine": os.path.basename(path),
+                         "audio_s": max(len(audio) for audio in tracks.values()) / SAMPLE_RATE,
+                         "render_s": time.perf_counter() - started})
+
+    if len(jobs) <= 1 or workers == 1:
+        for job in jobs:
+            collect(render_track_job(job))
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            for future in as_completed([pool.submit(render_track_job, job) for job in jobs]):
+                collect(future.result())
+
+    # Deterministic order in the summary: song, then tracks, then the master
+    rows.sort(key=lambda row: (row["song"], row["track"] == "master",
+                               row["track"] if row["track"] != "master" else 0))
+    return rows
+
+
+def format_summary(rows, wall_time):
+    lines = [f"{'song':<28} {'track':>6} {'engine':<20} {'audio s':>8} {'render s':>9} {'x realtime':>10}"]
+    for row in rows:
+        speed = row["audio_s"] / row["render_s"] if row["render_s"] > 0 else float("inf")
+        lines.append(f"{row['song'][:28]:<28} {row['track']:>6} {row['engine'][:20]:<20} "
+                     f"{row['audio_s']:>8.1f} {row['render_s']:>9.2f} {speed:>10.1f}")
+    busy = sum(row["render_s"] for row in rows)
+    lines.append(f"{len(rows)} renders, {busy:.2f} s of render time in {wall_time:.2f} s wall time")
+    return "\n".join(lines)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Render MIDI songs from a render spec, without prompts")
+    parser.add_argument("spec", help="render spec (.json, .yaml or .yml)")
+    parser.add_argument("-o", "--output", default=None,
+                        help=f"output folder (default: the spec 'output' or {DEFAULT_OUTPUT})")
+    parser.add_argument("--workers", type=int, default=None,
+                        help="worker processes (default: the spec 'workers' or the CPU count)")
+    args = parser.parse_args(argv)
+
+    started = time.perf_counter()
+    try:
+        rows = render_spec(load_spec(args.spec), args.output, args.workers)
+    except ValueError as e:
+        parser.error(str(e))
+    print(format_summary(rows, time.perf_counter() - started))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,111 @@
+"""
+/**
+ * @file cache.py
+ * @brief Memory and disk caches for rendered audio arrays.
+ *
+ * - `ByteLRU`: in-memory LRU cache limited by the total bytes of the arrays it
+ *   holds (not by the number of entries). The least recently used arrays are
+ *   evicted when a new one does not fit.
+ * - `DiskCache`: persistent tier that stores each array as a `.npy` file in a
+ *   folder, so later runs of the program can reuse it.
+ *
+ * Keys are tuples of plain values (strings, numbers). Cached arrays are shared
+ * between callers and are returned read-only.
+ *
+ * @date 2025
+ */
+"""
+
+import hashlib
+import os
+import re
+from collections import OrderedDict
+import numpy as np
+
+
+class ByteLRU:
+    """LRU cache of numpy arrays with a budget in bytes"""
+
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self.nbytes = 0
+        self.hits = 0
+        self.misses = 0
+        self._items = OrderedDict()
+
+    def get(self, key):
+        """Cached array of `key` (None if it is not cached)"""
+        array = self._items.get(key)
+        if array is None:
+            self.misses += 1
+            return None
+        self._items.move_to_end(key)
+        self.hits += 1
+        return array
+
+    def put(self, key, array):
+        """Store `array`; arrays larger than the whole budget are not cached"""
+        if key in self._items:
+            self.nbytes -= self._items.pop(key).nbytes
+        if array.nbytes > self.max_bytes:
+            return array
+        array.setflags(write=False)
+        self._items[key] = array
+        self.nbytes += array.nbytes
+        while self.nbytes > self.max_bytes:
+            _, evicted = self._items.popitem(last=False)
+            self.nbytes -= evicted.nbytes
+        return array
+
+    def clear(self):
+        self._items.clear()
+        self.nbytes = 0
+
+    def __len__(self):
+        return len(self._items)
+
+    def __contains__(self, key):
+        return key in self._items
+
+
+class DiskCache:
+    """Arrays stored as .npy files in `directory`, one file per key"""
+
+    def __init__(self, directory):
+        self.directory = directory
+
+    def path(self, key):
+        # Readable prefix plus a hash of the whole key, so any key gives a valid file name
+        readable = re.sub(r"[^A-Za-z0-9#+.-]+", "_", "_".join(str(part) for part in key))[:80]
+        digest = hashlib.sha1(repr(key).encode("utf-8")).hexdigest()[:12]
+        return os.path.join(self.directory, f"{readable}_{digest}.npy")
+
+    def get(self, key):
+        """Array stored for `key` (None if there is none or it cannot be read)"""
+        try:
+            array = np.load(self.path(key))
+        except (OSError, ValueError):
+            return None
+        array.setflags(write=False)
+        return array
+
+    def put(self, key, array):
+        """Write `array` for `key`; a read-only or full disk only disables the tier"""
+        path = self.path(key)
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            # Written under a temporary name, so a half-written file is never read
+            temp_path = f"{path}.{os.getpid()}.tmp"
+            with open(temp_path, "wb") as f:
+                np.save(f, array)
+            os.replace(temp_path, path)
+        except OSError:
+            pass
+        return array
+
+    def clear(self):
+        if not os.path.isdir(self.directory):
+            return
+        for name in os.listdir(self.directory):
+            if name.endswith(".npy"):
+                os.remove(os.path.join(self.directory, name))
@@ -80,6 +80,38 @@ def vibrato(audio_segment, depth=0.002, rate=5):
         channels=audio_segment.channels
     )
 
+# Effects of process_effects, in the order they are applied, and their parameters
+EFFECTS = {
+    "eco": eco_simple,                  # delay_ms, attenuation_db
+    "reverberacion": reverberacion_plana,  # delays_ms, attenuations_db
+    "pasabajos": lowpass_filter,        # cutoff
+    "flanger": flanger,                 # depth, rate
+    "vibrato": vibrato,                 # depth, rate
+}
+
+# --- NON-INTERACTIVE PROCESSING (batch renders) ---
+def process_effects(wav_path, effects, output_path=None):
+    """
+    Applies `effects` ({name: {param: value}}, names from EFFECTS) to a WAV
+    file, in the EFFECTS order, and writes the result to `output_path`
+    (default: output/master_mix_FX.wav). Returns the output path.
+    """
+    unknown = set(effects) - set(EFFECTS)
+    if unknown:
+        raise ValueError(f"Unknown effects: {', '.join(sorted(unknown))} (options: {', '.join(EFFECTS)})")
+    if not os.path.exists(wav_path):
+        raise FileNotFoundError(f"Error, archivo no encontrado: {wav_path}")
+
+    processed = AudioSegment.from_wav(wav_path)
+    for name, effect in EFFECTS.items():
+        if name in effects:
+            processed = effect(processed, **(effects[name] or {}))
+
+    output_path = output_path or os.path.join("output", "master_mix_FX.wav")
+    os.makedirs(os.path.dirname(output_path) or ".", exist_ok=True)
+    processed.export(output_path, format="wav")
+    return output_path
+
 # --- MAIN FUNCTION TO CALL FROM main.py ---
 def apply_effects(wav_path):
     si_o_no = input("Desea aplicarle efectos " \
@@ -91,8 +123,6 @@ def apply_effects(wav_path):
     if not os.path.exists(wav_path):
         raise FileNotFoundError(f"Error, archivo no encontrado: {wav_path}")
 
-    audio = AudioSegment.from_wav(wav_path)
-
     print("\nSeleccione efectos para aplicar:")
     apply_eco = input("Aplicar eco? [S/N]: ").lower() == 's'
     apply_rev = input("Aplicar reverberación? [S/N]: ").lower() == 's'
@@ -100,35 +130,34 @@ def apply_effects(wav_path):
     apply_flang = input("Aplicar flanger? [S/N]: ").lower() == 's'
     apply_vibr = input("Aplicar vibrato? [S/N]: ").lower() == 's'
 
-    processed = audio
+    effects = {}
 
     if apply_eco:
         delay = int(input("   ↪ Echo delay (ms, default 150): ") or "150")
         atten = int(input("   ↪ Echo atencuación (dB, default 6): ") or "6")
-        processed = eco_simple(processed, delay, atten)
+        effects["eco"] = {"delay_ms": delay, "attenuation_db": atten}
 
     if apply_rev:
-        processed = reverberacion_plana(processed)
-        print("   ↪ Se ha aplicado reverberación al master")
+        effects["reverberacion"] = {}
 
     if apply_lowpass:
         cutoff = int(input("   ↪ Frecuencia de corte (Hz, default 2000): ") or "2000")
-        processed = lowpass_filter(processed, cutoff)
+        effects["pasabajos"] = {"cutoff": cutoff}
 
     if apply_flang:
         depth = float(input("   ↪ Profundidad del flanger (s, default 0.002): ") or "0.002")
         rate = float(input("   ↪ Flanger rate (Hz, default 0.25): ") or "0.25")
-        processed = flanger(processed, depth, rate)
+        effects["flanger"] = {"depth": depth, "rate": rate}
 
     if apply_vibr:
         depth = float(input("   ↪ Profundidad del vibrato (s, default 0.002): ") or "0.002")
         rate = float(input("   ↪ Vibrato rate (Hz, default 5): ") or "5")
-        processed = vibrato(processed, depth, rate)
+        effects["vibrato"] = {"depth": depth, "rate": rate}
 
-    output_name = "master_mix_FX.wav"
-    output_path = os.path.join("output", output_name)
-    processed.export("output/" + output_name, format="wav")
-    print(f"Audio con efectos guardado en output/: {output_name}")
+    output_path = process_effects(wav_path, effects)
+    if apply_rev:
+        print("   ↪ Se ha aplicado reverberación al master")
+    print(f"Audio con efectos guardado en output/: {os.path.basename(output_path)}")
     return output_path
 # Only run this if called directly, not when imported
 if __name__ == "__main__":
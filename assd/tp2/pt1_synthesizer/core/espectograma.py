@@ -20,16 +20,18 @@ import librosa
 import librosa.display
 import matplotlib.pyplot as plt
 
-def plot_spectrogram(wav_path: str):
+def plot_spectrogram(wav_path: str, ask: bool = True):
     """
     Carga el WAV dado y guarda su espectrograma en escala log como imagen PNG.
+    Con ask=False no pregunta (renders por lotes). Devuelve la ruta del PNG.
     """
 
-    si_o_no = input("Desea ver el espectrograma " \
-                    "de la mezcla master? [S/N]\n").lower() == 's'
-    if si_o_no==False:
-        print("No se han generado el espectrograma.")
-        return
+    if ask:
+        si_o_no = input("Desea ver el espectrograma " \
+                        "de la mezcla master? [S/N]\n").lower() == 's'
+        if si_o_no==False:
+            print("No se han generado el espectrograma.")
+            return
 
     if not os.path.exists(wav_path):
         raise FileNotFoundError(f"❌ Archivo no encontrado: {wav_path}")
@@ -62,6 +64,7 @@ def plot_spectrogram(wav_path: str):
     plt.close()
 
     print(f"📸 Espectrograma guardado como: {output_file}")
+    return output_file
 
 if __name__ == "__main__":
     # Modo interactivo: pide la ruta y guarda el espectrograma
@@ -0,0 +1,104 @@
+"""
+/**
+ * @file render.py
+ * @brief Note-event render engine shared by the synthesizers.
+ *
+ * Each synthesizer provides two callbacks for the notes of a track:
+ *
+ * - `length(note)`: exact number of samples its voice produces for the note
+ *   (including any release tail; 0 skips the note).
+ * - `voice(note, out)`: renders the note and accumulates it in place into
+ *   `out`, the slice of the output buffer that starts at the note onset and
+ *   is `length(note)` samples long.
+ *
+ * The engine computes every extent up front, allocates the output once as a
+ * float32 buffer and never grows it:
+ *
+ *     buffer = render_track(inst.notes, voice, length, sr, midi_data.get_end_time())
+ *     normalize(buffer)
+ *
+ * `render_track_batched` is the same engine for voices that render many notes
+ * at once: notes of equal length are grouped and `voices(notes, n)` returns
+ * one row of n samples per note, which is added into the buffer at the note
+ * onset. Groups are split so a batch holds at most `max_elements` samples.
+ *
+ * @date 2025
+ */
+"""
+
+import numpy as np
+
+# Samples (rows x length) rendered at once by render_track_batched (8 bytes each)
+BATCH_ELEMENTS = 1 << 21
+
+
+def note_start(note, sample_rate):
+    """Onset sample of a note"""
+    return int(note.start * sample_rate)
+
+
+def _extents(notes, length, sample_rate, total_duration):
+    """(onsets, lengths, buffer length) of the notes"""
+    starts = [note_start(note, sample_rate) for note in notes]
+    lengths = [length(note) for note in notes]
+    total = max([int(total_duration * sample_rate)]
+                + [start + n for start, n in zip(starts, lengths) if n > 0])
+    return starts, lengths, total
+
+
+def render_track(notes, voice, length, sample_rate=44100, total_duration=0.0):
+    """
+    Renders `notes` through the `voice` callback into one preallocated float32
+    buffer, at least `total_duration` seconds long.
+    """
+    notes = list(notes)
+    starts, lengths, total = _extents(notes, length, sample_rate, total_duration)
+
+    buffer = np.zeros(total, dtype=np.float32)
+    for note, start, n in zip(notes, starts, lengths):
+        if n > 0:
+            voice(note, buffer[start:start + n])
+    return buffer
+
+
+def render_track_batched(notes, voices, length, sample_rate=44100, total_duration=0.0,
+                         max_elements=BATCH_ELEMENTS):
+    """
+    Like render_track, but `voices(notes, n)` renders a batch of notes that
+    are all `n` samples long and returns them as a (len(notes), n) array.
+    """
+    notes = list(notes)
+    starts, lengths, total = _extents(notes, length, sample_rate, total_duration)
+
+    groups = {}
+    for index, n in enumerate(lengths):
+        if n > 0:
+            groups.setdefault(n, []).append(index)
+
+    buffer = np.zeros(total, dtype=np.float32)
+    for n, indices in groups.items():
+        rows = max(max_elements // n, 1)
+        for first in range(0, len(indices), rows):
+            batch = indices[first:first + rows]
+            rendered = voices([notes[i] for i in batch], n)
+            # Scatter-add: one slice per row, so overlapping notes accumulate
+            for i, row in zip(batch, rendered):
+                buffer[starts[i]:starts[i] + n] += row
+    return buffer
+
+
+def accumulate(out, samples, gain=1.0):
+    """Adds `samples * gain` in place to `out`, over their common length"""
+    n = min(len(out), len(samples))
+    if gain == 1.0:
+        out[:n] += samples[:n]
+    else:
+        out[:n] += gain * samples[:n]
+
+
+def normalize(buffer):
+    """Scales the buffer in place to a peak of 1 (if it is not all zeros)"""
+    peak = np.max(np.abs(buffer)) if len(buffer) else 0.0
+    if peak > 0:
+        buffer /= peak
+    return buffer
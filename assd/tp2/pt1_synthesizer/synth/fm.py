@@ -3,10 +3,18 @@ import numpy as np
 import soundfile as sf
 import pretty_midi
 
+from core.cache import ByteLRU
+from core.render import normalize, render_track_batched
+from synth.wavetable import QUALITIES, phase_ramp, sine
+
 # teoría basada en: "The Synthesis of Complex Audio Spectra
 # by Means of Frequency Modulation", Chowning
 
-def A_adsr(t: np.ndarray, dur: float, A_peak: float = 1.0) -> np.ndarray:
+# Las envolventes reciben un array de tiempos t creciente (el de la nota) y se
+# calculan por tramos en una sola pasada: cada tramo se escribe en su parte de
+# `out` (un array nuevo si es None), sin recorrer el array completo por tramo.
+
+def A_adsr(t: np.ndarray, dur: float, A_peak: float = 1.0, out: np.ndarray = None) -> np.ndarray:
     '''
     Envolvente ADSR vectorizada para un array de tiempos t.
     '''
@@ -15,35 +23,50 @@ def A_adsr(t: np.ndarray, dur: float, A_peak: float = 1.0) -> np.ndarray:
     S = 0.5           # sustain level
     R = 0.16 * dur     # 16% release
 
-    env = np.zeros_like(t)
+    env = np.empty_like(t) if out is None else out
+    # Primer índice de cada tramo
+    a, d, r = np.searchsorted(t, [A, A + D, dur - R])
     # Attack
-    env = np.where(t < A, (t / A) * A_peak, env)
+    np.divide(t[:a], A, out=env[:a])
+    env[:a] *= A_peak
     # Decay
-    mask = (t >= A) & (t < A + D)
-    env = np.where(mask, A_peak - (A_peak - S) * (t - A) / D, env)
+    seg = env[a:d]
+    np.subtract(t[a:d], A, out=seg)
+    seg *= (A_peak - S)
+    seg /= D
+    np.subtract(A_peak, seg, out=seg)
     # Sustain
-    mask = (t >= A + D) & (t < dur - R)
-    env = np.where(mask, S, env)
+    env[d:r] = S
     # Release
-    mask = t >= (dur - R)
-    env = np.where(mask, S * (1 - (t - (dur - R)) / R), env)
+    seg = env[r:]
+    np.subtract(t[r:], dur - R, out=seg)
+    seg /= R
+    np.subtract(1, seg, out=seg)
+    seg *= S
     return env
 
-def A_woodwind(t: np.ndarray, dur: float, A_max: float = 1.0) -> np.ndarray:
-        # Punto en el que termina la fase de subida (20% de la duración)
+def _exp_ramp(t, dur, peak, out):
+    # Punto en el que termina la fase de subida (20% de la duración)
     ramp_end = 0.2 * dur
-    # Constante de tiempo elegida para que I(t) alcance I_max a t = ramp_end
-    tau = ramp_end / (np.log(A_max+1))
-
-    # Vectorizado: para t <= ramp_end usamos subida exponencial, luego A_max
-    I = np.where(
-        t <= ramp_end,
-        np.exp(t / tau) - 1,
-        A_max
-    )
-    return I
+    # Constante de tiempo elegida para que la rampa alcance peak a t = ramp_end
+    tau = ramp_end / (np.log(peak+1))
+
+    # Para t <= ramp_end usamos subida exponencial, luego peak
+    env = np.empty_like(t) if out is None else out
+    w = np.searchsorted(t, ramp_end, side='right')
+    np.divide(t[:w], tau, out=env[:w])
+    np.exp(env[:w], out=env[:w])
+    env[:w] -= 1
+    env[w:] = peak
+    return env
+
+def A_woodwind(t: np.ndarray, dur: float, A_max: float = 1.0, out: np.ndarray = None) -> np.ndarray:
+    '''
+    Envolvente woodwind: subida exponencial hasta A_max en el 20% inicial, luego constante.
+    '''
+    return _exp_ramp(t, dur, A_max, out)
 
-def I_woodwind(t: np.ndarray, dur: float, I_max: float) -> np.ndarray:
+def I_woodwind(t: np.ndarray, dur: float, I_max: float, out: np.ndarray = None) -> np.ndarray:
     """
     Índice de modulación para woodwind:
     - Crece exponencialmente desde 0 hasta casi I_max durante el 20% inicial de la nota.
@@ -53,47 +76,83 @@ def I_woodwind(t: np.ndarray, dur: float, I_max: float) -> np.ndarray:
       t      : array de tiempos (segundos) desde el inicio de la nota, length N
       dur    : duración total de la nota (segundos)
       I_max  : índice máximo de modulación
+      out    : array de long N donde escribir el resultado (opcional)
     
     Devuelve:
       I : array de long N con el índice I(t) en cada instante
     """
-    # Punto en el que termina la fase de subida (20% de la duración)
-    ramp_end = 0.2 * dur
-    # Constante de tiempo elegida para que I(t) alcance I_max a t = ramp_end
-    tau = ramp_end / (np.log(I_max+1))
-
-    # Vectorizado: para t <= ramp_end usamos subida exponencial, luego I_max
-    I = np.where(
-        t <= ramp_end,
-        np.exp(t / tau) - 1,
-        I_max
-    )
-    return I
+    return _exp_ramp(t, dur, I_max, out)
 
-def I_brass(t: np.ndarray, dur: float, I_max: float) -> np.ndarray:
+def I_brass(t: np.ndarray, dur: float, I_max: float, out: np.ndarray = None) -> np.ndarray:
     '''
     Índice de modulación lineal para brass.
     '''
-    I = I_max * (t / dur)
+    I = np.divide(t, dur, out=out)
+    I *= I_max
     return I
 
-def fm_synthesis(midi_data: pretty_midi.PrettyMIDI, track_id: int, sr: int = 44100):
+ENVELOPES = {
+    "adsr": A_adsr,
+    "woodwind_amp": A_woodwind,
+    "woodwind_index": I_woodwind,
+    "brass_index": I_brass,
+}
+
+# Muchas notas de una pista duran lo mismo: las envolventes se calculan una vez
+# por (forma, largo en muestras, sample rate, parámetro) y se comparten (read-only)
+ENVELOPE_CACHE_BYTES = 64 * 1024 * 1024
+envelope_cache = ByteLRU(ENVELOPE_CACHE_BYTES)
+_time_bases = {}
+
+def time_base(N: int, sr: int) -> np.ndarray:
+    '''
+    Tiempos n / sr de las primeras N muestras. Es una vista (read-only) de un
+    único array por sample rate, que crece cuando una nota es más larga.
+    '''
+    t = _time_bases.get(sr)
+    if t is None or len(t) < N:
+        t = np.arange(max(N, 2 * len(t) if t is not None else 0)) / sr
+        t.setflags(write=False)
+        _time_bases[sr] = t
+    return t[:N]
+
+def envelope(shape: str, N: int, sr: int, param: float) -> np.ndarray:
+    '''
+    Envolvente `shape` (ver ENVELOPES) de una nota de N muestras, cacheada.
+    '''
+    key = (shape, N, sr, param)
+    env = envelope_cache.get(key)
+    if env is None:
+        env = envelope_cache.put(key, ENVELOPES[shape](time_base(N, sr), N / sr, param, out=np.empty(N)))
+    return env
+
+FM_TIMBRES = ["brass", "woodwind"]
+
+def fm_synthesis(midi_data: pretty_midi.PrettyMIDI, track_id: int, sr: int = 44100, quality: str = "hq",
+                 timbre: str = None, output_path: str = None):
     """
     Sintetiza la pista `track_id` de midi_data usando FM synthesis.
     Pregunta al usuario por timbre “brass” o “woodwind”, luego:
       • brass: índice de modulación I(t) crece lineal en el ataque
       • woodwind: I(t) decae exponencial
-    Genera un buffer por nota y los mezcla, normaliza, y guarda en:
-        output/track{track_id}_fm.wav
+    (si `timbre` es None; si no, usa el dado: "brass" o "woodwind").
+    Genera un buffer por nota y los mezcla, normaliza, y guarda en
+    `output_path` (por defecto output/Pista-{track_id}-fm.wav).
     Devuelve el .wav en "mix_buf"
+    `quality`: "hq" evalúa np.sin en float64; "fast" usa los osciladores de
+    tabla de synth.wavetable (float32, error < 2e-6 por oscilador).
     """
+    if quality not in QUALITIES:
+        raise ValueError(f"Unknown quality '{quality}' (expected one of {QUALITIES})")
+    if timbre is not None and timbre not in FM_TIMBRES:
+        raise ValueError(f"Unknown timbre '{timbre}' (expected one of {FM_TIMBRES})")
     # 1) Selección de timbre
-    while True:
+    while timbre is None:
         choice = input("Síntesis FM: Metal (brass) (B) o Viento-Madera"
                         " (woodwind) (W)? ").strip().lower()
         if choice in ('b','w'):
-            break
-    is_brass = (choice == 'b')
+            timbre = "brass" if choice == 'b' else "woodwind"
+    is_brass = (timbre == "brass")
     print("→ Sintetizando como", "BRASS" if is_brass else "WOODWIND")
 
     # Parámetros fijos
@@ -102,51 +161,52 @@ def fm_synthesis(midi_data: pretty_midi.PrettyMIDI, track_id: int, sr: int = 441
     # para woodwind vamos a decaer con tau = 50% de la nota
     # para brass el índice se rampa lineal en [0..I_max]
 
-    # 2) Prepara el buffer de mezcla total
-    inst      = midi_data.instruments[track_id]
-    total_dur = midi_data.get_end_time()
-    N_total   = int(total_dur * sr)
-    mix_buf   = np.zeros(N_total, dtype=float)
-
-    # 3) Recorre cada nota del track
-    for note in inst.notes:
-        start_s = note.start
-        dur     = note.end - note.start
-        if dur <= 0:
-            continue
-        N = int(dur * sr)
-        t = np.linspace(0, dur, N, endpoint=False)
-
-        # 3.1) frecuencia carrier & modulator
-        fc = 440.0 * 2**((note.pitch - 69)/12)
+    # 2) Largo exacto de cada nota (las de duración nula no suenan)
+    inst = midi_data.instruments[track_id]
+
+    def length(note):
+        dur = note.end - note.start
+        return int(dur * sr) if dur > 0 else 0
+
+    # 3) Las notas de igual largo se sintetizan juntas, una fila por nota,
+    #    y el motor suma cada fila en su lugar del buffer de mezcla total
+    def voices(notes, N):
+        # Base de tiempos n / sr compartida; las notas duran N / sr segundos
+        t = time_base(N, sr)
+
+        # 3.1) frecuencias carrier & modulator (columna: una por altura).
+        #      Notas de igual largo y altura dan la misma fila: se calcula una vez
+        pitches, rows = np.unique([note.pitch for note in notes], return_inverse=True)
+        fc = 440.0 * 2**((pitches - 69)/12)
+        fc = fc[:, None]
         fm = fc / ratio
 
-        # Envolventes vectorizadas
-        I = I_brass(t, dur, I_max) if is_brass else I_woodwind(t, dur, I_max)
-        A = A_adsr(t, dur, A_peak=1.0) if is_brass else A_woodwind(t, dur,
-                                                                    A_max=1.0)
+        # Envolventes (cacheadas por largo de nota, iguales para todo el grupo)
+        I = envelope("brass_index" if is_brass else "woodwind_index", N, sr, I_max)
+        A = envelope("adsr" if is_brass else "woodwind_amp", N, sr, 1.0)
 
-        # 3.3) cálculo de la señal FM
+        # 3.3) cálculo de la señal FM, (alturas x N), y una fila por nota
+        if quality == "fast":
+            # Osciladores de tabla: -pi/2 es -1/4 de ciclo; el índice modula la fase
+            modulator = sine(phase_ramp(fm[:, 0], N, sr, phase=-0.25))
+            carrier   = sine(phase_ramp(fc[:, 0], N, sr, phase=-0.25), pm=I * modulator)
+            return (A * carrier)[rows]
         modulator = np.sin(2 * np.pi * fm * t - np.pi/2)
         phase     = 2 * np.pi * fc * t + I * modulator - np.pi/2
-        y_note    = A * np.sin(phase)
+        return (A * np.sin(phase))[rows]
 
-        # 3.4) agregar al buffer maestro
-        i0 = int(start_s * sr)
-        i1 = i0 + N
-        if i1 > mix_buf.shape[0]:
-            mix_buf = np.pad(mix_buf, (0, i1 - mix_buf.shape[0]))
-        mix_buf[i0:i1] += y_note
+    mix_buf = render_track_batched(inst.notes, voices, length, sr, midi_data.get_end_time())
 
     # 4) Normaliza mezcla final
-    peak = np.max(np.abs(mix_buf))
-    if peak > 0:
-        mix_buf /= peak
+    normalize(mix_buf)
 
-    # 5) Escribe WAV en output/
-    os.makedirs("output", exist_ok=True)
-    out_path = os.path.join("output", f"Pista-{track_id}-fm.wav")
+    # 5) Escribe WAV (por defecto en output/)
+    out_path = output_path or os.path.join("output", f"Pista-{track_id}-fm.wav")
+    os.makedirs(os.path.dirname(out_path) or ".", exist_ok=True)
     sf.write(out_path, mix_buf, sr)
-    print(f"→ FM generado en output/: {out_path}")
+    print(f"→ FM generado: {out_path}")
 
     return mix_buf
+
+from synth import register
+register("fm", fm_synthesis)
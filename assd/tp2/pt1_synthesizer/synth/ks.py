@@ -5,55 +5,63 @@ import librosa
 import pretty_midi
 from synth.punto4 import karplus_strong_percussion
 from synth.punto4 import karplus_strong
+from core.render import normalize, render_track
 
-def ks_synthesis(midi_data: pretty_midi.PrettyMIDI, track_idx: int):
+# b (probabilidad de signo +) de cada modelo
+KS_MODELS = {"arpa": 0, "guitarra": 1, "percusion": 0.5}
+KS_MODEL_KEYS = {"a": "arpa", "g": "guitarra", "p": "percusion"}
+
+def ks_synthesis(midi_data: pretty_midi.PrettyMIDI, track_idx: int, ruido: bool = None, b: float = None,
+                 seed=None, output_path: str = None):
     """
-    Interactivo: sintetiza la pista `track_idx` usando Karplus-Strong
-    y guarda el WAV en output/Pista-<idx>-KS.wav.
+    Sintetiza la pista `track_idx` usando Karplus-Strong y guarda el WAV en
+    `output_path` (por defecto output/Pista-<idx>-KS.wav).
+    Pregunta por los parámetros que no se pasen:
+      ruido : True para ruido uniforme, False para gaussiano
+      b     : probabilidad de signo + (ver KS_MODELS)
+      seed  : semilla del ruido y los signos (None: aleatoria)
     """
     # Selección de parámetros
-    ruido = input("Ruido uniforme? [S/N]:\n").strip().lower() != 'n'
+    if ruido is None:
+        ruido = input("Ruido uniforme? [S/N]:\n").strip().lower() != 'n'
 
-    modelo_mod = input("Percusión [P], Guitarra [G] o" 
-                        " Arpa [A]?\n").strip().lower()
+    if b is None:
+        modelo_mod = input("Percusión [P], Guitarra [G] o" 
+                            " Arpa [A]?\n").strip().lower()
 
-    if modelo_mod == 'a':
-        b = 0
-    elif modelo_mod == 'g':
-        b = 1
-    elif modelo_mod == 'p':
-        b = 0.5
-    else:
-        b = float(input("Easter egg!!! Elegí tu b:\nb = "))
+        if modelo_mod in KS_MODEL_KEYS:
+            b = KS_MODELS[KS_MODEL_KEYS[modelo_mod]]
+        else:
+            b = float(input("Easter egg!!! Elegí tu b:\nb = "))
 
     inst = midi_data.instruments[track_idx]
     sr = 44100
-    dur = midi_data.get_end_time()
-    buf = np.zeros(int(dur * sr))
+    # Un solo generador para el ruido y los signos de toda la pista
+    rng = np.random.default_rng(seed)
+
+    # Largo exacto de cada nota (el que devuelve karplus_strong_percussion)
+    def length(note):
+        return max(int((note.end - note.start) * sr), 0)
 
     # Por cada nota, calculo frecuencia y pluck
-    for note in inst.notes:
+    def voice(note, out):
         freq = 440.0 * 2 ** ((note.pitch - 69) / 12)  
-        y = karplus_strong_percussion(freq=freq,
-                                        duration=note.end - note.start,
-                                        b=b,
-                                        fs=sr,
-                                        R=0.99,
-                                        uniform=ruido)
-        start = int(note.start * sr)
-        end   = start + len(y)
-        if end > buf.shape[0]:
-            buf = np.pad(buf, (0, end - buf.shape[0]))
-        buf[start:end] += y
+        out += karplus_strong_percussion(freq=freq,
+                                         duration=note.end - note.start,
+                                         b=b,
+                                         fs=sr,
+                                         R=0.99,
+                                         uniform=ruido,
+                                         rng=rng)
+
+    buf = render_track(inst.notes, voice, length, sr, midi_data.get_end_time())
 
     # Normalizo
-    peak = np.max(np.abs(buf)) or 1.0
-    buf /= peak
+    normalize(buf)
 
-    # Guardo en output/
-    os.makedirs("output", exist_ok=True)
-    nombre = f"Pista-{track_idx}-KS.wav"
-    path   = os.path.join("output", nombre)
+    # Guardo (por defecto en output/)
+    path = output_path or os.path.join("output", f"Pista-{track_idx}-KS.wav")
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
     sf.write(path, buf, sr)
     print(f"Archivo KS generado: {path}")
 
@@ -62,3 +70,4 @@ def ks_synthesis(midi_data: pretty_midi.PrettyMIDI, track_idx: int):
 # Registrar también si quisieras dispatch vía get_synth
 from synth import register
 register("ks_int", ks_synthesis)
+register("ks", ks_synthesis)
@@ -29,6 +29,39 @@ import os
 
 # Punto 1: Modelo tiempo invariante y variante (Karplus Strong)
 ###########################################################################
+def _ks_seed(noise, N):
+    """First min(L, N) samples: the noise, pre-filtered with a 2-point average"""
+    y = np.zeros(N + 1)  # y[0] stands for y[-1] = 0 of the recurrence
+    M = min(len(noise), N)
+    y[1:M + 1] = noise[:M]
+    y[2:M + 1] = 0.5*(noise[1:M] + noise[:M - 1])
+    return y
+
+def _ks_blocks(y, L, gain):
+    """
+    y[n] = gain * (y[n-L] + y[n-L-1]) for n >= L, on the padded buffer of _ks_seed.
+    `gain` is a constant or one value per output sample from n = L on (random
+    signs of the percussion model). Every output depends only on samples at
+    least L back, so L samples are computed per step with the same operations
+    as a per-sample loop.
+    """
+    N = len(y) - 1
+    for k in range(L, N, L):
+        end = min(k + L, N)
+        g = gain if np.ndim(gain) == 0 else gain[k - L:end - L]
+        y[k + 1:end + 1] = g * (y[k - L + 1:end - L + 1] + y[k - L:end - L])
+    return y[1:]
+
+def _percussion_gains(N, L, b, R, rng):
+    """Gain of the percussion recurrence: +R/2 with probability b, else -R/2 (constant when b is 0 or 1)"""
+    # rand() < b is always true for b >= 1 and never for b <= 0
+    if b >= 1 or b <= 0:
+        sign = 1 if b >= 1 else -1
+        return sign * R * 0.5
+    # Whole sign sequence drawn at once (Bernoulli(b) for +1)
+    signs = np.where(rng.random(max(N - L, 0)) < b, 1.0, -1.0)
+    return signs * R * 0.5
+
 def karplus_strong(freq, duration, fs=44100, R=0.99, uniform=True):
     L = int(fs/freq - 0.5)
     N = int(duration * fs)
@@ -36,45 +69,24 @@ def karplus_strong(freq, duration, fs=44100, R=0.99, uniform=True):
         return np.zeros(0)
     # generate initial noise of length L
     noise = (np.random.uniform if uniform else np.random.normal)(size=L)
-    y = np.zeros(N)
-
-    # only seed the first min(L, N) samples
-    M = min(L, N)
-    y[:M] = noise[:M]
-    # optionally pre-filter that seed
-    for n in range(1, M):
-        y[n] = 0.5*(noise[n] + noise[n-1])
-
-    # only run the main loop when L < N
-    if L < N:
-        for n in range(L, N):
-            y[n] = R * 0.5 * (y[n - L] + y[n - L - 1])
-
-    return y
-
-def karplus_strong_percussion(freq, duration, b, fs=44100, R=0.99, uniform=True):
+    # seed the first min(L, N) samples, then run the main recurrence L samples at a time
+    return _ks_blocks(_ks_seed(noise, N), L, R * 0.5)
+
+def karplus_strong_percussion(freq, duration, b, fs=44100, R=0.99, uniform=True, rng=None):
+    """
+    Percussion KS: the sign of each new sample is + with probability b.
+    `rng` (a numpy Generator or a seed) draws the noise and the signs;
+    None uses a fresh unseeded Generator.
+    """
+    rng = np.random.default_rng(rng)
     L = int(fs/freq - 0.5)
     N = int(duration * fs)
     if N <= 0:
         return np.zeros(0)
     # generate initial noise of length L
-    noise = (np.random.uniform if uniform else np.random.normal)(size=L)
-    y = np.zeros(N)
-
-    # only seed the first min(L, N) samples
-    M = min(L, N)
-    y[:M] = noise[:M]
-    # optionally pre-filter that seed
-    for n in range(1, M):
-        y[n] = 0.5*(noise[n] + noise[n-1])
-
-    # only run the main loop when L < N
-    if L < N:
-        for n in range(L, N):
-            sign = 1 if np.random.rand() < b else -1
-            y[n] = sign * R * 0.5 * (y[n - L] + y[n - L - 1])
-            
-    return y
+    noise = rng.uniform(size=L) if uniform else rng.normal(size=L)
+    # seed the first min(L, N) samples, then run the main recurrence L samples at a time
+    return _ks_blocks(_ks_seed(noise, N), L, _percussion_gains(N, L, b, R, rng))
 ##########################################################################################
 
 # Funciones de Analisis y graficación
@@ -113,20 +125,17 @@ def noise_response_original(b, a, fs, N=500000):
     f_g, P_g = signal.welch(y_g, fs=fs, nperseg=2048)
     return f_u, P_u, f_g, P_g
 
-def noise_response_percussion(freq, fs, b_prob, N=500000):
-    # Treat noise as initial buffer and iterate
+def noise_response_percussion(freq, fs, b_prob, N=500000, R=1.0, rng=None):
+    # Treat noise as initial buffer and iterate the percussion recurrence
+    # (same kernel as karplus_strong_percussion, without pre-filtering the seed)
+    rng = np.random.default_rng(rng)
     L = int(fs / freq - 0.5)
-    uni = np.random.uniform(-1, 1, size=N)
-    gauss = np.random.normal(0, 1, size=N)
+    uni = rng.uniform(-1, 1, size=N)
+    gauss = rng.normal(0, 1, size=N)
     def run_perc(input_noise):
-        buf = input_noise[:L].copy()
-        out = np.zeros(N)
-        for n in range(N):
-            out[n] = buf[n % L]
-            sign = 1 if np.random.rand() < b_prob else -1
-            avg = 0.5 * (buf[n % L] + buf[(n - 1) % L])
-            buf[n % L] = sign * avg
-        return out
+        y = np.zeros(N + 1)
+        y[1:L + 1] = input_noise[:L]
+        return _ks_blocks(y, L, _percussion_gains(N, L, b_prob, R, rng))
     y_u = run_perc(uni)
     y_g = run_perc(gauss)
     f_u, P_u = signal.welch(y_u, fs=fs, nperseg=2048)
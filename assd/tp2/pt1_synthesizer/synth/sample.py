@@ -7,6 +7,9 @@ import mido
 import pretty_midi
 import sounddevice as sd
 import os
+from collections import OrderedDict
+from core.cache import ByteLRU, DiskCache
+from core.render import accumulate, normalize, render_track
 
 '''
 /**
@@ -50,11 +53,11 @@ def find_closest_sample(midi_note, sample_dict):
  ## 
 # @param in filename: string that contains the sound of the closest note.
 #           instrumento: string that contains the instrument whose sample the program is using.
+#           sample_rate: sampling rate the sample is resampled to.
 #  @return sample of the closest note in the corresponding instrument.
-def load_sample(filename, instrumento):
+def load_sample(filename, instrumento, sample_rate=44100):
     # filename: Name of the WAV file (e.g., 'C4.wav')
     # Build the full path to the file inside the corresponding instrument subdirectory
-    sample_rate = 44100
     # __file__ es la ruta a este módulo: synth/sample.py
     base_dir = os.path.join(os.path.dirname(__file__), instrumento)
     filepath = os.path.join(base_dir, filename)
@@ -65,30 +68,237 @@ def load_sample(filename, instrumento):
         sample = librosa.resample(sample, orig_sr=sr, target_sr=sample_rate)
     return sample
 
+#File list (8 samples per instrument)
+WAV_FILES = ['F2.wav','A#2.wav', 'D#3.wav','G#3.wav', 'C#4.wav', 'F#4.wav', 'B4.wav', 'E5.wav']
+
+#
+#  @brief Map of the available samples.
+#  @return dict whose key is the MIDI id and value is the file name.
+def sample_files():
+    #Key: MIDI id, Value: file name.
+    files = {}
+    for file in WAV_FILES:
+        note = file.replace('.wav', '')
+        files[note_name_to_midi(note)] = file
+    return files
+
+#
+#  @brief In-memory bank of instrument samples.
+#         Each (instrument, note, sample rate) is read from disk and resampled only once,
+#         stored as a read-only float32 array and reused by every note that needs it,
+#         for the whole session or until it is evicted.
+## 
+# @param in max_entries: maximum number of samples kept (None: no limit). When full,
+#                        the least recently used sample is evicted.
+class SampleBank:
+    def __init__(self, max_entries=None):
+        self.max_entries = max_entries
+        self.file_reads = 0  # Number of WAV files read from disk
+        self._samples = OrderedDict()
+
+    #
+    #  @brief Returns the sample of a note (MIDI id of one of the WAV_FILES) at sample_rate.
+    def get(self, instrumento, note, sample_rate=44100):
+        key = (instrumento, note, sample_rate)
+        sample = self._samples.get(key)
+        if sample is not None:
+            self._samples.move_to_end(key)
+            return sample
+
+        filename = sample_files()[note]
+        sample = load_sample(filename, instrumento, sample_rate).astype(np.float32)
+        sample.setflags(write=False)  # Shared by every note, must not be modified
+        self.file_reads += 1
+
+        self._samples[key] = sample
+        if self.max_entries is not None and len(self._samples) > self.max_entries:
+            self._samples.popitem(last=False)
+        return sample
+
+    #
+    #  @brief Loads the whole instrument in the bank (one read per WAV file).
+    def preload(self, instrumento, sample_rate=44100):
+        for note in sample_files():
+            self.get(instrumento, note, sample_rate)
+
+    #
+    #  @brief Evicts the samples of one instrument (or every sample if instrumento is None).
+    def evict(self, instrumento=None):
+        for key in [key for key in self._samples if instrumento is None or key[0] == instrumento]:
+            del self._samples[key]
+
+    def __len__(self):
+        return len(self._samples)
+
+    def __contains__(self, key):
+        return key in self._samples
+
+#Bank shared by every synthesis of the session
+sample_bank = SampleBank()
+
+#Pitch-shifted samples: in memory (LRU, byte budget) and on disk between runs
+PITCH_CACHE_BYTES = 512 * 2**20
+PITCH_CACHE_DIR = os.path.join(os.path.dirname(os.path.dirname(__file__)), ".cache", "pitch_shift")
+pitch_cache = ByteLRU(PITCH_CACHE_BYTES)
+pitch_disk_cache = DiskCache(PITCH_CACHE_DIR)
+
+#
+#  @brief Returns the reference sample shifted by n_steps semitones.
+#         Only the first request of each (instrument, ref_pitch, n_steps, sr) runs the
+#         phase vocoder; later ones come from memory or from the disk cache. The disk
+#         entries are tied to the WAV file (modification time and size) and the librosa version.
+## 
+# @param in sample: reference sample (from the SampleBank).
+#           instrumento, ref_pitch: instrument and MIDI id of the reference sample.
+#           n_steps: pitch shift in semitones.
+#           use_cache: False always runs the phase vocoder (benchmarks).
+#  @return read-only shifted sample.
+def shifted_sample(sample, instrumento, ref_pitch, n_steps, sample_rate=44100, use_cache=True):
+    if not use_cache:
+        return librosa.effects.pitch_shift(sample, sr=sample_rate, n_steps=n_steps)
+    key = (instrumento, ref_pitch, n_steps, sample_rate)
+    shifted = pitch_cache.get(key)
+    if shifted is not None:
+        return shifted
+
+    source = os.stat(os.path.join(os.path.dirname(__file__), instrumento, sample_files()[ref_pitch]))
+    disk_key = key + (source.st_mtime_ns, source.st_size, librosa.__version__)
+    shifted = pitch_disk_cache.get(disk_key)
+    if shifted is None:
+        shifted = librosa.effects.pitch_shift(sample, sr=sample_rate, n_steps=n_steps)
+        pitch_disk_cache.put(disk_key, shifted)
+    return pitch_cache.put(key, shifted)
+
+#Render modes: "hq" fits every note with the phase vocoder (pitch_shift + time_stretch),
+#"fast" plays the sample back at another rate (pitch and speed change together) and
+#fits the duration by truncation with a release fade, or with loop points
+RENDER_MODES = ["hq", "fast"]
+#Instrument of each key of the selection menu
+INSTRUMENT_KEYS = {"G": "guitarra", "E": "guitarra-electrica", "S": "strings"}
+#Mode of each instrument when the render does not choose one
+INSTRUMENT_RENDER_MODES = {"guitarra": "hq", "guitarra-electrica": "hq", "strings": "hq"}
+#How the fast mode sustains notes longer than the sample: "release" (the sample ends) or "loop"
+FAST_SUSTAIN = {"guitarra": "release", "guitarra-electrica": "release", "strings": "loop"}
+RELEASE_TIME = 0.03          # Fade at the end of fast notes (seconds)
+LOOP_REGION = (0.4, 0.9)     # Loop start and end as fractions of the sample
+
+#
+#  @brief Loop points of a sample: rising zero crossings near the LOOP_REGION fractions,
+#         so the jump from the loop end back to the loop start does not click.
+#  @return (loop_start, loop_end) sample indices.
+def loop_points(sample):
+    def rising_zero_crossing(target):
+        window = sample[max(target - 1024, 0):target + 1024]
+        crossings = np.flatnonzero((window[:-1] < 0) & (window[1:] >= 0))
+        if len(crossings) == 0:
+            return target
+        return max(target - 1024, 0) + crossings[np.argmin(np.abs(crossings - min(target, 1024)))] + 1
+    start = rising_zero_crossing(int(LOOP_REGION[0] * len(sample)))
+    end = rising_zero_crossing(int(LOOP_REGION[1] * len(sample)))
+    return (start, end) if end > start + 1 else (0, len(sample))
+
+#
+#  @brief Exact length of a fast-mode note (see play_note_fast).
+#  @return number of samples.
+def fast_note_length(sample_length, n_steps, n_samples, sustain="release"):
+    if sustain == "loop" or n_samples <= 0:
+        return max(n_samples, 0)
+    # A note longer than the sample ends with the sample
+    return min(n_samples, int((sample_length - 1) / 2.0 ** (n_steps / 12)) + 1)
+
+#
+#  @brief Fast note rendering: the sample is read at 2^(n_steps/12) times its rate
+#         (linear interpolation), so there is no phase vocoder.
+## 
+# @param in sample: reference sample.
+#           n_steps: pitch shift in semitones.
+#           n_samples: note duration in samples.
+#           sustain: "release" or "loop" (see FAST_SUSTAIN).
+#  @return rendered note (fast_note_length samples).
+def play_note_fast(sample, n_steps, n_samples, sustain="release", sample_rate=44100):
+    length = fast_note_length(len(sample), n_steps, n_samples, sustain)
+    positions = np.arange(length) * 2.0 ** (n_steps / 12)
+    if sustain == "loop":
+        loop_start, loop_end = loop_points(sample)
+        looped = positions >= loop_start
+        positions[looped] = loop_start + (positions[looped] - loop_start) % (loop_end - loop_start)
+    note = np.interp(positions, np.arange(len(sample)), sample)
+
+    # Release fade, so truncated notes do not click
+    fade = min(int(RELEASE_TIME * sample_rate), len(note))
+    if fade > 0:
+        note[-fade:] *= np.linspace(1.0, 0.0, fade)
+    return note
+
+#
+#  @brief Renders the notes of a track with an instrument (without normalizing),
+#         through the shared render engine (core.render).
+## 
+# @param in notes: pretty_midi notes.
+#           instrumento: instrument folder name.
+#           render_mode: "hq" or "fast" (None: INSTRUMENT_RENDER_MODES of the instrument).
+#           bank: SampleBank the samples are taken from.
+#           use_pitch_cache: reuse the cached pitch shifts of the hq mode.
+#           total_duration: minimum length of the output (seconds).
+#  @return float32 audio buffer.
+def render_notes(notes, instrumento, sample_rate=44100, render_mode=None, bank=None, use_pitch_cache=True,
+                 total_duration=0.0):
+    bank = sample_bank if bank is None else bank
+    render_mode = render_mode or INSTRUMENT_RENDER_MODES.get(instrumento, "hq")
+    if render_mode not in RENDER_MODES:
+        raise ValueError(f"Modo de render desconocido: {render_mode} (opciones: {RENDER_MODES})")
+    available_samples = sample_files()
+    sustain = FAST_SUSTAIN.get(instrumento, "release")
+
+    def reference(note):
+        #Find the closest note and get its sample (read from disk only the first time)
+        ref_pitch = int(find_closest_sample(note.pitch, available_samples))
+        return ref_pitch, bank.get(instrumento, ref_pitch, sample_rate)
+
+    def stretch_rate(sample, note):
+        note_duration = note.end - note.start  # Note duration in seconds
+        sample_duration = len(sample) / sample_rate  # Sample duration in seconds
+        return sample_duration / note_duration if note_duration > 0 else 1  # Stretching factor
+
+    def length(note):
+        ref_pitch, sample = reference(note)
+        if render_mode == "fast":
+            return fast_note_length(len(sample), note.pitch - ref_pitch,
+                                    int(round((note.end - note.start) * sample_rate)), sustain)
+        # time_stretch gives round(len / rate) samples (pitch_shift keeps the length)
+        return int(round(len(sample) / stretch_rate(sample, note)))
+
+    def voice(note, out):
+        ref_pitch, sample = reference(note)
+        pitch_shift_semitones = note.pitch - ref_pitch  # Calculate pitch shift in semitones
+        if render_mode == "fast":
+            rendered = play_note_fast(sample, pitch_shift_semitones, int(round((note.end - note.start) * sample_rate)),
+                                      sustain, sample_rate)
+        else:
+            shifted = shifted_sample(sample, instrumento, ref_pitch, pitch_shift_semitones, sample_rate,
+                                     use_pitch_cache)  # Apply pitch shift to the original sample (cached)
+            rendered = librosa.effects.time_stretch(shifted, rate=stretch_rate(sample, note))  # Adjust duration
+        accumulate(out, rendered, note.velocity / 127.0)  # Mix the note
+
+    return render_track(notes, voice, length, sample_rate, total_duration)
+
 #
 #  @brief Synthesizes a midi track with a desired instrument sound.
 #          It asks for several user inputs so as to decide which
 #            track has to be synthesized and with which instrument.
 ## 
 # @param in midi_data: map containing the midi information
+#           render_mode: "hq" or "fast" (None: the default mode of the instrument).
+#           instrumento: "guitarra", "guitarra-electrica" or "strings" (None: asks for it).
+#           output_path: .wav file to write (None: output/Pista-<idx>(<instrumento>).wav).
 #   @output: .wav file of the track with the sound of the desired instrument.
 #  @return the .wav file with the synthesized track
-def sample_synthesis(midi_data, track_idx_to_synthesize):
-    #File list
-    wav_files = ['F2.wav','A#2.wav', 'D#3.wav','G#3.wav', 'C#4.wav', 'F#4.wav', 'B4.wav', 'E5.wav']
-
-    #Key: MIDI id, Value: file name.
-    sample_files = {}
-    for file in wav_files:
-        note = file.replace('.wav', '')
-        midi_num = note_name_to_midi(note)
-        sample_files[midi_num] = file
-
-
+def sample_synthesis(midi_data, track_idx_to_synthesize, bank=None, render_mode=None, instrumento=None,
+                     output_path=None):
     instrument = midi_data.instruments[track_idx_to_synthesize]
 
     #Choose instrument
-    while True:
+    while instrumento is None:
         id_instrumento = input(
             "\nSeleccione el instrumento que desea sintetizar:\n"
             "G - Guitarra\n"
@@ -97,59 +307,65 @@ def sample_synthesis(midi_data, track_idx_to_synthesize):
             "Ingrese G, E o S: "
         ).strip().upper()
 
-        if id_instrumento in ['G', 'S', 'E']:
-            break
+        if id_instrumento in INSTRUMENT_KEYS:
+            instrumento = INSTRUMENT_KEYS[id_instrumento]
         else:
             print("Error: debe ingresar G; E o S.")
 
-    if id_instrumento == 'G':
-        instrumento = "guitarra"
-    elif id_instrumento == 'E':
-        instrumento = "guitarra-electrica"
-    else:
-        instrumento = "strings"
+    if instrumento not in INSTRUMENT_RENDER_MODES:
+        raise ValueError(f"Instrumento desconocido: '{instrumento}' "
+                         f"(opciones: {', '.join(INSTRUMENT_RENDER_MODES)})")
 
     print(f"Usted eligió sintetizar la pista {track_idx_to_synthesize} como {instrumento}.")
 
     # Audio configuration
     sample_rate = 44100  # Sampling rate: 44,100 samples per second for the output audio
-    total_duration = midi_data.get_end_time()  # Total duration of the MIDI in seconds
-    output_audio = np.zeros(int(total_duration * sample_rate))  # Audio buffer (array of zeros)
-
-    # Process the notes
-    for note in instrument.notes:
-        #Find the closest note
-        ref_pitch = find_closest_sample(note.pitch, sample_files)
-        #Load the sample for the corresponding note
-        sample = load_sample(sample_files[ref_pitch], instrumento)
-
-        pitch_shift_semitones = note.pitch - ref_pitch  # Calculate pitch shift in semitones
-        shifted_sample = librosa.effects.pitch_shift(sample, sr=sample_rate, n_steps=pitch_shift_semitones)  # Apply pitch shift to the original sample
-        note_duration = note.end - note.start  # Note duration in seconds
-        sample_duration = len(sample) / sample_rate  # Sample duration in seconds
-        rate = sample_duration / note_duration if note_duration > 0 else 1  # Stretching factor
-        stretched_sample = librosa.effects.time_stretch(shifted_sample, rate=rate)  # Adjust duration
-        start_sample = int(note.start * sample_rate)  # Convert start time to sample index
-        end_sample = start_sample + len(stretched_sample)  # End index
-        if end_sample > len(output_audio):  # Expand buffer if necessary
-            output_audio = np.pad(output_audio, (0, end_sample - len(output_audio)))
-        output_audio[start_sample:end_sample] += stretched_sample * (note.velocity / 127.0)  # Mix the note
+    output_audio = render_notes(instrument.notes, instrumento, sample_rate, render_mode, bank,
+                                total_duration=midi_data.get_end_time())
 
     # Normalize and save
-    if np.max(np.abs(output_audio)) > 0:
-        output_audio = output_audio / np.max(np.abs(output_audio))  # Normaliza para evitar distorsión
+    normalize(output_audio)  # Normaliza para evitar distorsión
     
-    # ensure the output folder exists
-    os.makedirs("output", exist_ok=True)
-
     # build path inside output/
-    nombre_archivo = os.path.join(
+    nombre_archivo = output_path or os.path.join(
         "output",
         f'Pista-{track_idx_to_synthesize}({instrumento}).wav'
     )
 
-    # Saves file into output/
+    # ensure the output folder exists
+    os.makedirs(os.path.dirname(nombre_archivo) or ".", exist_ok=True)
+
+    # Saves file
     sf.write(nombre_archivo, output_audio, sample_rate)
 
-    print(f"Archivo WAV generado en output/: 'Pista-{track_idx_to_synthesize}({instrumento}).wav'")
+    print(f"Archivo WAV generado: '{nombre_archivo}'")
     return output_audio
+
+from synth import register
+register("sample", sample_synthesis)
+
+
+#
+#  @brief Benchmark of the render modes: realtime factor (seconds of audio per second
+#         of rendering) of a MIDI track with each mode. The samples are loaded before
+#         timing and the hq pitch shifts are not cached, so both modes are timed cold.
+#         Usage (from pt1_synthesizer/): python -m synth.sample midis/love-me-do.mid --track 3
+if __name__ == "__main__":
+    import argparse
+    import time
+
+    parser = argparse.ArgumentParser(description="Realtime factor of the sample synthesis render modes")
+    parser.add_argument("midi")
+    parser.add_argument("--track", type=int, default=0)
+    parser.add_argument("--instrument", default="guitarra", choices=sorted(INSTRUMENT_RENDER_MODES))
+    parser.add_argument("--notes", type=int, default=None, help="only the first N notes")
+    args = parser.parse_args()
+
+    notes = pretty_midi.PrettyMIDI(args.midi).instruments[args.track].notes[:args.notes]
+    sample_bank.preload(args.instrument)
+    for mode in RENDER_MODES:
+        started = time.perf_counter()
+        audio = render_notes(notes, args.instrument, render_mode=mode, use_pitch_cache=False)
+        elapsed = time.perf_counter() - started
+        print(f"{mode:>4}: {len(notes)} notas, {len(audio) / 44100:.1f} s de audio en {elapsed:.2f} s "
+              f"-> {len(audio) / 44100 / elapsed:.1f}x tiempo real")
@@ -0,0 +1,155 @@
+"""
+/**
+ * @file wavetable.py
+ * @brief Table-lookup sine oscillators with float32 phase accumulators.
+ *
+ * The phase is kept in cycles (turns) as float32 values in [0, 1). The sine
+ * is read from a precomputed table of TABLE_SIZE points with linear
+ * interpolation, instead of evaluating np.sin over float64 arrays:
+ *
+ *     osc = Oscillator(440.0, 44100)
+ *     block = osc.render(1024)                  # continues where the last block ended
+ *     carrier = Oscillator(fc).render(n, pm=I * modulator)   # phase modulation (rad)
+ *
+ * The per-sample phases are re-anchored every ACC_BLOCK samples from a
+ * float64 start, so float32 rounding never accumulates over long notes.
+ *
+ * Quality switch (QUALITIES): "fast" uses the table in float32, and "hq"
+ * evaluates np.sin over float64 phases (the reference).
+ *
+ * `python -m synth.wavetable` (or check_error()) checks the table oscillator
+ * against np.sin (ERROR_BOUND) and times both; a failed check raises
+ * AssertionError.
+ *
+ * @date 2025
+ */
+"""
+
+import time
+import numpy as np
+
+QUALITIES = ["hq", "fast"]
+
+TABLE_SIZE = 4096  # power of two: the index wraps with a mask
+ACC_BLOCK = 1024   # samples between re-anchors of the float32 phase
+
+# sin over one cycle (plus the first point again), and the slope to the next point
+_TABLE = np.sin(2 * np.pi * np.arange(TABLE_SIZE + 1) / TABLE_SIZE).astype(np.float32)
+_SLOPE = np.diff(_TABLE)
+_TABLE = _TABLE[:-1]
+
+# Largest error of the "fast" quality against np.sin: linear interpolation,
+# (pi / TABLE_SIZE)^2 / 2 = 2.9e-7, plus float32 rounding of phase and table
+ERROR_BOUND = 2e-6
+
+
+def phase_ramp(freq, n, sample_rate=44100, phase=0.0, dtype=np.float32):
+    """
+    Phase in cycles, wrapped to [0, 1), of an oscillator of frequency `freq`
+    (Hz) over `n` samples, starting at `phase` cycles. `freq` can be an array
+    of frequencies, which gives one row of phases per frequency.
+    """
+    inc = np.asarray(freq, dtype=np.float64)[..., None] / sample_rate
+    blocks = max(-(-n // ACC_BLOCK), 1)
+    # Start of each block (float64, wrapped) and the phase steps within a block
+    starts = phase + inc * (ACC_BLOCK * np.arange(blocks))
+    starts = (starts - np.floor(starts)).astype(dtype)
+    steps = inc[..., None] * np.arange(ACC_BLOCK)
+    steps = (steps - np.floor(steps)).astype(dtype)
+
+    cycles = (starts[..., None] + steps).reshape(*starts.shape[:-1], blocks * ACC_BLOCK)[..., :n]
+    cycles -= np.floor(cycles)
+    return cycles
+
+
+def table_sin(cycles, out=None):
+    """sin(2 pi cycles) from the table (float32, linear interpolation)"""
+    x = np.multiply(cycles, np.float32(TABLE_SIZE), dtype=np.float32)
+    index = np.floor(x)
+    x -= index
+    # Wraps the phase to one cycle (negative phases too)
+    index = index.astype(np.int32) & (TABLE_SIZE - 1)
+    out = np.multiply(x, _SLOPE[index], out=out)
+    out += _TABLE[index]
+    return out
+
+
+def sine(cycles, pm=None, quality="fast"):
+    """sin(2 pi cycles + pm): `pm` is an optional phase-modulation input in radians"""
+    if quality == "hq":
+        x = 2 * np.pi * np.asarray(cycles, dtype=np.float64)
+        return np.sin(x if pm is None else x + pm)
+    if pm is not None:
+        cycles = cycles + np.asarray(pm, dtype=np.float32) * np.float32(1 / (2 * np.pi))
+    return table_sin(cycles)
+
+
+class Oscillator:
+    """Sine oscillator whose phase stays continuous across render() calls"""
+
+    def __init__(self, freq, sample_rate=44100, phase=0.0, quality="fast"):
+        if quality not in QUALITIES:
+            raise ValueError(f"Unknown quality '{quality}' (expected one of {QUALITIES})")
+        self.freq = freq
+        self.sample_rate = sample_rate
+        self.quality = quality
+        self.phase = np.float32(phase % 1.0)  # cycles
+
+    def render(self, n, pm=None):
+        """Next `n` samples; `pm` (radians, length n) modulates the phase"""
+        dtype = np.float64 if self.quality == "hq" else np.float32
+        cycles = phase_ramp(self.freq, n, self.sample_rate, float(self.phase), dtype)
+        end = float(self.phase) + self.freq * n / self.sample_rate
+        self.phase = np.float32(end - np.floor(end))
+        return sine(cycles, pm, self.quality)
+
+
+def check_error(sample_rate=44100, duration=2.0, verbose=True):
+    """
+    Errors of the "fast" oscillators against np.sin over exact phases.
+    Returns (largest error of plain tones rendered in uneven blocks, which
+    also checks the phase continuity, error of a phase-modulated FM tone, FM
+    index). The modulator error reaches the carrier scaled by the index, so
+    the FM error is bounded by (1 + index) * ERROR_BOUND. Raises
+    AssertionError when either error exceeds its bound.
+    """
+    n = int(duration * sample_rate)
+    t = np.arange(n) / sample_rate
+    errors = []
+    for freq in (27.5, 440.0, 4186.0, 15000.0):
+        osc = Oscillator(freq, sample_rate, phase=0.1)
+        sizes = [1, 511, 1024, 4097, n]
+        blocks, done = [], 0
+        for size in sizes:
+            size = min(size, n - done)
+            blocks.append(osc.render(size))
+            done += size
+        reference = np.sin(2 * np.pi * (freq * t + 0.1))
+        errors.append(np.max(np.abs(np.concatenate(blocks) - reference)))
+
+    # FM (Chowning): carrier at fc phase-modulated by I sin(2 pi fm t)
+    fc, fm, index = 440.0, 440.0 / 1.5, 3.0
+    modulator = Oscillator(fm, sample_rate).render(n)
+    carrier = Oscillator(fc, sample_rate).render(n, pm=index * modulator)
+    reference = np.sin(2 * np.pi * fc * t + index * np.sin(2 * np.pi * fm * t))
+    errors.append(np.max(np.abs(carrier - reference)))
+
+    started = time.perf_counter()
+    Oscillator(fc, sample_rate, quality="hq").render(n, pm=index * Oscillator(fm, sample_rate, quality="hq").render(n))
+    hq = time.perf_counter() - started
+    started = time.perf_counter()
+    Oscillator(fc, sample_rate).render(n, pm=index * Oscillator(fm, sample_rate).render(n))
+    fast = time.perf_counter() - started
+
+    if verbose:
+        print("max error per tone:", ", ".join(f"{e:.2e}" for e in errors[:-1]), f"| FM: {errors[-1]:.2e}")
+        print(f"FM tone, {duration:g} s: hq {hq * 1e3:.1f} ms, fast {fast * 1e3:.1f} ms")
+    if not max(errors[:-1]) < ERROR_BOUND:
+        raise AssertionError(f"table oscillator error {max(errors[:-1]):.2e} (bound {ERROR_BOUND:.0e})")
+    if not errors[-1] < (1 + index) * ERROR_BOUND:
+        raise AssertionError(f"FM error {errors[-1]:.2e} (bound {(1 + index) * ERROR_BOUND:.0e})")
+    return max(errors[:-1]), errors[-1], index
+
+
+if __name__ == "__main__":
+    check_error()